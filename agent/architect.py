@@ -16,13 +16,14 @@ Key Features:
 - Integration with OpenAI LLMs and RAG for enhanced reasoning and retrieval capabilities.
 - Asynchronous, interactive user input and output handling for conversational experiences.
 - Comprehensive state management to track conversation history, suggestions, reasoning, and generated specifications.
+- Persistent checkpoints after every node, so an interrupted conversation resumes where it left off.
 
 This architecture enables the automated, interactive, and explainable transformation of user goals into detailed, structured challenge specifications suitable for downstream use.
 """
 import json
+import uuid
 from typing import Dict, List, Optional, Any
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from dotenv import load_dotenv
 import os
@@ -33,7 +34,8 @@ from agent.nodes.rag_integration import search_similar_challenge
 from agent.nodes.spec_generation import generate_spec
 from agent.nodes.spec_discussion import discuss_spec
 
-from utils.rag import RAGHelper
+from utils.registry import get_llm, get_rag, get_workflow
+from utils.metrics import correlation_id, timed_node
 
 from utils.schema import ChallengeState
 from utils.input_handler import async_print, async_input
@@ -58,29 +60,36 @@ class ChallengeArchitect:
         """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.session = session
-        self.llm = ChatOpenAI(model="gpt-4.1", api_key=self.api_key, temperature=0.5)
-        self.rag = RAGHelper()
+        # Checkpoints are keyed by session so a reconnect, even to another worker, resumes the conversation
+        self.thread_id = session or f"cli-{uuid.uuid4().hex}"
+        # Reuse the process-wide clients and compiled workflow instead of building them per session
+        self.llm = get_llm(api_key=self.api_key)
+        self.rag = get_rag()
+        self.workflow = get_workflow()
 
-        # Build the LangGraph workflow
-        self.workflow = self._build_workflow()
-                
-    def _build_workflow(self) -> StateGraph:
+    @staticmethod
+    def build_workflow(checkpointer=None):
         """
         Build the LangGraph workflow for the challenge architect agent.
         
         This creates a state machine with conditional transitions between specialized AI agents.
         Each node represents a different AI agent with specific capabilities.
-        """
+        Compiling is expensive, so callers should use `utils.registry.get_workflow` to share one instance.
+
+        Args:
+            checkpointer: Optional LangGraph checkpoint saver that persists the state after every node
+                """
         
         # Define the state graph with initial state structure
         workflow = StateGraph(ChallengeState)
         
         # Add specialized AI agent nodes to the graph
-        workflow.add_node("discuss_scope", discuss_scope)      # Interactive conversation agent
-        workflow.add_node("select_schema", select_schema)        # Schema selection agent
-        workflow.add_node("search_similar_challenge", search_similar_challenge)  # Similar challenge search agent
-        workflow.add_node("generate_spec", generate_spec)          # Specification generation agent
-        workflow.add_node("discuss_spec", discuss_spec)
+        # Each node records its processing time in the agent_node_duration_seconds histogram
+        workflow.add_node("discuss_scope", timed_node("discuss_scope", discuss_scope))      # Interactive conversation agent
+        workflow.add_node("select_schema", timed_node("select_schema", select_schema))        # Schema selection agent
+        workflow.add_node("search_similar_challenge", timed_node("search_similar_challenge", search_similar_challenge))  # Similar challenge search agent
+        workflow.add_node("generate_spec", timed_node("generate_spec", generate_spec))          # Specification generation agent
+        workflow.add_node("discuss_spec", timed_node("discuss_spec", discuss_spec))
 
         def should_continue_discussing_scope(state):
             """
@@ -143,7 +152,14 @@ class ChallengeArchitect:
         # Set the entry point
         workflow.set_entry_point("discuss_scope")
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=checkpointer)
+
+    def graph_config(self) -> Dict[str, Any]:
+        """
+        Build the graph config that hands the shared LLM and RAG clients to every node
+        and identifies the conversation's checkpoint thread.
+        """
+        return {"configurable": {"thread_id": self.thread_id, "llm": self.llm, "rag": self.rag}}
 
     async def print_section(self, title, content, emoji = "📋", debug_message = False):
         """Helper function to print formatted sections"""
@@ -151,14 +167,9 @@ class ChallengeArchitect:
         # await async_print("=" * (len(title) + 4), session=self.session)
         await async_print(content, session=self.session, debug_message=debug_message)
 
-    async def process_challenge(self) -> Dict[str, Any]:
+    async def start_conversation(self) -> Dict[str, Any]:
         """
-        Process a challenge request and generate a structured spec through interactive AI conversation.
-        
-        This is the main entry point that orchestrates the entire multi-agent workflow.
-        
-        Returns:
-            Dict containing generated specification, reasoning trace, and conversation history
+        Greet the user, ask for the challenge description and build the initial workflow state.
         """
         
         # Get prompt from input_data or ask user for input
@@ -203,8 +214,37 @@ Examples:
         initial_state["discuss_scope_conversation"].append(
             HumanMessage(content=initial_prompt)
         )
+        return initial_state
+
+    async def process_challenge(self) -> Dict[str, Any]:
+        """
+        Process a challenge request and generate a structured spec through interactive AI conversation.
+        
+        This is the main entry point that orchestrates the entire multi-agent workflow.
+        If the session has an unfinished conversation checkpoint, it resumes from its last completed node.
+        
+        Returns:
+            Dict containing generated specification, reasoning trace, and conversation history
+        """
+        # Metrics recorded during this conversation carry its thread ID as correlation ID
+        correlation_id.set(self.thread_id)
+        config = self.graph_config()
+        checkpointer = self.workflow.checkpointer
+        snapshot = await self.workflow.aget_state(config) if checkpointer else None
+
         # Execute the LangGraph workflow
-        final_state = await self.workflow.ainvoke(initial_state)
+        if snapshot is not None and snapshot.next:
+            await async_print(json.dumps({
+                "message": "Welcome back! Let's pick up where we left off.",
+                "resumed": True
+            }), session=self.session)
+            final_state = await self.workflow.ainvoke(None, config=config)
+        else:
+            final_state = await self.workflow.ainvoke(await self.start_conversation(), config=config)
+
+        # The conversation is finished, so its checkpoints are no longer needed
+        if checkpointer:
+            await checkpointer.adelete_thread(self.thread_id)
 
         # Construct and send the final, structured message to the frontend.
         # This ensures the frontend reliably knows the process is complete.
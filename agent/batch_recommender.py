@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict
+
+from agent.impact_recommender import get_impact_preview
+from agent.audience_recommender import get_audience_recommendations
+from agent.submission_recommender import get_submission_recommendations
+from agent.prize_recommender import get_prize_recommendations
+from agent.timeline_recommender import get_timeline_recommendations
+from agent.evaluation_recommender import get_evaluation_recommendations
+from agent.communications_recommender import get_communications_recommendations
+
+# Wizard step sections and the recommender that fills each of them
+STEP_RECOMMENDERS = {
+    "impact": get_impact_preview,
+    "audience": get_audience_recommendations,
+    "submission": get_submission_recommendations,
+    "prize": get_prize_recommendations,
+    "timeline": get_timeline_recommendations,
+    "evaluation": get_evaluation_recommendations,
+    "communications": get_communications_recommendations,
+}
+
+
+async def stream_step_recommendations(problem_statement: str, challenge_type: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs every wizard step recommender concurrently and yields each section as soon as it finishes.
+    The total wall-clock time is that of the slowest recommender rather than the sum of all of them.
+
+    Args:
+        problem_statement: A string containing the problem statement from step 1.
+        challenge_type: The selected challenge type (e.g., 'ideation', 'rtp').
+
+    Yields:
+        One dictionary per section with its `section` name, `data` and `duration_ms`,
+        followed by a final summary with `done`, `total_ms` and per-section `timings`.
+    """
+    started = time.perf_counter()
+
+    async def run_section(section: str, recommender) -> Dict[str, Any]:
+        section_started = time.perf_counter()
+        result = {"section": section}
+        try:
+            result["data"] = await recommender(problem_statement, challenge_type)
+        except Exception as e:
+            print(f"❌ An unexpected error occurred while getting {section} recommendations: {e}")
+            result["data"] = None
+            result["error"] = str(e)
+        result["duration_ms"] = round((time.perf_counter() - section_started) * 1000, 1)
+        return result
+
+    tasks = [asyncio.create_task(run_section(section, recommender)) for section, recommender in STEP_RECOMMENDERS.items()]
+    timings = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            timings[result["section"]] = result["duration_ms"]
+            yield result
+    finally:
+        # The client went away before every section finished, so stop the remaining LLM calls
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "done": True,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "timings": timings,
+    }
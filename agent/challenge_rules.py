@@ -0,0 +1,185 @@
+"""
+agent/challenge_rules.py
+
+Deterministic checks of a challenge configuration, run by `detect_conflicts` before
+the LLM review.
+
+The rules cover what can be checked mechanically: the end date against the start
+date, milestones against the timeline, the prize budget against the prize type, and
+the submission step against the fields the platform schema requires for the challenge
+type. They run in well under a millisecond. Errors are blocking: with
+`VALIDATION_SKIP_LLM_ON_ERRORS` the LLM review is skipped until they are fixed.
+Warnings are reported next to the LLM's findings.
+
+The wizard sends its steps either flat or grouped per step, with camelCase or
+snake_case keys, so values are looked up under every spelling, at the top level and
+one level down. A step section can share its name with one of its fields (e.g. a
+"prizes" section holding the "prizes" list), so values of the wrong type are skipped.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from utils.schema_registry import schema_registry
+
+SUBMISSION_TYPES = {"document", "presentation", "video", "prototype", "design", "concept"}
+MONETARY_PRIZE_TYPES = {"monetary", "mixed"}
+# Anything but a step section
+FIELD_VALUE = (str, int, float, bool, list)
+
+
+def _lookup(data: Dict[str, Any], *names: str, kind: Union[Type, Tuple[Type, ...]] = FIELD_VALUE) -> Any:
+    """
+    Return the first non-empty value of type `kind` stored under one of `names`, at the top level or in a step section.
+    """
+    sections = [data] + [value for value in data.values() if isinstance(value, dict)]
+    for section in sections:
+        for name in names:
+            value = section.get(name)
+            if value not in (None, "", [], {}) and isinstance(value, kind):
+                return value
+    return None
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    parsed = _parse_datetime(value)
+    return parsed.date() if parsed is not None else None
+
+
+def _ends_before_start(start_value: str, end_value: str) -> bool:
+    start, end = _parse_datetime(start_value), _parse_datetime(end_value)
+    # "YYYY-MM-DD" is 10 characters; anything longer carries a time of day
+    timed = len(start_value.strip()) > 10 and len(end_value.strip()) > 10
+    if timed and (start.tzinfo is None) == (end.tzinfo is None):
+        return end <= start
+    # A challenge may start and end on the same day
+    return end.date() < start.date()
+
+
+def _amount(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", "").replace("$", "").strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _check_dates(data: Dict[str, Any], errors: List[str], warnings: List[str]):
+    start_value = _lookup(data, "startDate", "start_date")
+    end_value = _lookup(data, "endDate", "end_date")
+    start, end = _parse_date(start_value), _parse_date(end_value)
+    for label, value, parsed in (("start", start_value, start), ("end", end_value, end)):
+        if value is not None and parsed is None:
+            errors.append(f"The {label} date '{value}' is not a valid date. Please use the YYYY-MM-DD format.")
+    if start and end and _ends_before_start(start_value, end_value):
+        errors.append(f"The end date ({end_value.strip()}) must be after the start date ({start_value.strip()}).")
+        # Milestones are not checked against an inverted timeline
+        start = end = None
+
+    milestones = _lookup(data, "milestones", kind=list)
+    if not isinstance(milestones, list):
+        return
+    previous = None
+    for milestone in milestones:
+        if not isinstance(milestone, dict):
+            continue
+        name = milestone.get("name") or "A milestone"
+        when = _parse_date(milestone.get("date"))
+        if when is None:
+            warnings.append(f"The milestone '{name}' has no valid date.")
+            continue
+        if start and when < start:
+            errors.append(f"The milestone '{name}' ({when.isoformat()}) is before the challenge starts ({start.isoformat()}).")
+        elif end and when > end:
+            errors.append(f"The milestone '{name}' ({when.isoformat()}) is after the challenge ends ({end.isoformat()}).")
+        if previous and when < previous[1]:
+            warnings.append(f"The milestone '{name}' is dated before '{previous[0]}'; check the milestone order.")
+        previous = (name, when)
+
+
+def _check_prizes(data: Dict[str, Any], schema: Dict[str, Any], errors: List[str], warnings: List[str]):
+    prize_type = _lookup(data, "prizeType", "prize_type", kind=str)
+    prize_type = prize_type.strip().lower() if isinstance(prize_type, str) else None
+    budget_value = _lookup(data, "totalBudget", "total_budget", "budget", kind=(str, int, float))
+    budget = _amount(budget_value)
+    prizes = _lookup(data, "prizes", "prize_structure", "prizeStructure", kind=list)
+    entries = [prize for prize in (prizes or []) if isinstance(prize, dict)]
+    amounts = [_amount(prize.get("amount", prize.get("value"))) for prize in entries]
+    awarded = sum(amount for amount in amounts if amount is not None)
+
+    if budget_value is not None and budget is None:
+        errors.append(f"The prize budget '{budget_value}' is not a valid amount.")
+    # An empty amount is allowed for non-monetary prizes
+    invalid = [
+        str(prize.get("amount", prize.get("value")))
+        for prize, amount in zip(entries, amounts)
+        if amount is None and prize.get("amount", prize.get("value")) not in (None, "")
+    ]
+    if invalid:
+        errors.append(f"These prize amounts are not valid amounts: {', '.join(invalid)}.")
+    if prize_type in MONETARY_PRIZE_TYPES:
+        if budget is None and not awarded:
+            errors.append(f"A '{prize_type}' prize type needs a prize budget or prize amounts.")
+        elif budget is not None and budget <= 0:
+            errors.append(f"A '{prize_type}' prize type needs a prize budget above zero.")
+    if budget is not None and budget > 0 and awarded > budget:
+        errors.append(f"The prize amounts add up to {awarded:g}, more than the total budget of {budget:g}.")
+    if prize_type == "none" and awarded:
+        warnings.append("Prize amounts are set although the prize type is 'none'.")
+
+    required = schema.get("fields", {}).get("prize_structure", {}).get("required")
+    if required and (prize_type == "none" or (prize_type is None and budget is None and not entries)):
+        errors.append(f"'{schema.get('challenge_type')}' challenges require a prize structure.")
+
+
+def _check_submission(data: Dict[str, Any], schema: Dict[str, Any], errors: List[str], warnings: List[str]):
+    challenge_type = schema.get("challenge_type", "")
+    fields = schema_registry.get_step_schema(challenge_type, "submission-requirements") or {}
+    for name, field in fields.items():
+        value = _lookup(data, name, "submissionRequirements", "submission_requirements", "instructions")
+        if field.get("required") and value is None:
+            errors.append(f"'{challenge_type}' challenges require {name.replace('_', ' ')}: describe what participants must submit.")
+        elif value is not None and field.get("type") == "String" and not isinstance(value, (str, list)):
+            errors.append(f"The {name.replace('_', ' ')} must be a text description.")
+
+    types = _lookup(data, "submissionTypes", "submission_types", "types", kind=list)
+    if types:
+        unknown = [str(t) for t in types if t not in SUBMISSION_TYPES]
+        if unknown:
+            warnings.append(f"Unknown submission types: {', '.join(unknown)}.")
+
+
+def check_challenge(challenge_data: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Run the deterministic checks on a challenge configuration.
+
+    Args:
+        challenge_data: A dictionary containing all the data gathered from the wizard steps.
+
+    Returns:
+        {"errors": [...], "warnings": [...]}, errors being blocking.
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+    challenge_type = _lookup(challenge_data, "challengeType", "challenge_type", kind=str)
+    # Types without a platform schema only get the schema-independent checks
+    schema = schema_registry.get(challenge_type) if challenge_type else None
+
+    _check_dates(challenge_data, errors, warnings)
+    _check_prizes(challenge_data, schema or {}, errors, warnings)
+    if schema is not None:
+        _check_submission(challenge_data, schema, errors, warnings)
+    return {"errors": errors, "warnings": warnings}
@@ -1,42 +1,68 @@
 import json
 import traceback
 from typing import Dict, Any, List
-from openai import OpenAI
-from config.prompts import CONFLICT_DETECTION_PROMPT
+from utils.llm import complete_prompt
+from utils.metrics import CHALLENGE_VALIDATIONS, count
+from utils.spec_patch import render_compact
+from agent.challenge_rules import check_challenge
+from config.config import RECOMMENDATION_LLM_MODEL, VALIDATION_RULES_ENABLED, VALIDATION_SKIP_LLM_ON_ERRORS
+from config.prompts import CONFLICT_DETECTION_PROMPT, CONFLICT_DETECTION_WITH_RULES_PROMPT
 
-def detect_conflicts(challenge_data: Dict[str, Any]) -> Dict[str, Any]:
+
+def _llm_warnings(value: Any) -> List[str]:
+    # The model may answer a single warning as a string instead of a list
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if not isinstance(value, list):
+        return []
+    return [warning for warning in value if isinstance(warning, str) and warning.strip()]
+
+
+async def detect_conflicts(challenge_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Analyzes the complete challenge data to detect inconsistencies or potential issues.
 
+    The deterministic rules of `agent.challenge_rules` run first. The LLM reviews only
+    what they cannot judge, and is skipped while they report blocking errors.
+
     Args:
         challenge_data: A dictionary containing all the data gathered from the wizard steps.
 
     Returns:
-        A dictionary containing a list of AI-detected warnings or suggestions.
+        A dictionary with the blocking rule errors ("errors") and every warning or
+        suggestion, rule errors first ("warnings").
     """
-    try:
-        client = OpenAI()
+    findings = check_challenge(challenge_data) if VALIDATION_RULES_ENABLED else {"errors": [], "warnings": []}
+    rule_messages: List[str] = findings["errors"] + findings["warnings"]
+    if findings["errors"] and VALIDATION_SKIP_LLM_ON_ERRORS:
+        count(CHALLENGE_VALIDATIONS, outcome="rules_only")
+        return {"errors": findings["errors"], "warnings": rule_messages}
 
-        # Serialize the challenge data into a readable string for the prompt
-        data_summary = json.dumps(challenge_data, indent=2)
-
-        prompt = CONFLICT_DETECTION_PROMPT.format(
-            challenge_data_summary=data_summary
-        )
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+    count(CHALLENGE_VALIDATIONS, outcome="llm_review")
+    # Compact, key-sorted JSON keeps the prompt small and its cache key stable
+    inputs = {"challenge_data_summary": json.dumps(challenge_data, separators=(",", ":"), sort_keys=True, ensure_ascii=False)}
+    if VALIDATION_RULES_ENABLED:
+        # Only then may the prompt tell the model what the rules already checked
+        inputs["rule_findings"] = render_compact(rule_messages) if rule_messages else "None"
+    try:
+        content = await complete_prompt(
+            "validate-challenge",
+            template=CONFLICT_DETECTION_WITH_RULES_PROMPT if VALIDATION_RULES_ENABLED else CONFLICT_DETECTION_PROMPT,
+            inputs=inputs,
+            system_prompt="You are an expert challenge designer and helpful assistant that outputs JSON.",
+            model=RECOMMENDATION_LLM_MODEL,
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are an expert challenge designer and helpful assistant that outputs JSON."},
-                {"role": "user", "content": prompt}
-            ],
             temperature=0.5
         )
 
-        analysis = json.loads(response.choices[0].message.content)
+        analysis = json.loads(content)
+        analysis["errors"] = findings["errors"]
+        analysis["warnings"] = rule_messages + _llm_warnings(analysis.get("warnings"))
         return analysis
     except Exception as e:
         print(f"❌ An unexpected error occurred while detecting conflicts: {e}")
         traceback.print_exc()
-        return {"warnings": ["Could not perform AI validation at this time due to an error."]}
+        return {
+            "errors": findings["errors"],
+            "warnings": rule_messages + ["Could not perform AI validation at this time due to an error."]
+        }
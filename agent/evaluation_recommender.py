@@ -1,9 +1,10 @@
 import json
 from typing import Dict, Any, List
-from openai import OpenAI
+from utils.llm import complete_prompt
+from config.config import RECOMMENDATION_LLM_MODEL
 from config.prompts import EVALUATION_RECOMMENDATION_PROMPT
 
-def get_evaluation_recommendations(problem_statement: str, challenge_type: str) -> Dict[str, Any]:
+async def get_evaluation_recommendations(problem_statement: str, challenge_type: str) -> Dict[str, Any]:
     """
     Analyzes the problem statement and challenge type to return AI-powered recommendations for evaluation criteria.
 
@@ -15,24 +16,20 @@ def get_evaluation_recommendations(problem_statement: str, challenge_type: str)
         A dictionary with recommendations for a scoring model and a set of criteria.
     """
     try:
-        client = OpenAI()
-
-        prompt = EVALUATION_RECOMMENDATION_PROMPT.format(
-            problem_statement=problem_statement,
-            challenge_type=challenge_type
-        )
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        content = await complete_prompt(
+            "evaluation-recommendations",
+            template=EVALUATION_RECOMMENDATION_PROMPT,
+            inputs={
+                "problem_statement": problem_statement,
+                "challenge_type": challenge_type
+            },
+            system_prompt="You are a helpful assistant that outputs JSON.",
+            model=RECOMMENDATION_LLM_MODEL,
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-                {"role": "user", "content": prompt}
-            ],
             temperature=0.7
         )
 
-        recommendations = json.loads(response.choices[0].message.content)
+        recommendations = json.loads(content)
 
         return recommendations
     except json.JSONDecodeError:
@@ -1,9 +1,10 @@
 import json
 from typing import Dict, Any
-from openai import OpenAI
+from utils.llm import complete_prompt
+from config.config import RECOMMENDATION_LLM_MODEL
 from config.prompts import IMPACT_PREVIEW_PROMPT
 
-def get_impact_preview(problem_statement: str, challenge_type: str) -> str:
+async def get_impact_preview(problem_statement: str, challenge_type: str) -> str:
     """
     Analyzes the challenge context and returns a concise preview of the downstream
     impact of choosing a specific challenge type.
@@ -15,25 +16,20 @@ def get_impact_preview(problem_statement: str, challenge_type: str) -> str:
     Returns:
         A string containing the AI-generated impact preview.
     """
-    client = OpenAI()
-
-    prompt = IMPACT_PREVIEW_PROMPT.format(
-        problem_statement=problem_statement,
-        challenge_type=challenge_type
-    )
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides concise summaries."},
-                {"role": "user", "content": prompt}
-            ],
+        preview_text = await complete_prompt(
+            "impact-preview",
+            template=IMPACT_PREVIEW_PROMPT,
+            inputs={
+                "problem_statement": problem_statement,
+                "challenge_type": challenge_type
+            },
+            system_prompt="You are a helpful assistant that provides concise summaries.",
+            model=RECOMMENDATION_LLM_MODEL,
             temperature=0.6,
             max_tokens=150,
         )
 
-        preview_text = response.choices[0].message.content
         return preview_text.strip()
     except Exception as e:
         print(f"❌ An unexpected error occurred while getting impact preview: {e}")
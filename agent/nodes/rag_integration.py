@@ -1,7 +1,10 @@
+import asyncio
 from typing import Dict, Any
+from langchain_core.runnables import RunnableConfig
 from utils.input_handler import async_print
+from utils.registry import get_rag_from_config
 
-async def search_similar_challenge(state: Dict[str, Any]) -> Dict[str, Any]:
+async def search_similar_challenge(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
     """
     Search for similar past challenges based on the scope description.
     It retrieves challenges from a vector database and updates the state with the results.
@@ -15,10 +18,9 @@ async def search_similar_challenge(state: Dict[str, Any]) -> Dict[str, Any]:
     scope_description = state["scope"].get('description', 'development')
 
     # Search for similar challenges based on scope description
-    from agent.architect import ChallengeArchitect
-    instance = ChallengeArchitect()
-    rag = instance.rag
-    similar_challenges = rag.search_similar_challenges(scope_description)
+    rag = get_rag_from_config(config)
+    # The embedding and Qdrant clients are blocking, so keep them off the event loop
+    similar_challenges = await asyncio.to_thread(rag.search_similar_challenges, scope_description)
     state["similar_challenges"] = similar_challenges
 
     await async_print(
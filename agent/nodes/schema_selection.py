@@ -1,11 +1,12 @@
 import json
 from typing import Dict, Any
 from utils.input_handler import async_print
+from utils.schema_registry import schema_registry
 
 async def select_schema(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Select the appropriate schema based on the challenge type defined in the scope.
-    This function loads the schema from a JSON file and selects the one that matches the challenge type.
+    The schema is taken from the in-memory schema registry and matches the challenge type.
     If no type is specified, it defaults to 'development'.
     """
 
@@ -14,11 +15,8 @@ async def select_schema(state: Dict[str, Any]) -> Dict[str, Any]:
     await async_print("Please wait, we are doing furher analysis based on the scope and work type...", session=state["session"])
     await async_print(f"\n 🔎 Finding specification schema for challenge type: {type}...", session=state["session"], debug_message=True)
 
-    # If scope is defined, load the proper schema
-    with open("config/platform_schema.json", "r") as f:
-        schema_all = json.load(f)
-        schema_selected = [item for item in schema_all if item["challenge_type"] == type]
-        state["schema"] = schema_selected[0] if len(schema_selected) > 0 else schema_all[0]
-        await async_print(f"🤖 Selected schema: \n```json\n{json.dumps(state['schema'], indent=2)}\n```", session=state["session"], debug_message=True)
+    # If scope is defined, look up the proper schema in the preloaded registry
+    state["schema"] = schema_registry.get_or_default(type)
+    await async_print(f"🤖 Selected schema: \n```json\n{json.dumps(state['schema'], indent=2)}\n```", session=state["session"], debug_message=True)
 
     return state
\ No newline at end of file
@@ -1,19 +1,27 @@
 from typing import Dict, Any
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 import json
 from config.prompts import DEFINE_SCOPE_PROMPTS
 from utils.input_handler import async_print, async_input
+from utils.registry import get_llm_tiers_from_config
+from utils.history import compact_history
+from utils.streaming import LLM_TURN_ERRORS, invoke_llm, recover_failed_turn
+from utils.structured_output import parse_structured_reply, reply_errors, request_format, scope_response_format
 
-async def discuss_scope(state: Dict[str, Any]) -> Dict[str, Any]:
+def _accept_fast_tier_reply(content: str) -> bool:
+    # Faster models are trusted with clarifying questions; completing the scope is left to the last tier
+    return not reply_errors(content, scope_response_format()) and not json.loads(content).get("completed")
+
+
+async def discuss_scope(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
     """
     Discuss and define the scope of the challenge with the user.
     This function allows for an iterative discussion to finalize the challenge scope.
     """
 
-    from agent.architect import ChallengeArchitect
-    instance = ChallengeArchitect()
-    llm = instance.llm
+    llm = get_llm_tiers_from_config(config, "discuss_scope")
     
     system_message = SystemMessage(content=DEFINE_SCOPE_PROMPTS)
     prompt = ChatPromptTemplate.from_messages([
@@ -21,16 +29,33 @@ async def discuss_scope(state: Dict[str, Any]) -> Dict[str, Any]:
         MessagesPlaceholder(variable_name="chat_history")
     ])
     
-    response = llm.invoke(
-        prompt.format_prompt(
-            chat_history=state["discuss_scope_conversation"]
-        ).to_messages()
+    chat_history = await compact_history(
+        state["discuss_scope_conversation"],
+        system_message.content,
+        node="discuss_scope",
+        session=state["session"]
     )
-
     try:
-        analysis = json.loads(response.content)
-    except json.JSONDecodeError:
-        analysis = {"completed": False, "message": "I'm having a little trouble processing that. Could you try rephrasing?"}
+        content = await invoke_llm(
+            llm,
+            prompt.format_prompt(
+                chat_history=chat_history
+            ).to_messages(),
+            node="discuss_scope",
+            session=state["session"],
+            validate=_accept_fast_tier_reply,
+            response_format=request_format(scope_response_format())
+        )
+    except LLM_TURN_ERRORS as e:
+        return await recover_failed_turn(state, "discuss_scope_conversation", "discuss_scope", e)
+
+    analysis = await parse_structured_reply(
+        content,
+        "discuss_scope",
+        scope_response_format(),
+        fallback={"completed": False, "message": "I'm having a little trouble processing that. Could you try rephrasing?"},
+        llm=llm[-1]
+    )
 
     should_complete = analysis.get("completed")
     ai_question = analysis.get("message", "")
@@ -1,54 +1,124 @@
 from typing import Dict, Any
 import json
-from config.prompts import SPEC_DISCUSSION_PROMPT
-from config.config import MAX_SPEC_CHANGES_ALLOWED
+from config.prompts import SPEC_DISCUSSION_PROMPT, SPEC_DISCUSSION_PATCH_PROMPT
+from config.config import AGENT_STREAMING_ENABLED, MAX_SPEC_CHANGES_ALLOWED, SPEC_DISCUSSION_PATCH_MODE
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 
-from utils.input_handler import async_print, async_input
+from utils.input_handler import async_print, async_input, async_stream
+from utils.registry import get_llm_tiers_from_config
+from utils.history import compact_history
+from utils.prompt_layout import layout_prompt
+from utils.spec_patch import apply_spec_patch, merge_reasoning_trace, render_compact
+from utils.streaming import LLM_TURN_ERRORS, invoke_llm, recover_failed_turn
+from utils.structured_output import parse_structured_reply, reply_errors, request_format, spec_discussion_response_format
 
-async def discuss_spec(state: Dict[str, Any]) -> Dict[str, Any]:
+PATCH_FAILED_MESSAGE = "I couldn't apply that change to the specification, so it is unchanged. Could you describe the change again?"
+
+async def discuss_spec(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
     """
     Discuss and refine the challenge specification based on user input and AI suggestions.
     This function allows for an iterative discussion to finalize the challenge spec.
     """
 
-    from agent.architect import ChallengeArchitect
-    llm = ChallengeArchitect().llm
+    llm = get_llm_tiers_from_config(config, "discuss_spec")
+    current_spec = state.get("temp_spec") or state.get("spec", {})
     
-    system_message = SystemMessage(
-        content=SPEC_DISCUSSION_PROMPT.format(
-            type=type,
-            specification=str(state.get("spec", {})),
-            reasoning_trace=str(state.get("reasoning_trace", [])),
-            max_changes=MAX_SPEC_CHANGES_ALLOWED
+    if SPEC_DISCUSSION_PATCH_MODE:
+        # The model sees the current spec and answers with edits instead of the whole spec
+        static_prompt, prompt_inputs = layout_prompt(
+            SPEC_DISCUSSION_PATCH_PROMPT,
+            {
+                "specification": render_compact(current_spec),
+                "reasoning_trace": render_compact(state.get("reasoning_trace", [])),
+                "max_changes": MAX_SPEC_CHANGES_ALLOWED
+            }
         )
-    )
+    else:
+        static_prompt, prompt_inputs = layout_prompt(
+            SPEC_DISCUSSION_PROMPT,
+            {
+                "specification": str(state.get("spec", {})),
+                "reasoning_trace": str(state.get("reasoning_trace", [])),
+                "max_changes": MAX_SPEC_CHANGES_ALLOWED
+            }
+        )
+    # The instructions stay in the cacheable prompt prefix; the current specification
+    # follows them, so the user's latest turn remains the last message the model sees
+    system_message = SystemMessage(content=static_prompt)
+    inputs_message = SystemMessage(content=prompt_inputs)
     prompt = ChatPromptTemplate.from_messages([
         system_message,
+        inputs_message,
         MessagesPlaceholder(variable_name="chat_history")
     ])
+    chat_history = await compact_history(
+        state["discuss_spec_conversation"],
+        f"{system_message.content}\n\n{inputs_message.content}",
+        node="discuss_spec",
+        session=state["session"]
+    )
     messages = prompt.format_prompt(
-        chat_history=state["discuss_spec_conversation"]
+        chat_history=chat_history
     ).to_messages()
+    response_format = spec_discussion_response_format(state.get("schema", {}), SPEC_DISCUSSION_PATCH_MODE)
 
-    response = llm.invoke(messages)
     try:
-        analysis = json.loads(response.content)
-    except json.JSONDecodeError:
+        content = await invoke_llm(
+            llm,
+            messages,
+            node="discuss_spec",
+            session=state["session"],
+            stream_objects=() if SPEC_DISCUSSION_PATCH_MODE else ("specification",),
+            validate=lambda reply: not reply_errors(reply, response_format),
+            response_format=request_format(response_format)
+        )
+    except LLM_TURN_ERRORS as e:
+        return await recover_failed_turn(state, "discuss_spec_conversation", "discuss_spec", e)
+    analysis = await parse_structured_reply(
+        content,
+        "discuss_spec",
+        response_format,
         # Fallback for robust operation
-        analysis = {
+        fallback={
             "completed": False,
-        }
+        },
+        llm=llm[-1]
+    )
+
+    if SPEC_DISCUSSION_PATCH_MODE:
+        spec, reasoning_trace = {}, None
+        try:
+            if analysis.get("patch"):
+                spec = apply_spec_patch(current_spec, analysis["patch"])
+            if analysis.get("reasoning_trace"):
+                reasoning_trace = merge_reasoning_trace(state.get("reasoning_trace", []), analysis["reasoning_trace"])
+        except ValueError as e:
+            # Keep the current spec and tell the user instead of sending the reply that claims the edit.
+            # The history records the error, so the next turn can correct the patch
+            await async_print(f"❌ Failed to apply specification patch: {e}", session=state["session"], debug_message=True)
+            if AGENT_STREAMING_ENABLED and state["session"] is not None:
+                # The client drops the streamed message that announced the edit
+                await async_stream({"streaming": True, "reset": True}, session=state["session"])
+            analysis = {
+                "message": PATCH_FAILED_MESSAGE,
+                "completed": False,
+                "patch": [],
+                "reasoning_trace": [],
+                "patch_error": str(e)
+            }
+    else:
+        # Strict outputs return unused optional fields as null
+        spec = {key: value for key, value in (analysis.get("specification") or {}).items() if value is not None}
+        reasoning_trace = analysis.get("reasoning_trace")
 
     should_complete = analysis.get("completed")
     ai_question = analysis.get("message")
     state["discuss_spec_conversation"].append(
         AIMessage(content=json.dumps(analysis))
     )
-    spec = analysis.get("specification", {})
-    reasoning_trace = analysis.get("reasoning_trace")
     if spec:
         await async_print("\n 📋 Specification updated:", session=state["session"])
         state["temp_spec"] = spec
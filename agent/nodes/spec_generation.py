@@ -4,44 +4,74 @@ from config.prompts import SPEC_GENERATION_PROMPT
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 
 from utils.input_handler import async_print, async_input
+from utils.registry import get_llm_tiers_from_config
+from utils.history import compact_history
+from utils.prompt_layout import layout_prompt
+from utils.streaming import LLM_TURN_ERRORS, invoke_llm, recover_failed_turn
+from utils.structured_output import parse_structured_reply, reply_errors, request_format, spec_generation_response_format
 
-async def generate_spec(state: Dict[str, Any]) -> Dict[str, Any]:
+async def generate_spec(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
     """
     Generate a challenge specification based on the provided scope and schema.
     """
 
-    from agent.architect import ChallengeArchitect
-    llm = ChallengeArchitect().llm
+    llm = get_llm_tiers_from_config(config, "generate_spec")
     
     scope = state.get("scope", {})
     type = scope.get('type', 'development')
     description = scope.get('description', 'No scope provided')
 
-    system_message = SystemMessage(
-        content=SPEC_GENERATION_PROMPT.format(
-            type=type,
-            scope=description,
-            schema=str(state.get("schema", {})),
-            similar_challenges=str(state.get("similar_challenges", []))
-        )
+    static_prompt, prompt_inputs = layout_prompt(
+        SPEC_GENERATION_PROMPT,
+        {
+            "type": type,
+            "scope": description,
+            "schema": str(state.get("schema", {})),
+            "similar_challenges": str(state.get("similar_challenges", []))
+        }
     )
+    # The instructions are shared by every session and the inputs by every turn of this one,
+    # so both stay in the cacheable prompt prefix ahead of the growing history
+    system_message = SystemMessage(content=static_prompt)
+    inputs_message = SystemMessage(content=prompt_inputs)
 
     prompt = ChatPromptTemplate.from_messages([
         system_message,
+        inputs_message,
         MessagesPlaceholder(variable_name="chat_history")
     ])
     
-    response = llm.invoke(
-        prompt.format_prompt(
-            chat_history=state["generate_spec_conversation"]
-        ).to_messages()
+    response_format = spec_generation_response_format(state.get("schema", {}))
+    chat_history = await compact_history(
+        state["generate_spec_conversation"],
+        f"{system_message.content}\n\n{inputs_message.content}",
+        node="generate_spec",
+        session=state["session"]
     )
     try:
-        analysis = json.loads(response.content)
-    except json.JSONDecodeError:
-        analysis = { "completed": False }
+        content = await invoke_llm(
+            llm,
+            prompt.format_prompt(
+                chat_history=chat_history
+            ).to_messages(),
+            node="generate_spec",
+            session=state["session"],
+            stream_objects=("specification",),
+            validate=lambda reply: not reply_errors(reply, response_format),
+            response_format=request_format(response_format)
+        )
+    except LLM_TURN_ERRORS as e:
+        return await recover_failed_turn(state, "generate_spec_conversation", "generate_spec", e)
+    analysis = await parse_structured_reply(
+        content,
+        "generate_spec",
+        response_format,
+        fallback={ "completed": False },
+        llm=llm[-1]
+    )
     
     should_complete = analysis.get("completed")
     ai_question = analysis.get("message")
@@ -50,7 +80,8 @@ async def generate_spec(state: Dict[str, Any]) -> Dict[str, Any]:
     )
 
     if should_complete:
-        spec = analysis.get("specification", {})
+        # Strict outputs return unused optional fields as null
+        spec = {key: value for key, value in (analysis.get("specification") or {}).items() if value is not None}
         reasoning_trace = analysis.get("reasoning_trace", [])
         state["spec"] = spec
         state["reasoning_trace"] = reasoning_trace
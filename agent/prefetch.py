@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from agent.batch_recommender import STEP_RECOMMENDERS
+from config.config import (
+    PREFETCH_ENABLED,
+    PREFETCH_TOP_K,
+    PREFETCH_MAX_CONCURRENCY,
+    PREFETCH_MAX_CALLS_PER_MINUTE,
+    PREFETCH_MAX_INTERACTIVE_IN_FLIGHT
+)
+from utils.cache import response_cache
+from utils.llm import PRIORITY_PREFETCH, interactive_in_flight, request_priority
+
+# Steps warmed by the prefetch; the impact preview is requested before a type is picked
+PREFETCH_SECTIONS = ["audience", "submission", "prize", "timeline", "evaluation", "communications"]
+
+
+class RecommendationPrefetcher:
+    """
+    Speculatively warms the response cache with the step recommendations for the
+    top-ranked challenge types, so the later wizard steps are served from cache.
+
+    Prefetch never competes with interactive traffic: its calls run outside the
+    interactive endpoint limits under their own small concurrency cap, they are
+    bounded by a per-minute call budget, and a job stops as soon as interactive
+    load on the worker crosses a threshold or a newer job for the same problem
+    statement supersedes it.
+    """
+
+    def __init__(self, top_k: int, max_concurrency: int, max_calls_per_minute: int, max_interactive_in_flight: int):
+        self.top_k = top_k
+        self.max_calls_per_minute = max_calls_per_minute
+        self.max_interactive_in_flight = max_interactive_in_flight
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._call_times: deque = deque()
+        self.counters = {
+            "jobs": 0,
+            "calls": 0,
+            "skipped_budget": 0,
+            "skipped_busy": 0,
+            "cancelled": 0,
+        }
+
+    def schedule(self, problem_statement: str, recommendations: List[Dict[str, Any]]):
+        """
+        Start a background prefetch for the top-k challenge types of a recommendation list.
+        A running job for the same problem statement is cancelled and replaced.
+        """
+        challenge_types = [r.get("id") for r in recommendations if isinstance(r, dict) and r.get("id")][:self.top_k]
+        if not challenge_types:
+            return
+
+        key = hashlib.sha256(problem_statement.encode("utf-8")).hexdigest()
+        previous = self._jobs.pop(key, None)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self.counters["cancelled"] += 1
+
+        task = asyncio.create_task(self._run(problem_statement, challenge_types))
+        self._jobs[key] = task
+        self.counters["jobs"] += 1
+        task.add_done_callback(lambda t: self._jobs.pop(key, None) if self._jobs.get(key) is t else None)
+
+    def cancel_all(self):
+        """
+        Cancel every pending prefetch job.
+        """
+        for task in list(self._jobs.values()):
+            if not task.done():
+                task.cancel()
+                self.counters["cancelled"] += 1
+        self._jobs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending_jobs": len(self._jobs), **self.counters}
+
+    async def _run(self, problem_statement: str, challenge_types: List[str]):
+        request_priority.set(PRIORITY_PREFETCH)
+        # Warm the most likely type first, one section at a time per job
+        for challenge_type in challenge_types:
+            for section in PREFETCH_SECTIONS:
+                if not self._has_budget():
+                    self.counters["skipped_budget"] += 1
+                    return
+                if interactive_in_flight() > self.max_interactive_in_flight:
+                    self.counters["skipped_busy"] += 1
+                    return
+                async with self._semaphore:
+                    self._call_times.append(time.monotonic())
+                    self.counters["calls"] += 1
+                    await STEP_RECOMMENDERS[section](problem_statement, challenge_type)
+
+    def _has_budget(self) -> bool:
+        window_start = time.monotonic() - 60
+        while self._call_times and self._call_times[0] < window_start:
+            self._call_times.popleft()
+        return len(self._call_times) < self.max_calls_per_minute
+
+
+# Prefetching only pays off when its results land in the response cache
+prefetcher = (
+    RecommendationPrefetcher(PREFETCH_TOP_K, PREFETCH_MAX_CONCURRENCY, PREFETCH_MAX_CALLS_PER_MINUTE, PREFETCH_MAX_INTERACTIVE_IN_FLIGHT)
+    if PREFETCH_ENABLED and response_cache is not None else None
+)
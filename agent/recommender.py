@@ -1,9 +1,10 @@
 import json
 from typing import Dict, Any, List
-from openai import OpenAI
+from utils.llm import complete_prompt
+from config.config import RECOMMENDATION_LLM_MODEL
 from config.prompts import CHALLENGE_TYPE_RECOMMENDATION_PROMPT
 
-def get_challenge_type_recommendations(problem_description: str) -> List[Dict[str, Any]]:
+async def get_challenge_type_recommendations(problem_description: str) -> List[Dict[str, Any]]:
     """
     Analyzes the problem description and returns AI-powered challenge type recommendations.
     This is a standalone function that can be called by a new API endpoint.
@@ -16,23 +17,19 @@ def get_challenge_type_recommendations(problem_description: str) -> List[Dict[st
         A list of dictionaries, where each dictionary represents a recommended challenge type.
     """
     try:
-        client = OpenAI()
-
-        prompt = CHALLENGE_TYPE_RECOMMENDATION_PROMPT.format(
-            problem_description=problem_description
-        )
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        content = await complete_prompt(
+            "recommendations",
+            template=CHALLENGE_TYPE_RECOMMENDATION_PROMPT,
+            inputs={
+                "problem_description": problem_description
+            },
+            system_prompt="You are a helpful assistant that outputs JSON.",
+            model=RECOMMENDATION_LLM_MODEL,
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-                {"role": "user", "content": prompt}
-            ],
             temperature=0.5
         )
 
-        recommendations_data = json.loads(response.choices[0].message.content)
+        recommendations_data = json.loads(content)
         recommendations = recommendations_data.get("recommendations", [])
 
         if not isinstance(recommendations, list):
@@ -1,10 +1,11 @@
 import json
 from datetime import datetime, timedelta
 from typing import Dict, Any
-from openai import OpenAI
+from utils.llm import complete_prompt
+from config.config import RECOMMENDATION_LLM_MODEL
 from config.prompts import TIMELINE_RECOMMENDATION_PROMPT
 
-def get_timeline_recommendations(problem_statement: str, challenge_type: str) -> Dict[str, Any]:
+async def get_timeline_recommendations(problem_statement: str, challenge_type: str) -> Dict[str, Any]:
     """
     Analyzes the problem statement and challenge type to return AI-powered recommendations for the timeline and milestones.
 
@@ -16,24 +17,20 @@ def get_timeline_recommendations(problem_statement: str, challenge_type: str) ->
         A dictionary with recommendations for start date, end date, and key milestones.
     """
     try:
-        client = OpenAI()
-
-        prompt = TIMELINE_RECOMMENDATION_PROMPT.format(
-            problem_statement=problem_statement,
-            challenge_type=challenge_type
-        )
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        content = await complete_prompt(
+            "timeline-recommendations",
+            template=TIMELINE_RECOMMENDATION_PROMPT,
+            inputs={
+                "problem_statement": problem_statement,
+                "challenge_type": challenge_type
+            },
+            system_prompt="You are a helpful assistant that outputs JSON.",
+            model=RECOMMENDATION_LLM_MODEL,
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-                {"role": "user", "content": prompt}
-            ],
             temperature=0.7
         )
 
-        recommendations = json.loads(response.choices[0].message.content)
+        recommendations = json.loads(content)
 
         # Apply a new, robust date logic that ensures a staggered timeline
         today = datetime.today()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_checkpoints.py
+
+Measures the size and write latency of the workflow checkpoints written per turn.
+
+A stub conversation runs through the full ChallengeArchitect workflow once per
+serializer, with the SQLite checkpointer recording every checkpoint write:
+
+- json:          values encoded as JSON
+- msgpack:       LangGraph's default msgpack encoding
+- msgpack+zstd:  msgpack with zstd compression (what the server uses)
+
+The nodes return the whole ChallengeState, so each checkpoint rewrites the selected
+schema and the full conversation lists; `--turns` lengthens the scope discussion to
+show how that grows over a conversation.
+
+Usage:
+    python -m benchmarks.bench_checkpoints --turns 8
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+from typing import Any, List, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.architect import ChallengeArchitect
+from benchmarks.stub_llm import StubChatModel, StubRAGHelper
+from config.config import CHECKPOINT_COMPRESSION_LEVEL, CHECKPOINT_COMPRESSION_MIN_BYTES
+from utils.checkpointer import CompressedSerializer, SQLiteCheckpointSaver
+from utils.input_handler import add_websocket_input_queue
+from utils.stats import LatencyStats
+
+
+class JSONSerializer(JsonPlusSerializer):
+    """Baseline serializer that stores every value as JSON."""
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if obj is None:
+            return "null", b""
+        return "json", self.dumps(obj)
+
+
+class MeasuredSaver(SQLiteCheckpointSaver):
+    """Checkpoint saver that records the encoded size and write latency of every checkpoint."""
+
+    def __init__(self, path, serde):
+        super().__init__(path, serde=serde)
+        self.sizes: List[int] = []
+        self.latency = LatencyStats()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        start = time.perf_counter()
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self.latency.record("put", (time.perf_counter() - start) * 1000)
+
+        values = checkpoint["channel_values"]
+        size = sum(len(self.serde.dumps_typed(values[k])[1]) for k in new_versions if k in values)
+        self.sizes.append(size + len(self.serde.dumps_typed({**checkpoint, "channel_values": {}})[1]))
+        return result
+
+
+async def run_session(saver: MeasuredSaver, turns: int):
+    session = "bench-checkpoints"
+    queue = asyncio.Queue()
+    queue.put_nowait("I want to build a food delivery app for students")
+    for i in range(turns - 1):
+        queue.put_nowait(f"Answer {i + 1}: students on campus, web and mobile, ordering from local restaurants.")
+    queue.put_nowait("Looks good, let's proceed.")
+    add_websocket_input_queue(session, queue)
+
+    architect = ChallengeArchitect(session=session)
+    architect.llm = StubChatModel(latency=0, scope_turns=turns)
+    architect.rag = StubRAGHelper(latency=0)
+    architect.workflow = ChallengeArchitect.build_workflow(checkpointer=saver)
+    await architect.process_challenge()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint size and write latency per turn")
+    parser.add_argument("--turns", type=int, default=8, help="User replies in the scope discussion")
+    args = parser.parse_args()
+
+    serializers = {
+        "json": JSONSerializer(),
+        "msgpack": JsonPlusSerializer(),
+        "msgpack+zstd": CompressedSerializer(level=CHECKPOINT_COMPRESSION_LEVEL, min_bytes=CHECKPOINT_COMPRESSION_MIN_BYTES),
+    }
+
+    print(f"{args.turns} scope turns per conversation")
+    print(f"{'serializer':<14}{'checkpoints':>12}{'mean bytes':>12}{'last bytes':>12}{'total KiB':>11}{'p50 ms':>9}{'p95 ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, serde in serializers.items():
+            saver = MeasuredSaver(os.path.join(directory, f"{name}.sqlite3"), serde)
+            with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+                asyncio.run(run_session(saver, args.turns))
+            put = saver.latency.summary()["put"]
+            sizes = saver.sizes
+            print(
+                f"{name:<14}{len(sizes):>12}{sum(sizes) / len(sizes):>12.0f}{sizes[-1]:>12}"
+                f"{sum(sizes) / 1024:>11.1f}{put['p50_ms']:>9.2f}{put['p95_ms']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
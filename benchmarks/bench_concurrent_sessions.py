@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_concurrent_sessions.py
+
+Runs N simulated WebSocket sessions concurrently through the full ChallengeArchitect
+workflow on a single event loop, against a stub model with a fixed latency.
+
+With non-blocking LLM calls the wall-clock time stays close to a single session's
+time regardless of N, i.e. throughput scales with concurrent sessions. Pass
+`--blocking` to reproduce the old behaviour where every LLM call froze the loop and
+sessions were effectively serialized.
+
+Usage:
+    python -m benchmarks.bench_concurrent_sessions --sessions 50 --latency 0.2
+    python -m benchmarks.bench_concurrent_sessions --sessions 50 --latency 0.2 --blocking
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from agent.architect import ChallengeArchitect
+from benchmarks.stub_llm import StubChatModel, StubRAGHelper
+from utils.input_handler import add_websocket_input_queue
+
+# One reply per async_input the stub conversation reaches (initial prompt + generate_spec)
+SCRIPTED_USER_TURNS = ["I want to build a food delivery app for students", "Looks good, let's proceed."]
+
+
+async def run_session(session: str, llm: StubChatModel, rag: StubRAGHelper) -> float:
+    queue = asyncio.Queue()
+    for turn in SCRIPTED_USER_TURNS:
+        queue.put_nowait(turn)
+    add_websocket_input_queue(session, queue)
+
+    architect = ChallengeArchitect(session=session)
+    architect.llm = llm
+    architect.rag = rag
+
+    start = time.perf_counter()
+    result = await architect.process_challenge()
+    assert result["spec"], f"session {session} finished without a specification"
+    return time.perf_counter() - start
+
+
+async def run(sessions: int, latency: float, blocking: bool):
+    llm = StubChatModel(latency=latency, blocking=blocking)
+    rag = StubRAGHelper()
+
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        durations = await asyncio.gather(*(run_session(f"bench-{i}", llm, rag) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    mode = "blocking LLM calls" if blocking else "non-blocking LLM calls"
+    print(f"{mode}: {sessions} sessions x 3 LLM calls @ {latency * 1000:.0f} ms")
+    print(f"  wall clock      {elapsed:8.2f} s")
+    print(f"  sessions/sec    {sessions / elapsed:8.2f}")
+    print(f"  mean session    {sum(durations) / len(durations):8.2f} s")
+    print(f"  single session  {3 * latency:8.2f} s (lower bound)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session throughput against a stub model")
+    parser.add_argument("--sessions", type=int, default=50, help="Number of concurrent sessions")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM latency per call, in seconds")
+    parser.add_argument("--blocking", action="store_true", help="Simulate the old blocking llm.invoke behaviour")
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.latency, args.blocking))
+
+
+if __name__ == "__main__":
+    main()
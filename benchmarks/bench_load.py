@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_load.py
+
+End-to-end load test of the real server against local stand-ins for OpenAI and Qdrant.
+
+Starts the fake OpenAI and Qdrant servers of `benchmarks.fake_services` with the
+given latency and jitter, launches the server (uvicorn, or gunicorn with `--workers`
+above 1) pointed at them, then drives `--sessions` WebSocket conversations through
+the full ChallengeArchitect flow, `--concurrency` at a time, while `--rest-clients`
+clients send recommendation requests. Every recommendation request has a distinct
+problem statement, so the response cache does not hide the LLM calls.
+
+Reports completed sessions per second, p50/p95/p99 of the turn latency (user
+message to the assistant's reply), the time to the first frame of a turn, the REST
+latency per endpoint, and the resident memory of every server process (Linux only).
+The server runs in a temporary working directory, so its caches, sessions and
+checkpoints do not touch the ones in `.cache`.
+
+`--json` writes the results to a file. With `--baseline` the run fails (exit status 1)
+when throughput or p95 turn latency is more than `--max-regression` worse than in
+the baseline file.
+
+Usage:
+    python -m benchmarks.bench_load --sessions 100 --concurrency 50 --rest-clients 4
+    python -m benchmarks.bench_load --workers 4 --llm-ttft 0.5 --llm-latency 2 --json load.json
+    python -m benchmarks.bench_load --baseline load.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks.fake_services import FakeOpenAI, FakeQdrant, serve
+from utils.stats import LatencyStats
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FOLLOW_UP_REPLY = "Looks good, let's proceed."
+
+REST_ENDPOINTS = [
+    "/api/recommendations",
+    "/api/impact-preview",
+    "/api/audience-recommendations",
+    "/api/submission-recommendations",
+    "/api/prize-recommendations",
+    "/api/timeline-recommendations",
+    "/api/evaluation-recommendations",
+    "/api/communications-recommendations",
+    "/api/validate-challenge",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree(pid: int) -> List[int]:
+    """
+    Return `pid` and all of its descendants, read from /proc.
+    """
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The command name may contain spaces, the fields after it do not
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(parents.get(current, []))
+    return tree
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def sample_memory(pid: int, peaks: Dict[int, float], latest: Dict[int, float], interval: float = 0.5):
+    while True:
+        for child in process_tree(pid):
+            value = rss_mb(child)
+            if value is not None:
+                latest[child] = value
+                peaks[child] = max(peaks.get(child, 0.0), value)
+        await asyncio.sleep(interval)
+
+
+def classify(frame: str) -> str:
+    """
+    Classify a server frame: "stream" (partial reply), "reply" (the assistant waits for the
+    user), "final" (the conversation is over) or "other" (status output).
+    """
+    try:
+        payload = json.loads(frame)
+    except ValueError:
+        return "reply" if frame.lstrip().startswith("🤖 AI:") else "other"
+    if not isinstance(payload, dict):
+        return "other"
+    if payload.get("streaming"):
+        return "stream"
+    if "final_spec" in payload:
+        return "final"
+    if "message" in payload and "work_scope" not in payload and not payload.get("resumed"):
+        return "reply"
+    return "other"
+
+
+async def run_session(url: str, session: str, turn_timeout: float, latency: LatencyStats) -> float:
+    async with websockets.connect(f"{url}/ws?session={session}", max_size=None) as ws:
+        started = time.perf_counter()
+        await asyncio.wait_for(ws.recv(), turn_timeout)  # greeting
+        answer = f"I want to build a food delivery app for students ({session})"
+        while True:
+            sent_at = time.perf_counter()
+            first_frame_at = None
+            await ws.send(json.dumps({"content": answer}))
+            while True:
+                kind = classify(await asyncio.wait_for(ws.recv(), turn_timeout))
+                now = time.perf_counter()
+                if first_frame_at is None:
+                    first_frame_at = now
+                    latency.record("turn first frame", (now - sent_at) * 1000)
+                if kind in ("reply", "final"):
+                    latency.record("turn", (now - sent_at) * 1000)
+                    break
+            if kind == "final":
+                return time.perf_counter() - started
+            answer = FOLLOW_UP_REPLY
+
+
+async def run_sessions(url: str, sessions: int, concurrency: int, turn_timeout: float, latency: LatencyStats) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    limit = asyncio.Semaphore(concurrency)
+    failures: List[str] = []
+
+    async def one(index: int):
+        async with limit:
+            try:
+                duration = await run_session(url, f"load-{run_id}-{index}", turn_timeout, latency)
+                latency.record("session total", duration * 1000)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    return {"failed": len(failures), "errors": sorted(set(failures))[:5]}
+
+
+async def run_rest_client(base_url: str, client: httpx.AsyncClient, stop: asyncio.Event, latency: LatencyStats, errors: Dict[str, int], offset: int):
+    count = offset
+    while not stop.is_set():
+        endpoint = REST_ENDPOINTS[count % len(REST_ENDPOINTS)]
+        count += 1
+        problem = f"Build a platform that helps students share notes ({uuid.uuid4().hex[:8]})"
+        if endpoint == "/api/validate-challenge":
+            # A configuration that passes the rule checks, so the LLM review runs
+            body = {"challenge_data": {"problem_statement": problem, "challenge_type": "development", "deliverables": "Source code and a demo video", "prizes": [{"place": 1, "amount": 1000}]}}
+        else:
+            body = {"problem_statement": problem, "challenge_type": "development"}
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{base_url}{endpoint}", json=body)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latency.record(endpoint, (time.perf_counter() - started) * 1000)
+        if not ok:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+
+
+def server_command(workers: int, port: int) -> List[str]:
+    bind = ["--host", "127.0.0.1", "--port", str(port)]
+    if workers <= 1:
+        return [sys.executable, "-m", "uvicorn", "server:app", *bind, "--log-level", "warning"]
+    return [
+        sys.executable, "-m", "gunicorn", "server:app",
+        "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker",
+        "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+    ]
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with status {process.returncode}")
+            try:
+                if (await client.get(f"{base_url}/api/turn-stats")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def run(args) -> Dict[str, Any]:
+    fake_openai = FakeOpenAI(
+        ttft=args.llm_ttft,
+        latency=args.llm_latency,
+        embedding_latency=args.embedding_latency,
+        jitter=args.jitter,
+        scope_turns=args.scope_turns,
+    )
+    fake_qdrant = FakeQdrant(latency=args.qdrant_latency, jitter=args.jitter)
+    openai_port, qdrant_port, server_port = free_port(), free_port(), free_port()
+    fakes = [await serve(fake_openai.app, openai_port), await serve(fake_qdrant.app, qdrant_port)]
+
+    workdir = tempfile.TemporaryDirectory()
+    # Relative paths such as config/platform_schema.json resolve against the working directory
+    os.symlink(os.path.join(REPO_ROOT, "config"), os.path.join(workdir.name, "config"))
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "QDRANT_ENDPOINT": f"http://127.0.0.1:{qdrant_port}",
+        "QDRANT_API_KEY": "",
+    }
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    log_path = os.path.join(workdir.name, "server.log")
+    log = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(server_command(args.workers, server_port), cwd=workdir.name, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{server_port}"
+    peaks: Dict[int, float] = {}
+    latest: Dict[int, float] = {}
+    latency = LatencyStats(window=1_000_000)
+    rest_latency = LatencyStats(window=1_000_000)
+    rest_errors: Dict[str, int] = {}
+    try:
+        await wait_until_ready(base_url, process)
+        sampler = asyncio.create_task(sample_memory(process.pid, peaks, latest))
+        stop = asyncio.Event()
+        async with httpx.AsyncClient(timeout=args.turn_timeout, limits=httpx.Limits(max_connections=args.rest_clients + 1)) as client:
+            rest = [asyncio.create_task(run_rest_client(base_url, client, stop, rest_latency, rest_errors, i)) for i in range(args.rest_clients)]
+            started = time.perf_counter()
+            outcome = await run_sessions(f"ws://127.0.0.1:{server_port}", args.sessions, args.concurrency, args.turn_timeout, latency)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await asyncio.gather(*rest)
+        sampler.cancel()
+    except Exception:
+        log.flush()
+        print(f"Server log: {log_path}")
+        with open(log_path, "r", encoding="utf-8") as f:
+            print(f.read()[-4000:])
+        raise
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        for fake in fakes:
+            fake.should_exit = True
+        workdir.cleanup()
+
+    completed = args.sessions - outcome["failed"]
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "elapsed_s": round(elapsed, 2),
+        "sessions_completed": completed,
+        "sessions_failed": outcome["failed"],
+        "session_errors": outcome["errors"],
+        "sessions_per_s": round(completed / elapsed, 3) if elapsed else 0.0,
+        "latency": latency.summary(),
+        "rest": {"requests_per_s": round(sum(s["count"] for s in rest_latency.summary().values()) / elapsed, 2) if elapsed else 0.0,
+                 "errors": rest_errors, "latency": rest_latency.summary()},
+        "memory_mb": {str(pid): {"peak": round(peaks[pid], 1), "final": round(latest.get(pid, 0.0), 1)} for pid in sorted(peaks)},
+        "upstream_requests": {"openai_chat": fake_openai.requests, "qdrant_query": fake_qdrant.requests},
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    cfg = result["config"]
+    print(f"{result['sessions_completed']} sessions completed ({result['sessions_failed']} failed) in {result['elapsed_s']} s "
+          f"with {cfg['workers']} worker(s), concurrency {cfg['concurrency']}: {result['sessions_per_s']} sessions/s")
+    for error in result["session_errors"]:
+        print(f"  error: {error}")
+    print(f"{'':<34}{'count':>8}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    rows = list(result["latency"].items())
+    rows += [(label, s) for label, s in result["rest"]["latency"].items()]
+    for label, s in rows:
+        print(f"{label:<34}{s['count']:>8}{s['mean_ms']:>10}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+    print(f"REST: {result['rest']['requests_per_s']} requests/s, errors: {result['rest']['errors'] or 'none'}")
+    for pid, mem in result["memory_mb"].items():
+        print(f"process {pid}: peak RSS {mem['peak']} MB, final {mem['final']} MB")
+    print(f"upstream calls: {result['upstream_requests']}")
+
+
+def check_regression(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    problems = []
+    if result["sessions_per_s"] < baseline["sessions_per_s"] * (1 - tolerance):
+        problems.append(f"throughput {result['sessions_per_s']} sessions/s vs baseline {baseline['sessions_per_s']}")
+    p95 = result["latency"].get("turn", {}).get("p95_ms")
+    base_p95 = baseline["latency"].get("turn", {}).get("p95_ms")
+    if p95 is not None and base_p95 and p95 > base_p95 * (1 + tolerance):
+        problems.append(f"p95 turn latency {p95} ms vs baseline {base_p95} ms")
+    if result["sessions_failed"] > baseline.get("sessions_failed", 0):
+        problems.append(f"{result['sessions_failed']} failed sessions vs baseline {baseline.get('sessions_failed', 0)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against fake OpenAI and Qdrant servers")
+    parser.add_argument("--sessions", type=int, default=50, help="WebSocket sessions to run")
+    parser.add_argument("--concurrency", type=int, default=25, help="Sessions in flight at a time")
+    parser.add_argument("--rest-clients", type=int, default=2, help="Concurrent clients sending recommendation requests")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes (gunicorn above 1)")
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="Mean seconds to the first token of a chat completion")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Mean total seconds of a chat completion")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="Mean seconds of an embedding call")
+    parser.add_argument("--qdrant-latency", type=float, default=0.05, help="Mean seconds of a Qdrant query")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative uniform jitter of every upstream latency")
+    parser.add_argument("--scope-turns", type=int, default=1, help="User replies the scope discussion asks for")
+    parser.add_argument("--turn-timeout", type=float, default=120, help="Seconds to wait for a reply before a session fails")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated relative regression against the baseline")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = check_regression(result, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f"❌ Regression: {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_local_retrieval.py
+
+Compares similar-challenge retrieval through the local in-process replica against
+Qdrant: latency per query and recall@k of the local results against Qdrant's.
+
+The collection is synced into a temporary replica, and the queries are collection
+vectors with Gaussian noise added, so no embedding calls are made. Requires
+QDRANT_API_KEY. Pass `--offline` to time the local search alone on a synthetic
+collection of `--points` random vectors.
+
+Usage:
+    python -m benchmarks.bench_local_retrieval --queries 200
+    python -m benchmarks.bench_local_retrieval --offline --points 5000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+
+from config.config import QDRANT_ENDPOINT, QDRANT_COLLECTION_NAME, RAG_EMBEDDING_DIMENSIONS
+from utils.stats import LatencyStats
+from utils.vector_replica import LocalVectorIndex, sync_replica
+
+load_dotenv()
+
+
+def make_queries(index: LocalVectorIndex, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    vectors = index._snapshot[0]
+    picks = vectors[rng.integers(0, len(vectors), size=count)]
+    return picks + rng.normal(0, noise, size=picks.shape).astype(np.float32)
+
+
+def write_synthetic_replica(directory: str, points: int, rng: np.random.Generator):
+    vectors = rng.normal(size=(points, RAG_EMBEDDING_DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.save(os.path.join(directory, "vectors.npy"), vectors)
+    with open(os.path.join(directory, "payloads.json"), "w", encoding="utf-8") as f:
+        json.dump({"collection": "synthetic", "ids": list(range(points)), "payloads": [{"id": i} for i in range(points)]}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local replica vs Qdrant retrieval latency and recall")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=2, help="Results per query")
+    parser.add_argument("--noise", type=float, default=0.02, help="Std-dev of the noise added to query vectors")
+    parser.add_argument("--offline", action="store_true", help="Time the local search alone on a synthetic collection")
+    parser.add_argument("--points", type=int, default=5000, help="Synthetic collection size for --offline")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    latency = LatencyStats()
+    with tempfile.TemporaryDirectory() as directory:
+        qdrant = None
+        if args.offline:
+            write_synthetic_replica(directory, args.points, rng)
+        else:
+            qdrant = QdrantClient(url=QDRANT_ENDPOINT, api_key=os.environ.get("QDRANT_API_KEY"))
+            start = time.perf_counter()
+            count = sync_replica(qdrant, QDRANT_COLLECTION_NAME, directory)
+            print(f"synced {count} points in {time.perf_counter() - start:.2f} s")
+
+        index = LocalVectorIndex(directory)
+        assert index.available(), "replica failed to load"
+        queries = make_queries(index, args.queries, args.noise, rng)
+
+        overlap = 0
+        for query in queries:
+            start = time.perf_counter()
+            local = index.search(query.tolist(), args.k)
+            latency.record("local", (time.perf_counter() - start) * 1000)
+            if qdrant is None:
+                continue
+
+            start = time.perf_counter()
+            remote = qdrant.query_points(collection_name=QDRANT_COLLECTION_NAME, query=query.tolist(), limit=args.k).points
+            latency.record("qdrant", (time.perf_counter() - start) * 1000)
+            overlap += len({point_id for _, point_id, _ in local} & {hit.id for hit in remote})
+
+    print(f"{'mode':<8}{'queries':>9}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for mode, s in latency.summary().items():
+        print(f"{mode:<8}{s['count']:>9}{s['mean_ms']:>10}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+    if qdrant is not None:
+        print(f"recall@{args.k} of local vs Qdrant: {overlap / (args.queries * args.k):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_turn_overhead.py
+
+Measures the fixed per-turn overhead a node pays before it can talk to the LLM.
+
+- "legacy": what every node turn used to do, i.e. construct a ChallengeArchitect from
+  scratch (new ChatOpenAI, new QdrantClient and a freshly compiled StateGraph).
+- "registry": what nodes do now, i.e. pick the shared clients up from the graph config.
+
+No network calls are made; only client construction and graph compilation are timed.
+
+Usage:
+    python -m benchmarks.bench_turn_overhead --turns 200
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_openai import ChatOpenAI
+
+from agent.architect import ChallengeArchitect
+from utils.rag import RAGHelper
+from utils.registry import get_llm_from_config, get_rag_from_config, get_llm, get_rag, get_workflow
+
+
+def legacy_turn():
+    """Rebuild every resource, as the nodes did before the registry existed."""
+    llm = ChatOpenAI(model="gpt-4.1", api_key=os.environ["OPENAI_API_KEY"], temperature=0.5)
+    rag = RAGHelper()
+    workflow = ChallengeArchitect.build_workflow()
+    return llm, rag, workflow
+
+
+def registry_turn(config):
+    """Resolve the shared resources through the graph config."""
+    return get_llm_from_config(config), get_rag_from_config(config), get_workflow()
+
+
+def measure(fn, turns, *args):
+    samples = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<10} mean={statistics.mean(samples):9.3f} ms  p50={statistics.median(samples):9.3f} ms  p95={p95:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn resource overhead: legacy construction vs shared registry")
+    parser.add_argument("--turns", type=int, default=100, help="Number of simulated turns per mode")
+    args = parser.parse_args()
+
+    # Warm both paths once so import-time costs are not attributed to either mode
+    legacy_turn()
+    config = {"configurable": {"llm": get_llm(), "rag": get_rag()}}
+    registry_turn(config)
+
+    legacy = measure(legacy_turn, args.turns)
+    registry = measure(registry_turn, args.turns, config)
+
+    print(f"Per-turn overhead over {args.turns} turns")
+    report("legacy", legacy)
+    report("registry", registry)
+    print(f"speedup    {statistics.mean(legacy) / max(statistics.mean(registry), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
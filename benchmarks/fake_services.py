@@ -0,0 +1,215 @@
+"""
+benchmarks/fake_services.py
+
+Local stand-ins for the OpenAI and Qdrant HTTP APIs, for load tests of the real server.
+
+The fake OpenAI server implements `POST /v1/chat/completions` (plain and streamed,
+including the usage chunk and `cached_tokens`) and `POST /v1/embeddings`. Agent nodes
+get the canned replies of `benchmarks.stub_llm`, so a session walks the whole
+workflow; recommendation calls get a small JSON object (or a sentence when no JSON
+response format is requested). A prompt whose first 4096 characters were seen before
+reports 1024 cached tokens, which mimics provider-side prefix caching.
+
+The fake Qdrant server implements the version check and `POST /collections/{name}/points/query`.
+
+Both add a configurable latency with uniform jitter to every call.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from benchmarks.stub_llm import stub_reply_for
+from config.config import RAG_EMBEDDING_DIMENSIONS
+
+STUB_RECOMMENDATION_REPLY = {"recommendations": [], "warnings": []}
+STUB_TEXT_REPLY = "This challenge will attract a broad community of developers and deliver a working prototype."
+AGENT_PHRASES = ("define the scope of the work", "generate specification details")
+
+
+def jittered(latency: float, jitter: float) -> float:
+    """
+    Return `latency` scaled by a uniform factor in [1 - jitter, 1 + jitter].
+    """
+    return max(0.0, latency * random.uniform(1 - jitter, 1 + jitter))
+
+
+def _to_langchain(messages: List[Dict[str, Any]]) -> List[BaseMessage]:
+    classes = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+    return [classes.get(m.get("role"), HumanMessage)(content=m.get("content") or "") for m in messages]
+
+
+def fake_reply(body: Dict[str, Any], scope_turns: int) -> str:
+    messages = body.get("messages") or []
+    system = messages[0].get("content", "") if messages else ""
+    # Recommenders send a system and a user message; agent nodes add their history
+    is_agent = any(phrase in system for phrase in AGENT_PHRASES) or len(messages) > 2
+    if is_agent:
+        return stub_reply_for(_to_langchain(messages), scope_turns)
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(STUB_RECOMMENDATION_REPLY)
+    return STUB_TEXT_REPLY
+
+
+class FakeOpenAI:
+    """
+    OpenAI-compatible chat completions and embeddings with simulated latency.
+
+    Args:
+        ttft: Mean seconds before the first token (or the whole reply when not streamed).
+        latency: Mean total seconds of a chat completion; the rest after `ttft` is spread over the chunks.
+        embedding_latency: Mean seconds of an embedding call.
+        jitter: Relative uniform jitter applied to every latency.
+        chunk_size: Characters per streamed chunk.
+        scope_turns: User replies the scope discussion asks for.
+    """
+
+    def __init__(self, ttft: float = 0.3, latency: float = 1.0, embedding_latency: float = 0.1, jitter: float = 0.2, chunk_size: int = 16, scope_turns: int = 1):
+        self.ttft = ttft
+        self.latency = latency
+        self.embedding_latency = embedding_latency
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.scope_turns = scope_turns
+        self.seen_prefixes = set()
+        self.requests = 0
+        self.app = Starlette(routes=[
+            Route("/v1/chat/completions", self.chat_completions, methods=["POST"]),
+            Route("/v1/embeddings", self.embeddings, methods=["POST"]),
+        ])
+
+    def _usage(self, body: Dict[str, Any], reply: str) -> Dict[str, Any]:
+        prompt = "".join(str(m.get("content") or "") for m in body.get("messages") or [])
+        prompt_tokens = len(prompt) // 4 + 1
+        prefix = hashlib.sha1(prompt[:4096].encode("utf-8")).hexdigest()
+        cached = 1024 if prompt_tokens >= 1024 and prefix in self.seen_prefixes else 0
+        self.seen_prefixes.add(prefix)
+        completion_tokens = len(reply) // 4 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    async def chat_completions(self, request: Request):
+        self.requests += 1
+        body = await request.json()
+        model = body.get("model", "fake")
+        reply = fake_reply(body, self.scope_turns)
+        usage = self._usage(body, reply)
+        completion_id = f"chatcmpl-{random.getrandbits(64):x}"
+        ttft = jittered(self.ttft, self.jitter)
+        total = max(ttft, jittered(self.latency, self.jitter))
+
+        if not body.get("stream"):
+            await asyncio.sleep(total)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+                "usage": usage,
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        pieces = [reply[i:i + self.chunk_size] for i in range(0, len(reply), self.chunk_size)]
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, chunk_usage=None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [] if chunk_usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if chunk_usage:
+                data["usage"] = chunk_usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            await asyncio.sleep(ttft)
+            interval = (total - ttft) / max(1, len(pieces) - 1)
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(interval)
+                yield chunk({"role": "assistant", "content": piece} if i == 0 else {"content": piece})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def embeddings(self, request: Request):
+        body = await request.json()
+        inputs = body.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        await asyncio.sleep(jittered(self.embedding_latency, self.jitter))
+        data = []
+        for i, text in enumerate(inputs):
+            seed = int.from_bytes(hashlib.sha1(str(text).encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).normal(size=RAG_EMBEDDING_DIMENSIONS)
+            vector /= np.linalg.norm(vector)
+            data.append({"object": "embedding", "index": i, "embedding": vector.tolist()})
+        return JSONResponse({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": 8, "total_tokens": 8},
+        })
+
+
+class FakeQdrant:
+    """
+    Qdrant-compatible similarity search over a fixed set of challenge payloads.
+
+    Args:
+        latency: Mean seconds of a query.
+        jitter: Relative uniform jitter applied to the latency.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.2):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.app = Starlette(routes=[
+            Route("/", self.root, methods=["GET"]),
+            Route("/collections/{collection}/points/query", self.query_points, methods=["POST"]),
+        ])
+
+    async def root(self, request: Request):
+        return JSONResponse({"title": "qdrant - vector search engine", "version": "1.15.0"})
+
+    async def query_points(self, request: Request):
+        self.requests += 1
+        body = await request.json()
+        started = time.perf_counter()
+        await asyncio.sleep(jittered(self.latency, self.jitter))
+        points = [
+            {"id": i, "version": 0, "score": 0.9 - i * 0.05, "payload": {"id": f"fake-{i}", "name": f"Fake Challenge {i}"}}
+            for i in range(int(body.get("limit") or 2))
+        ]
+        return JSONResponse({"result": {"points": points}, "status": "ok", "time": time.perf_counter() - started})
+
+
+async def serve(app, port: int) -> uvicorn.Server:
+    """
+    Start `app` on 127.0.0.1:`port` in the running event loop and return once it accepts connections.
+    """
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
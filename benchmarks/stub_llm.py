@@ -0,0 +1,118 @@
+"""
+benchmarks/stub_llm.py
+
+Offline stand-ins for the LLM and RAG clients used by the agent workflow.
+
+StubChatModel answers every node with a canned JSON reply that matches the node's
+response format (`utils.structured_output`, patch mode for the spec discussion) after a
+configurable delay, so a full session walks discuss_scope -> select_schema ->
+search_similar_challenge -> generate_spec -> discuss_spec without any network access.
+"""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+STUB_SCOPE_REPLY = {
+    "message": "Great, the scope is clear.",
+    "completed": True,
+    "work_scope": {"description": "Build a food delivery web app for students", "type": "development"},
+    "suggestions": [],
+}
+STUB_SCOPE_QUESTION = {
+    "message": "Who are the main users of the app, and which platforms should it support?",
+    "completed": False,
+    "work_scope": {"description": "", "type": ""},
+    "suggestions": [],
+}
+STUB_SPEC_REPLY = {
+    "message": "Here is the generated specification.",
+    "completed": True,
+    "specification": {
+        "title": "Student Food Delivery App",
+        "overview": "A web app that lets students order food from campus restaurants.",
+        "requirements": "Students browse menus, place orders and track deliveries.",
+        "tech_stack": ["React", "Node.js"],
+        "deliverables": "Source code and deployment instructions.",
+        "tags": ["web", "food"],
+        "timeline": {"submission": 7, "review": 2, "appeals": 1},
+        "prize_structure": [{"type": "USD", "value": 1000}],
+    },
+    "reasoning_trace": [{"field": "title", "confidence": 0.9, "reason": "Derived from the scope."}],
+}
+STUB_DISCUSSION_REPLY = {
+    "message": "The specification is finalized.",
+    "completed": True,
+    "patch": [],
+    "reasoning_trace": [],
+}
+
+
+def stub_reply_for(messages: List[BaseMessage], scope_turns: int = 1) -> str:
+    """
+    Pick the canned reply matching the node that built the prompt.
+    The scope discussion asks follow-up questions until the user has answered `scope_turns` times.
+    """
+    system = messages[0].content if messages else ""
+    if "define the scope of the work" in system:
+        user_turns = sum(1 for message in messages if isinstance(message, HumanMessage))
+        return json.dumps(STUB_SCOPE_REPLY if user_turns >= scope_turns else STUB_SCOPE_QUESTION)
+    if "generate specification details" in system:
+        return json.dumps(STUB_SPEC_REPLY)
+    return json.dumps(STUB_DISCUSSION_REPLY)
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that returns canned node replies after `latency` seconds.
+    When streamed, the reply is spread evenly over the same latency in `chunk_size` pieces.
+    `scope_turns` sets how many user replies the scope discussion asks for.
+
+    With `blocking=True` the async path sleeps with `time.sleep`, reproducing what a
+    synchronous `llm.invoke` inside an `async def` node does to the event loop.
+    """
+
+    latency: float = 0.2
+    blocking: bool = False
+    chunk_size: int = 8
+    scope_turns: int = 1
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=stub_reply_for(messages, self.scope_turns)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=stub_reply_for(messages, self.scope_turns)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        reply = stub_reply_for(messages, self.scope_turns)
+        pieces = [reply[i:i + self.chunk_size] for i in range(0, len(reply), self.chunk_size)]
+        for piece in pieces:
+            if self.blocking:
+                time.sleep(self.latency / len(pieces))
+            else:
+                await asyncio.sleep(self.latency / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+class StubRAGHelper:
+    """RAGHelper replacement that returns a fixed similar challenge after `latency` seconds."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+
+    def search_similar_challenges(self, query_text: str):
+        time.sleep(self.latency)
+        return [{"id": "stub-1", "name": "Campus Food Ordering App"}]
@@ -2,5 +2,126 @@
 QDRANT_ENDPOINT = "https://d9edf050-e175-4cf1-8c4d-c3ee8c7cf9e2.us-east-1-1.aws.cloud.qdrant.io:6333"
 QDRANT_COLLECTION_NAME = "challenge_templates" # Qdrant collection name for challenge templates
 RAG_EMBEDDING_MODEL = "text-embedding-3-small" # OpenAI embedding model for RAG
+RAG_EMBEDDING_DIMENSIONS = 1536 # Length of the vectors returned by RAG_EMBEDDING_MODEL
 RAG_NUM_RETRIEVED_CHALLENGES = 2 # Number of challenges to retrieve from Qdran for RAG
-MAX_SPEC_CHANGES_ALLOWED = "unlimited" # or set to a specific number like 5
\ No newline at end of file
+RAG_RETRIEVAL_MODE = "local" # "local" searches the synced in-process replica and falls back to Qdrant, "qdrant" always queries Qdrant
+RAG_REPLICA_DIR = ".cache/qdrant_replica" # Directory of the local replica written by `python -m utils.vector_replica`
+MAX_SPEC_CHANGES_ALLOWED = "unlimited" # or set to a specific number like 5
+SPEC_DISCUSSION_PATCH_MODE = True # The spec discussion model returns JSON Patch edits to the current spec instead of the whole spec
+PLATFORM_SCHEMA_PATH = "config/platform_schema.json" # Challenge specification schemas per challenge type
+SCHEMA_RELOAD_INTERVAL = 5 # Seconds between checks of the schema file for changes
+AGENT_LLM_MODEL = "gpt-4.1" # OpenAI chat model used by the LangGraph agent nodes
+AGENT_LLM_TEMPERATURE = 0.5 # Sampling temperature for the LangGraph agent nodes
+RECOMMENDATION_LLM_MODEL = "gpt-4o-mini" # OpenAI chat model used by the recommendation endpoints
+
+# === MODEL ROUTING ===
+MODEL_ROUTES = { # Model tiers per agent node or recommendation endpoint, fastest first; a reply that fails validation escalates to the next tier. Others use their default model
+    "discuss_scope": ["gpt-4.1-mini", "gpt-4.1"], # Clarifying questions stay on the fast tier, completing the scope escalates
+}
+
+# === STRUCTURED OUTPUTS ===
+STRUCTURED_OUTPUTS_ENABLED = True # Request agent replies as strict JSON-schema structured outputs derived from the expected fields
+STRUCTURED_OUTPUT_REPAIR_MODEL = "gpt-4.1-mini" # Model that repairs a reply failing local validation; empty to fall back without a repair call
+
+# === OPENAI HTTP CLIENT ===
+OPENAI_MAX_CONNECTIONS = 100 # Upper bound of open connections in the shared OpenAI HTTP pool
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 20 # Idle connections kept warm for reuse
+OPENAI_KEEPALIVE_EXPIRY = 60 # Seconds an idle keep-alive connection is kept open
+OPENAI_REQUEST_TIMEOUT = 60 # Seconds before an OpenAI request is abandoned
+
+# === RECOMMENDATION ENDPOINTS ===
+RECOMMENDATION_MAX_CONCURRENCY = 8 # Default max in-flight LLM calls per recommendation endpoint and worker
+RECOMMENDATION_CONCURRENCY_LIMITS = { # Per-endpoint overrides of RECOMMENDATION_MAX_CONCURRENCY
+    "validate-challenge": 4,
+}
+
+# === CHALLENGE VALIDATION ===
+VALIDATION_RULES_ENABLED = True # Run the deterministic checks of agent/challenge_rules.py before the LLM review of /api/validate-challenge
+VALIDATION_SKIP_LLM_ON_ERRORS = True # Return the blocking rule errors without an LLM review until they are fixed
+
+# === LLM SCHEDULER ===
+LLM_SCHEDULER_ENABLED = True # Queue every chat completion of a worker by model rate limits, priority class and session
+LLM_RATE_LIMITS = { # Requests and tokens per minute per model and worker (the account limits divided by the gunicorn workers); other models are not limited
+    "gpt-4.1": {"rpm": 1250, "tpm": 200000},
+    "gpt-4.1-mini": {"rpm": 1250, "tpm": 1000000},
+    "gpt-4o-mini": {"rpm": 1250, "tpm": 1000000},
+}
+LLM_DEFAULT_COMPLETION_TOKENS = 1024 # Completion tokens reserved for a call that sets no max_tokens
+
+# === LLM DEADLINES AND HEDGING ===
+LLM_DEFAULT_DEADLINE = 30 # Seconds an LLM call may take, retries included, before it fails
+LLM_DEADLINES = { # Per-endpoint and per-node overrides of LLM_DEFAULT_DEADLINE; for streamed agent turns it bounds the time to the first token
+    "impact-preview": 10,
+    "validate-challenge": 20,
+    "generate_spec": 60,
+}
+LLM_MAX_RETRIES = 2 # Retries of an LLM call that timed out, hit a rate limit or a server error
+LLM_RETRY_BACKOFF_BASE = 0.5 # Max seconds of the first retry backoff, doubled per retry (full jitter)
+LLM_RETRY_BACKOFF_MAX = 8 # Max seconds of any retry backoff
+LLM_HEDGING_ENABLED = True # Send a duplicate request when an LLM call is slower than the observed p95 and keep the first answer
+LLM_HEDGE_QUANTILE = 0.95 # Latency quantile per endpoint or node after which a call is hedged
+LLM_HEDGE_MIN_SAMPLES = 20 # Calls observed for an endpoint or node before its calls are hedged
+LLM_HEDGE_MIN_DELAY = 1.0 # Min seconds before a hedge is sent
+LLM_HEDGE_MAX_RATE = 0.05 # Max hedges per call of an endpoint or node; no hedge is sent while calls queue for the model
+
+# === RESPONSE CACHE ===
+RESPONSE_CACHE_ENABLED = True # Cache recommendation responses keyed on prompt template, inputs, model and temperature
+RESPONSE_CACHE_MAX_ENTRIES = 2048 # Max entries kept in memory per worker (LRU eviction)
+RESPONSE_CACHE_TTL = 6 * 60 * 60 # Seconds a cached response stays valid
+RESPONSE_CACHE_DIR = None # Directory for the compressed on-disk tier shared by workers, e.g. ".cache/responses". None disables it
+
+# === REQUEST COALESCING ===
+SINGLE_FLIGHT_ENABLED = True # Identical LLM and embedding calls that are in flight at the same time share one upstream call
+
+# === SPECULATIVE PREFETCH ===
+PREFETCH_ENABLED = False # Warm the step recommendations for the top challenge types returned by /api/recommendations
+PREFETCH_TOP_K = 2 # Number of top-ranked challenge types to prefetch
+PREFETCH_MAX_CONCURRENCY = 2 # Max prefetch LLM calls in flight per worker
+PREFETCH_MAX_CALLS_PER_MINUTE = 60 # Budget of prefetch LLM calls per worker and minute
+PREFETCH_MAX_INTERACTIVE_IN_FLIGHT = 4 # Prefetch stops while more interactive LLM calls than this are in flight
+
+# === STREAMING ===
+AGENT_STREAMING_ENABLED = True # Stream agent replies to the WebSocket token by token before the final message
+AGENT_STREAM_FLUSH_INTERVAL = 0.05 # Seconds between coalesced streaming frames sent to the client
+
+# === SESSION OUTPUT ===
+OUTPUT_QUEUE_MAX_SIZE = 256 # Max queued outgoing messages per session before the agent waits for the client
+OUTPUT_SEND_TIMEOUT = 10 # Seconds a single WebSocket send may take before the client is considered gone
+
+# === SESSIONS ===
+SESSION_STORE_BACKEND = "sqlite" # "sqlite" shares message history across the workers of a node, "memory" keeps it per worker
+SESSION_STORE_PATH = ".cache/sessions.sqlite3" # Database file of the sqlite session store
+SESSION_TTL = 24 * 60 * 60 # Seconds of inactivity after which a session's history is evicted
+SESSION_MAX_SESSIONS = 10000 # Max sessions kept in the store (least recently used are evicted; the sqlite store enforces it every SESSION_SWEEP_INTERVAL)
+SESSION_MAX_HISTORY_BYTES = 512 * 1024 # Max message history per session; oldest messages are dropped beyond it
+SESSION_MAX_ACTIVE = 500 # Max live agent conversations per worker
+SESSION_IDLE_TIMEOUT = 30 * 60 # Seconds a disconnected live conversation is kept before it is stopped
+SESSION_SWEEP_INTERVAL = 60 # Seconds between session eviction sweeps
+
+# === CHECKPOINTS ===
+CHECKPOINT_ENABLED = True # Persist the agent workflow state after every node so conversations can resume
+CHECKPOINT_PATH = ".cache/checkpoints.sqlite3" # Database file shared by the workers of a node
+CHECKPOINT_COMPRESSION_LEVEL = 3 # zstd level for checkpoint values
+CHECKPOINT_COMPRESSION_MIN_BYTES = 256 # Checkpoint values smaller than this are stored uncompressed
+
+# === EMBEDDING CACHE ===
+EMBEDDING_CACHE_ENABLED = True # Cache query embeddings on disk, shared by every worker on the node
+EMBEDDING_CACHE_DIR = ".cache/embeddings" # Directory of the memory-mapped vector file and its index
+EMBEDDING_CACHE_CAPACITY = 10000 # Max cached embeddings; the oldest are overwritten beyond it
+
+# === CONVERSATION HISTORY ===
+AGENT_PROMPT_TOKEN_BUDGET = 16000 # Max prompt tokens (system prompt + history) per agent LLM call; older turns are summarized beyond it
+HISTORY_SUMMARY_TOKENS = 1000 # Tokens reserved for the summary of the older turns
+HISTORY_MIN_RECENT_MESSAGES = 2 # Most recent messages that are always sent verbatim
+HISTORY_SUMMARY_CHARS_PER_MESSAGE = 300 # Characters kept per message in the summary
+
+# === METRICS ===
+METRICS_ENABLED = True # Record Prometheus latency and token histograms, exposed on GET /metrics
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80) # Histogram buckets in seconds
+METRICS_TOKEN_BUCKETS = (0, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768) # Histogram buckets for token counts per LLM call
+
+# === CASSETTES ===
+CASSETTE_MODE = "off" # "record" stores every OpenAI and Qdrant response, "replay" answers from the recordings offline, "auto" replays and records misses
+CASSETTE_DIR = ".cache/cassettes" # Directory of the recordings, one file per request fingerprint
+CASSETTE_LATENCY_SCALE = 1.0 # Replayed calls take their recorded time multiplied by this (0 replays instantly)
+CASSETTE_LATENCY = None # Fixed seconds of simulated latency per replayed call, overriding the recorded timing
@@ -6,14 +6,22 @@ This module sets up a FastAPI server with WebSocket support for real-time commun
 """
 
 import sys
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, HTTPException, Request
 from fastapi.concurrency import asynccontextmanager
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import uvicorn
 import asyncio
-from utils.input_handler import add_websocket_input_queue
+from utils.input_handler import add_websocket_input_queue, remove_websocket_input_queue, set_output_handler
+from utils.output_bus import OutputBus
+from utils.session_store import SessionStore, create_session_store
+from utils.schema_registry import schema_registry
+from utils.history import count_tokens
+from utils.streaming import turn_latency
+from utils.prompt_layout import token_usage
+from utils.metrics import HTTP_DURATION, correlation_id, new_correlation_id, observe, render_metrics, route_label
 from agent.architect import ChallengeArchitect
+from utils.registry import get_llm, get_rag, get_workflow, get_checkpointer, get_openai_client, close_registry
 from agent.recommender import get_challenge_type_recommendations
 from agent.impact_recommender import get_impact_preview
 from agent.audience_recommender import get_audience_recommendations
@@ -23,9 +31,31 @@ from agent.timeline_recommender import get_timeline_recommendations
 from agent.evaluation_recommender import get_evaluation_recommendations
 from agent.communications_recommender import get_communications_recommendations
 from agent.conflict_detector import detect_conflicts
+from agent.batch_recommender import stream_step_recommendations
+from agent.prefetch import prefetcher
+from utils.cache import response_cache
+from utils.embedding_cache import embedding_cache
+from utils.cassette import cassette
+from utils.singleflight import embedding_flight, llm_flight
+from utils.scheduler import client_flow, llm_scheduler
+from utils.resilience import resilient_caller
+from utils.cascade import cascade_stats
+from utils.structured_output import structured_output_stats
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from config.config import (
+    OUTPUT_QUEUE_MAX_SIZE,
+    OUTPUT_SEND_TIMEOUT,
+    SESSION_MAX_ACTIVE,
+    SESSION_IDLE_TIMEOUT,
+    SESSION_TTL,
+    SESSION_SWEEP_INTERVAL,
+    SCHEMA_RELOAD_INTERVAL
+)
+import functools
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
@@ -37,43 +67,149 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Correlation-ID"],
 )
 
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Tag everything recorded for this request with the caller's correlation ID, or a new one
+    cid = request.headers.get("x-correlation-id") or new_correlation_id()
+    token = correlation_id.set(cid)
+    # The scheduler queues the LLM calls of one client as one flow (see utils.scheduler)
+    flow_token = client_flow.set(request.headers.get("x-client-id") or (request.client.host if request.client else None))
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Correlation-ID"] = cid
+        return response
+    finally:
+        observe(HTTP_DURATION, time.perf_counter() - started, method=request.method, route=route_label(request.scope), status=str(status))
+        client_flow.reset(flow_token)
+        correlation_id.reset(token)
+
+# Live conversations of this worker; the message history lives in the shared session store
 active_websockets: Dict[str, WebSocket] = {}
 instances: Dict[str, ChallengeArchitect] = {}
-messages: Dict[str, List[Dict[str, any]]] = {}
-
-original_print_write = sys.stdout.write
+session_tasks: Dict[str, asyncio.Task] = {}
+last_seen: Dict[str, float] = {}
+# Opened on startup (see `lifespan`), so importing this module does not touch the disk
+session_store: Optional[SessionStore] = None
+# History writes and reads go through one thread, off the event loop and in the order they were made
+store_writer: Optional[ThreadPoolExecutor] = None
+output_bus = OutputBus(max_queue=OUTPUT_QUEUE_MAX_SIZE, send_timeout=OUTPUT_SEND_TIMEOUT)
 
 def add_message(session_id: str, message: str, role: str = "assistant"):
     """
-    Add a message to the session's message history.
+    Queue a message for the session's message history. Callers do not wait for the write;
+    the writer thread stores the messages in the order they were queued.
     """
-    if session_id not in messages:
-        messages[session_id] = []
-    messages[session_id].append({
+    write = store_writer.submit(session_store.append_message, session_id, {
         "role": role,
         "content": message,
         "timestamp": int(time.time())
     })
+    write.add_done_callback(log_failed_write)
+
+def log_failed_write(write):
+    if write.exception() is not None:
+        print(f"❌ Failed to store message: {write.exception()}")
+
+async def run_on_store_writer(fn, *args):
+    """
+    Run a session store operation on the writer thread, after every write queued before it.
+    """
+    return await asyncio.get_running_loop().run_in_executor(store_writer, fn, *args)
+
+def evict_session(session_id: str):
+    """
+    Stop a live conversation and release everything this worker holds for it.
+    The message history and the workflow checkpoint stay in their stores until they expire,
+    so a later reconnect resumes the conversation.
+    """
+    task = session_tasks.pop(session_id, None)
+    if task is not None and not task.done():
+        task.cancel()
+    instances.pop(session_id, None)
+    last_seen.pop(session_id, None)
+    remove_websocket_input_queue(session_id)
+    output_bus.close(session_id)
+
+def on_session_task_done(session_id: str, task: asyncio.Task):
+    """
+    Log a conversation that ended with an error and release it, so a reconnect starts it again
+    from its last checkpoint instead of attaching to a dead conversation.
+    """
+    if task.cancelled() or task.exception() is None:
+        return
+    error = task.exception()
+    print(f"❌ Conversation of session {session_id} failed: {error!r}")
+    traceback.print_exception(type(error), error, error.__traceback__)
+    if session_tasks.get(session_id) is not task:
+        return
+    evict_session(session_id)
+    websocket = active_websockets.pop(session_id, None)
+    if websocket is not None:
+        # Closing the connection makes the client reconnect, which resumes the conversation
+        asyncio.ensure_future(websocket.close(code=1011, reason="The conversation failed, please reconnect"))
 
-def custom_stdout_write(s):
-    if ":" in s:
-        session_id, message = s.split(":", 1)
-        add_message(session_id, message)
-        websocket = active_websockets.get(session_id)
-        if websocket:
+def make_room_for_session() -> bool:
+    """
+    Ensure there is room for one more live conversation, evicting the least recently
+    seen disconnected one if needed. Returns False when every slot is in active use.
+    """
+    if len(instances) < SESSION_MAX_ACTIVE:
+        return True
+    idle = [s for s in instances if s not in active_websockets]
+    if not idle:
+        return False
+    evict_session(min(idle, key=lambda s: last_seen.get(s, 0)))
+    return True
+
+async def sweep_sessions():
+    """
+    Periodically stop disconnected conversations that have been idle for too long
+    and expire old message histories and workflow checkpoints.
+    """
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        cutoff = time.time() - SESSION_IDLE_TIMEOUT
+        for session_id, seen in list(last_seen.items()):
+            if session_id not in active_websockets and seen < cutoff:
+                print(f"Evicting idle session: {session_id}")
+                evict_session(session_id)
+        try:
+            await run_on_store_writer(session_store.evict_expired)
+        except Exception as e:
+            print(f"❌ Failed to evict expired sessions: {e}")
+        checkpointer = get_checkpointer()
+        if checkpointer is not None:
             try:
-                asyncio.create_task(websocket.send_text(message))
-            except RuntimeError:
-                pass
-        else:
-            # If no WebSocket is active, just print to stdout
-            original_print_write(s)
-    else:
-        original_print_write(s)
-
-sys.stdout.write = custom_stdout_write
+                await asyncio.to_thread(checkpointer.prune, SESSION_TTL)
+            except Exception as e:
+                print(f"❌ Failed to prune expired checkpoints: {e}")
+
+async def watch_schema_file():
+    """
+    Periodically reload the platform schemas when the schema file changes.
+    """
+    while True:
+        await asyncio.sleep(SCHEMA_RELOAD_INTERVAL)
+        if await asyncio.to_thread(schema_registry.reload_if_changed):
+            print("Reloaded platform schemas")
+
+async def route_output(session_id: str, payload, transient: bool = False):
+    """
+    Deliver agent output to the session: queue it on the session's ordered output channel,
+    then record it in the message history unless it is a transient streaming frame.
+    """
+    await output_bus.publish(session_id, payload, transient=transient)
+    if not transient:
+        add_message(session_id, payload)
+
+set_output_handler(route_output)
 sys.stdout.reconfigure(encoding='utf-8')
 
 # Pydantic models for API requests
@@ -108,6 +244,10 @@ class CommunicationRecommendationRequest(BaseModel):
     problem_statement: str
     challenge_type: str
 
+class StepRecommendationsRequest(BaseModel):
+    problem_statement: str
+    challenge_type: str
+
 class ValidationRequest(BaseModel):
     challenge_data: Dict[str, Any]
 
@@ -119,7 +259,10 @@ class SchemaRequest(BaseModel):
 @app.post("/api/recommendations")
 async def get_ai_recommendations(request: RecommendationRequest):
     try:
-        recommendations = get_challenge_type_recommendations(request.problem_statement)
+        recommendations = await get_challenge_type_recommendations(request.problem_statement)
+        if prefetcher is not None:
+            # Warm the later wizard steps for the types the user is most likely to pick
+            prefetcher.schedule(request.problem_statement, recommendations)
         return {"recommendations": recommendations}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -127,7 +270,7 @@ async def get_ai_recommendations(request: RecommendationRequest):
 @app.post("/api/impact-preview")
 async def get_ai_impact_preview(request: ImpactPreviewRequest):
     try:
-        preview = get_impact_preview(request.problem_statement, request.challenge_type)
+        preview = await get_impact_preview(request.problem_statement, request.challenge_type)
         return preview
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -135,7 +278,7 @@ async def get_ai_impact_preview(request: ImpactPreviewRequest):
 @app.post("/api/audience-recommendations")
 async def get_ai_audience_recommendations(request: AudienceRecommendationRequest):
     try:
-        recommendations = get_audience_recommendations(
+        recommendations = await get_audience_recommendations(
             request.problem_statement,
             request.challenge_type
         )
@@ -146,7 +289,7 @@ async def get_ai_audience_recommendations(request: AudienceRecommendationRequest
 @app.post("/api/submission-recommendations")
 async def get_ai_submission_recommendations(request: SubmissionRecommendationRequest):
     try:
-        recommendations = get_submission_recommendations(
+        recommendations = await get_submission_recommendations(
             request.problem_statement,
             request.challenge_type
         )
@@ -157,7 +300,7 @@ async def get_ai_submission_recommendations(request: SubmissionRecommendationReq
 @app.post("/api/prize-recommendations")
 async def get_ai_prize_recommendations(request: PrizeRecommendationRequest):
     try:
-        recommendations = get_prize_recommendations(
+        recommendations = await get_prize_recommendations(
             request.problem_statement,
             request.challenge_type
         )
@@ -168,7 +311,7 @@ async def get_ai_prize_recommendations(request: PrizeRecommendationRequest):
 @app.post("/api/timeline-recommendations")
 async def get_ai_timeline_recommendations(request: TimelineRecommendationRequest):
     try:
-        recommendations = get_timeline_recommendations(
+        recommendations = await get_timeline_recommendations(
             request.problem_statement,
             request.challenge_type
         )
@@ -179,7 +322,7 @@ async def get_ai_timeline_recommendations(request: TimelineRecommendationRequest
 @app.post("/api/evaluation-recommendations")
 async def get_ai_evaluation_recommendations(request: EvaluationRecommendationRequest):
     try:
-        recommendations = get_evaluation_recommendations(
+        recommendations = await get_evaluation_recommendations(
             request.problem_statement,
             request.challenge_type
         )
@@ -190,7 +333,7 @@ async def get_ai_evaluation_recommendations(request: EvaluationRecommendationReq
 @app.post("/api/communications-recommendations")
 async def get_ai_communications_recommendations(request: CommunicationRecommendationRequest):
     try:
-        recommendations = get_communications_recommendations(
+        recommendations = await get_communications_recommendations(
             request.problem_statement,
             request.challenge_type
         )
@@ -198,10 +341,22 @@ async def get_ai_communications_recommendations(request: CommunicationRecommenda
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/step-recommendations")
+async def get_ai_step_recommendations(request: StepRecommendationsRequest):
+    """
+    Streams the recommendations of every wizard step as NDJSON, one line per section
+    in completion order, followed by a summary line with per-section timings.
+    """
+    async def ndjson_lines():
+        async for section in stream_step_recommendations(request.problem_statement, request.challenge_type):
+            yield json.dumps(section) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @app.post("/api/validate-challenge")
 async def validate_challenge_configuration(request: ValidationRequest):
     try:
-        analysis = detect_conflicts(request.challenge_data)
+        analysis = await detect_conflicts(request.challenge_data)
         return analysis
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -209,28 +364,14 @@ async def validate_challenge_configuration(request: ValidationRequest):
 @app.post("/api/get-schema-for-step")
 async def get_schema_for_step(request: SchemaRequest):
     try:
-        with open("config/platform_schema.json", "r") as f:
-            schemas = json.load(f)
-
-        # Robust matching for challenge_type (case-insensitive and strips whitespace)
+        # Indexed by normalized challenge type (case-insensitive, whitespace stripped)
         req_challenge_type = request.challenge_type.strip().lower()
-        challenge_schema = next((s for s in schemas if s["challenge_type"].strip().lower() == req_challenge_type), None)
+        step_schema = schema_registry.get_step_schema(req_challenge_type, request.step_id)
 
-        if not challenge_schema:
+        if step_schema is None:
             print(f"DEBUG: Challenge type '{req_challenge_type}' not found in schema.")
             raise HTTPException(status_code=404, detail=f"Challenge type '{req_challenge_type}' not found")
 
-        # This mapping defines which fields from the schema belong to which step
-        step_to_field_mapping = {
-            "submission-requirements": ["deliverables"],
-            "prize-configuration": ["prize_structure"],
-            "timeline-milestones": ["timeline"]
-            # Add other mappings here
-        }
-
-        required_fields = step_to_field_mapping.get(request.step_id, [])
-        step_schema = {key: value for key, value in challenge_schema["fields"].items() if key in required_fields}
-
         return {"schema": step_schema}
     except Exception as e:
         # Log the actual error for debugging
@@ -238,11 +379,81 @@ async def get_schema_for_step(request: SchemaRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    embeddings = embedding_cache.stats() if embedding_cache is not None else None
+    cassettes = cassette.stats() if cassette is not None else None
+    coalescing = {
+        "llm": llm_flight.stats() if llm_flight is not None else None,
+        "embeddings": embedding_flight.stats() if embedding_flight is not None else None,
+    }
+    if response_cache is None:
+        return {"enabled": False, "embeddings": embeddings, "cassette": cassettes, "coalescing": coalescing}
+    stats = {"enabled": True, **response_cache.stats()}
+    if prefetcher is not None:
+        stats["prefetch"] = prefetcher.stats()
+    stats["embeddings"] = embeddings
+    stats["cassette"] = cassettes
+    stats["coalescing"] = coalescing
+    return stats
+
+
+@app.get("/api/turn-stats")
+async def get_turn_stats():
+    return {"turns": turn_latency.summary(), "structured_output": structured_output_stats.summary()}
+
+
+@app.get("/api/token-stats")
+async def get_token_stats():
+    return {"usage": token_usage.summary()}
+
+
+@app.get("/api/llm-call-stats")
+async def get_llm_call_stats():
+    return {"calls": resilient_caller.stats()}
+
+
+@app.get("/api/cascade-stats")
+async def get_cascade_stats():
+    return {"routes": cascade_stats.summary()}
+
+
+@app.get("/api/scheduler-stats")
+async def get_scheduler_stats():
+    if llm_scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, "models": llm_scheduler.stats()}
+
+
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    body, content_type = render_metrics(request.headers.get("accept"))
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/api/output-stats")
+async def get_output_stats():
+    return output_bus.stats()
+
+
+@app.get("/api/session-stats")
+async def get_session_stats():
+    checkpointer = get_checkpointer()
+    return {
+        "live_sessions": len(instances),
+        "connected_sessions": len(active_websockets),
+        "max_live_sessions": SESSION_MAX_ACTIVE,
+        "store": await asyncio.to_thread(session_store.stats),
+        "checkpoints": await asyncio.to_thread(checkpointer.stats) if checkpointer is not None else None
+    }
+
+
 @app.get("/messages")
 async def get_messages(session: str = Query(...)):
     return {
         "session": session,
-        "messages": messages.get(session, [])
+        # Behind the writes still queued, so the history includes every message sent so far
+        "messages": await run_on_store_writer(session_store.get_messages, session)
     }
 
 @app.websocket("/ws")
@@ -253,7 +464,13 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=1008, reason="Session ID is required")
         return
 
+    if session not in instances and not make_room_for_session():
+        await websocket.close(code=1013, reason="Server is busy, please try again later")
+        return
+
     active_websockets[session] = websocket
+    output_bus.attach(session, websocket)
+    last_seen[session] = time.time()
 
     from utils.input_handler import websocket_input_queues
     input_queue = (websocket_input_queues or {}).get(session)
@@ -263,7 +480,8 @@ async def websocket_endpoint(websocket: WebSocket):
 
     if session not in instances:
         instances[session] = ChallengeArchitect(session=session)
-        asyncio.create_task(instances[session].process_challenge())
+        session_tasks[session] = asyncio.create_task(instances[session].process_challenge())
+        session_tasks[session].add_done_callback(functools.partial(on_session_task_done, session))
 
     try:
         while True:
@@ -276,17 +494,41 @@ async def websocket_endpoint(websocket: WebSocket):
                 await websocket.send_text("Error: Empty message received.")
                 continue
             add_message(session, content, role="user")
+            last_seen[session] = time.time()
             await input_queue.put(content)
     except WebSocketDisconnect:
         if active_websockets.get(session) == websocket:
             print(f"WebSocket disconnected for session: {session}")
             active_websockets.pop(session, None)
+        output_bus.detach(session, websocket)
+        last_seen[session] = time.time()
     except Exception as e:
         print(f"Error While listening from WebSocket. {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global session_store, store_writer
+    store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+    session_store = await run_on_store_writer(create_session_store)
+    # Warm the shared clients and compiled workflow so the first session doesn't pay for them
+    get_llm()
+    get_rag()
+    get_workflow()
+    get_openai_client()
+    schema_registry.reload_if_changed()
+    count_tokens("")  # loads the tokenizer, which is downloaded on first use
+    if response_cache is not None:
+        await asyncio.to_thread(response_cache.prune_disk)
+    sweeper = asyncio.create_task(sweep_sessions())
+    schema_watcher = asyncio.create_task(watch_schema_file())
     yield
+    sweeper.cancel()
+    schema_watcher.cancel()
+    if prefetcher is not None:
+        prefetcher.cancel_all()
+    await close_registry()
+    # Let queued history writes land before the worker exits
+    store_writer.shutdown(wait=True)
 
 app.router.lifespan_context = lifespan
 
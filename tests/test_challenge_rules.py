@@ -0,0 +1,105 @@
+"""
+tests/test_challenge_rules.py
+
+Unit tests of the deterministic challenge checks in `agent.challenge_rules`.
+"""
+from agent.challenge_rules import check_challenge
+
+
+def _development(**steps):
+    # A development challenge that passes every check, with `steps` merged in
+    data = {
+        "challengeType": "development",
+        "startDate": "2026-01-01",
+        "endDate": "2026-01-31",
+        "prizeType": "monetary",
+        "totalBudget": 1000,
+        "prizes": [{"place": 1, "amount": 600}, {"place": 2, "amount": 400}],
+        "deliverables": "Source code and deployment instructions.",
+    }
+    data.update(steps)
+    return data
+
+
+def test_valid_challenge_has_no_findings():
+    assert check_challenge(_development()) == {"errors": [], "warnings": []}
+
+
+def test_end_before_start_is_an_error():
+    errors = check_challenge(_development(startDate="2026-02-01", endDate="2026-01-31"))["errors"]
+    assert errors == ["The end date (2026-01-31) must be after the start date (2026-02-01)."]
+
+
+def test_one_day_challenge_is_allowed():
+    assert check_challenge(_development(startDate="2026-01-01", endDate="2026-01-01"))["errors"] == []
+
+
+def test_times_on_the_same_day_are_compared():
+    assert check_challenge(_development(startDate="2026-01-01T10:00", endDate="2026-01-01T18:00"))["errors"] == []
+    errors = check_challenge(_development(startDate="2026-01-01T18:00", endDate="2026-01-01T10:00"))["errors"]
+    assert len(errors) == 1 and "must be after the start date" in errors[0]
+
+
+def test_invalid_date_is_an_error():
+    errors = check_challenge(_development(endDate="next month"))["errors"]
+    assert errors == ["The end date 'next month' is not a valid date. Please use the YYYY-MM-DD format."]
+
+
+def test_milestone_outside_the_timeline_is_an_error():
+    findings = check_challenge(_development(milestones=[
+        {"name": "Kickoff", "date": "2025-12-15"},
+        {"name": "Review", "date": "2026-01-20"},
+        {"name": "Checkpoint", "date": "2026-01-10"},
+    ]))
+    assert findings["errors"] == ["The milestone 'Kickoff' (2025-12-15) is before the challenge starts (2026-01-01)."]
+    assert findings["warnings"] == ["The milestone 'Checkpoint' is dated before 'Review'; check the milestone order."]
+
+
+def test_prizes_over_budget_is_an_error():
+    errors = check_challenge(_development(totalBudget="$900"))["errors"]
+    assert errors == ["The prize amounts add up to 1000, more than the total budget of 900."]
+
+
+def test_prize_step_grouped_under_a_prizes_section():
+    data = _development()
+    for key in ("prizeType", "totalBudget", "prizes"):
+        del data[key]
+    data["prizes"] = {"prizeType": "monetary", "totalBudget": "1,000", "prizes": [{"amount": 600}, {"amount": 600}]}
+    assert check_challenge(data)["errors"] == ["The prize amounts add up to 1200, more than the total budget of 1000."]
+
+
+def test_unparseable_prize_amount_is_reported():
+    errors = check_challenge(_development(prizes=[{"amount": "a laptop"}, {"amount": 400}]))["errors"]
+    assert errors == ["These prize amounts are not valid amounts: a laptop."]
+
+
+def test_monetary_prize_type_needs_a_budget():
+    data = _development(prizes=[])
+    del data["totalBudget"]
+    assert check_challenge(data)["errors"] == ["A 'monetary' prize type needs a prize budget or prize amounts."]
+
+
+def test_required_prize_structure():
+    data = _development(prizeType="none", prizes=[])
+    del data["totalBudget"]
+    assert check_challenge(data)["errors"] == ["'development' challenges require a prize structure."]
+
+
+def test_missing_submission_field_is_an_error():
+    data = _development()
+    del data["deliverables"]
+    errors = check_challenge(data)["errors"]
+    assert errors == ["'development' challenges require deliverables: describe what participants must submit."]
+
+
+def test_submission_step_grouped_under_a_section():
+    data = _development()
+    del data["deliverables"]
+    data["submissionRequirements"] = {"deliverables": "A pull request.", "types": ["document", "hologram"]}
+    assert check_challenge(data) == {"errors": [], "warnings": ["Unknown submission types: hologram."]}
+
+
+def test_unknown_challenge_type_skips_the_schema_checks():
+    data = _development(challengeType="underwater-basket-weaving")
+    del data["deliverables"]
+    assert check_challenge(data)["errors"] == []
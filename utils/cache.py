@@ -0,0 +1,208 @@
+"""
+utils/cache.py
+
+Content-addressed cache for LLM responses.
+
+Entries are keyed on a hash of everything that determines the model output: the prompt
+template, the values formatted into it, the model and the sampling parameters. Editing a
+prompt in `config/prompts.py` therefore changes the key, and stale entries simply stop
+being hit and age out.
+
+The cache has an in-memory LRU tier with TTL eviction and an optional zstd-compressed
+on-disk tier that survives restarts and is shared by every worker on the node. Disk
+reads run in a worker thread and disk writes on a background writer thread, so the
+event loop never waits for the disk.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import zstandard
+
+from config.config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_DIR
+)
+
+
+def fingerprint(**parts: Any) -> str:
+    """
+    Return a stable hex digest of the given keyword parts.
+    Values must be JSON serializable; dict keys are sorted so ordering doesn't matter.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier LRU + TTL cache for LLM responses.
+
+    Args:
+        max_entries: Maximum number of entries kept in memory.
+        ttl: Seconds an entry stays valid, in both tiers.
+        disk_dir: Optional directory for the compressed on-disk tier. Disabled when None.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # zstd contexts are not thread-safe and the disk tier is used from several threads
+        self._local = threading.local()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value for `key`, or None on a miss or an expired entry.
+        A memory miss is looked up on disk in a worker thread.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        entry = await asyncio.to_thread(self._read_disk, key, now) if self.disk_dir else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        """
+        Store a JSON-serializable value under `key` in both tiers.
+        The disk write runs in the background; the entry is served from memory meanwhile.
+        """
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+        if self._writer is not None:
+            self._writer.submit(self._write_disk, key, entry)
+
+    def clear(self):
+        """
+        Drop every in-memory entry. The on-disk tier is left untouched.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and the current in-memory size.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def prune_disk(self) -> int:
+        """
+        Delete expired entries from the on-disk tier. Returns the number of files removed.
+        """
+        if not self.disk_dir:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _store(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _contexts(self) -> Tuple[zstandard.ZstdCompressor, zstandard.ZstdDecompressor]:
+        contexts = getattr(self._local, "contexts", None)
+        if contexts is None:
+            contexts = (zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor())
+            self._local.contexts = contexts
+        return contexts
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json.zst")
+
+    def _read_disk(self, key: str, now: float) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                record = json.loads(self._contexts()[1].decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zstandard.ZstdError) as e:
+            print(f"❌ Failed to read cache entry {key}: {e}")
+            return None
+        if now - record["created"] >= self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["created"], record["value"]
+
+    def _write_disk(self, key: str, entry: tuple):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        created, value = entry
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = self._contexts()[0].compress(json.dumps({"created": created, "value": value}).encode("utf-8"))
+            # Write to a temp file and rename so other workers never read a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"❌ Failed to write cache entry {key}: {e}")
+
+
+response_cache: Optional[ResponseCache] = (
+    ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_DIR)
+    if RESPONSE_CACHE_ENABLED else None
+)
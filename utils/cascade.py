@@ -0,0 +1,126 @@
+"""
+utils/cascade.py
+
+Model routing with a cascade per agent node and recommendation endpoint.
+
+`MODEL_ROUTES` lists the model tiers of a node or endpoint, fastest first. A call
+goes to the first tier, and its reply is accepted when it passes the caller's
+validation; otherwise (or when the tier fails) the call escalates to the next tier.
+The last tier's reply is always accepted. Nodes and endpoints without a route use
+their default model alone.
+
+Calls, escalations and latency per tier are reported at `GET /api/cascade-stats` and
+exported as `llm_escalations_total`; per-model latency is also in `llm_request_duration_seconds`.
+"""
+import json
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from config.config import MODEL_ROUTES
+from utils.metrics import LLM_ESCALATIONS, count
+
+T = TypeVar("T")
+
+
+def model_route(label: str, default: str) -> List[str]:
+    """
+    Return the model tiers of a node or endpoint, fastest first.
+    """
+    return list(MODEL_ROUTES.get(label) or [default])
+
+
+def valid_json_reply(content: Optional[str], required: Iterable[str] = ()) -> bool:
+    """
+    Return whether a reply is a JSON object that has every `required` field.
+    """
+    if not content:
+        return False
+    try:
+        reply = json.loads(content)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(reply, dict) and bool(reply) and all(field in reply for field in required)
+
+
+class CascadeStats:
+    """
+    Calls, escalations and latency per node or endpoint and model tier.
+    """
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+
+    def record(self, label: str, model: str, elapsed_ms: float, outcome: str):
+        totals = self._totals[label][model]
+        totals["calls"] += 1
+        totals[outcome] += 1
+        totals["elapsed_ms"] += elapsed_ms
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Return, per label and tier, the calls, how many were accepted, escalated after a
+        rejected reply or escalated after an error, how many failed on the last tier (nothing
+        escalates from there), the escalation rate and the mean latency.
+        """
+        result = {}
+        for label, tiers in self._totals.items():
+            result[label] = {}
+            for model, totals in tiers.items():
+                calls = int(totals["calls"])
+                escalated = int(totals["rejected"] + totals["error"])
+                result[label][model] = {
+                    "calls": calls,
+                    "accepted": int(totals["accepted"]),
+                    "rejected": int(totals["rejected"]),
+                    "errors": int(totals["error"]),
+                    "failed": int(totals["failed"]),
+                    "escalation_rate": round(escalated / calls, 4) if calls else 0.0,
+                    "mean_ms": round(totals["elapsed_ms"] / calls, 1) if calls else 0.0,
+                }
+        return result
+
+
+cascade_stats = CascadeStats()
+
+
+async def run_cascade(
+    label: str,
+    tiers: Sequence[Any],
+    call: Callable[[Any], Awaitable[T]],
+    accept: Optional[Callable[[T], bool]] = None,
+    model_name: Callable[[Any], str] = str,
+    on_escalate: Optional[Callable[[], Awaitable[None]]] = None,
+) -> T:
+    """
+    Call the tiers in order until one's result is accepted.
+
+    Args:
+        label: Node or endpoint name.
+        tiers: Models (or model clients), fastest first.
+        call: Makes the call with one tier.
+        accept: Validates the result of every tier but the last. None accepts any result.
+        model_name: Returns the model name of a tier, for the stats.
+        on_escalate: Awaited before every escalation, e.g. to discard streamed output.
+    """
+    for index, tier in enumerate(tiers):
+        last = index == len(tiers) - 1
+        model = model_name(tier)
+        started = time.perf_counter()
+        try:
+            result = await call(tier)
+        except Exception as e:
+            if last:
+                cascade_stats.record(label, model, (time.perf_counter() - started) * 1000, "failed")
+                raise
+            print(f"❌ {label} failed on {model}, escalating: {e}")
+            outcome = "error"
+        else:
+            outcome = "accepted" if last or accept is None or accept(result) else "rejected"
+        cascade_stats.record(label, model, (time.perf_counter() - started) * 1000, outcome)
+        if outcome == "accepted":
+            return result
+        count(LLM_ESCALATIONS, endpoint=label, model=model, reason=outcome)
+        if on_escalate is not None:
+            await on_escalate()
+    raise ValueError(f"no model tiers configured for {label}")
@@ -0,0 +1,355 @@
+"""
+utils/cassette.py
+
+Record/replay of the OpenAI and Qdrant calls, for reproducible, offline performance runs.
+
+Model output differs between runs and changes the path a conversation takes through the
+graph. With `CASSETTE_MODE = "record"` every response is stored in `CASSETTE_DIR`
+under a fingerprint of its request; with `"replay"` the same requests are answered from
+disk without network access, so a conversation replays deterministically. `"auto"`
+replays what was recorded and records the rest.
+
+OpenAI traffic is captured at the HTTP transport level (`CassetteTransport`), under the
+shared httpx client of the agent's ChatOpenAI and the recommenders' AsyncOpenAI client
+and under RAGHelper's embedding client. Streamed responses keep the arrival time of
+every chunk, so replays reproduce the time to first token. Qdrant searches are
+recorded by RAGHelper through `Cassette.call`.
+
+Replayed calls take their recorded time multiplied by `CASSETTE_LATENCY_SCALE`, or
+`CASSETTE_LATENCY` seconds when it is set. The mode and directory can be overridden
+with the CASSETTE_MODE and CASSETTE_DIR environment variables.
+"""
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from config.config import CASSETTE_MODE, CASSETTE_DIR, CASSETTE_LATENCY_SCALE, CASSETTE_LATENCY
+from utils.cache import fingerprint
+
+CASSETTE_MODES = ("off", "record", "replay", "auto")
+
+# Response headers that describe the original transfer rather than the content
+_DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "date"}
+
+
+class CassetteMissError(httpx.TransportError):
+    """
+    Raised in replay mode for a request that has no recording.
+    """
+
+
+class Cassette:
+    """
+    On-disk store of recorded responses keyed on request fingerprints.
+
+    Args:
+        directory: Directory of the recordings, one JSON file per request fingerprint.
+        mode: "record", "replay" or "auto".
+        latency_scale: Factor applied to the recorded latency of replayed calls.
+        latency: Fixed seconds per replayed call, overriding the recorded timing.
+    """
+
+    def __init__(self, directory: str, mode: str = "auto", latency_scale: float = 1.0, latency: Optional[float] = None):
+        if mode not in CASSETTE_MODES or mode == "off":
+            raise ValueError(f"invalid cassette mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.recorded = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def replays(self) -> bool:
+        return self.mode in ("replay", "auto")
+
+    @property
+    def records(self) -> bool:
+        return self.mode in ("record", "auto")
+
+    def key(self, kind: str, request: Any) -> str:
+        return fingerprint(kind=kind, request=request)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the recording for `key`, or None when there is none.
+        """
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to read cassette {key}: {e}")
+            return None
+        with self._lock:
+            self.replayed += 1
+        return entry
+
+    def save(self, key: str, entry: Dict[str, Any]):
+        """
+        Store a recording atomically, replacing an earlier one for the same request.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"❌ Failed to write cassette {key}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.recorded += 1
+
+    def miss(self, key: str, description: str) -> CassetteMissError:
+        with self._lock:
+            self.misses += 1
+        return CassetteMissError(f"no cassette recording for {description} ({key[:12]}) in {self.directory}")
+
+    def replay_delay(self, offset_ms: float, total_ms: float) -> float:
+        """
+        Return the seconds after the start of a replayed call at which a recorded offset is reached.
+        """
+        if self.latency is not None:
+            return self.latency * (offset_ms / total_ms if total_ms else 1.0)
+        return offset_ms / 1000 * self.latency_scale
+
+    def call(self, kind: str, request: Any, fn: Callable[[], Any]) -> Any:
+        """
+        Return the recorded result of a JSON-serializable call, or run `fn` and record its result.
+
+        Args:
+            kind: Name of the operation, e.g. "qdrant.query_points".
+            request: JSON-serializable arguments that determine the result.
+            fn: Performs the call when it is not replayed.
+        """
+        key = self.key(kind, request)
+        if self.replays:
+            entry = self.load(key)
+            if entry is not None:
+                time.sleep(self.replay_delay(entry["elapsed_ms"], entry["elapsed_ms"]))
+                return entry["response"]
+            if not self.records:
+                raise self.miss(key, kind)
+        started = time.perf_counter()
+        result = fn()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.save(key, {"kind": kind, "request": request, "response": result, "elapsed_ms": round(elapsed_ms, 3)})
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "replayed": self.replayed,
+            "recorded": self.recorded,
+            "misses": self.misses,
+        }
+
+
+def _request_fingerprint(request: httpx.Request) -> Tuple[str, Dict[str, Any]]:
+    """
+    Describe an HTTP request by method, path and body. The host, the query string and the
+    headers (API keys) are left out, so recordings work against any compatible endpoint.
+    """
+    body: Any = request.content.decode("utf-8", errors="replace")
+    try:
+        body = json.loads(body) if body else None
+    except ValueError:
+        pass
+    return f"{request.method} {request.url.path}", {"method": request.method, "path": request.url.path, "body": body}
+
+
+def _encode_body(data: bytes) -> Dict[str, str]:
+    try:
+        return {"body": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(data).decode("ascii")}
+
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry["body"].encode("utf-8")
+
+
+def _replay_chunks(entry: Dict[str, Any]) -> List[Tuple[float, bytes]]:
+    data = _decode_body(entry)
+    chunks, position = [], 0
+    for offset_ms, size in entry["chunks"]:
+        chunks.append((offset_ms, data[position:position + size]))
+        position += size
+    if position < len(data):
+        chunks.append((entry["elapsed_ms"], data[position:]))
+    return chunks
+
+
+def _is_recordable(response: httpx.Response) -> bool:
+    # Rate limits and server errors are transient and must not be replayed forever
+    return response.status_code < 500 and response.status_code != 429
+
+
+def _recording(kind: str, request: Dict[str, Any], response: httpx.Response, chunks: List[Tuple[float, bytes]], elapsed_ms: float) -> Dict[str, Any]:
+    data = b"".join(chunk for _, chunk in chunks)
+    return {
+        "kind": kind,
+        "request": request,
+        "status": response.status_code,
+        "headers": [[k, v] for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS],
+        **_encode_body(data),
+        "chunks": [[round(offset, 3), len(chunk)] for offset, chunk in chunks],
+        "elapsed_ms": round(elapsed_ms, 3),
+    }
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, started: float, on_complete: Callable[[List[Tuple[float, bytes]], float], None]):
+        self._stream = stream
+        self._started = started
+        self._on_complete = on_complete
+        self._chunks: List[Tuple[float, bytes]] = []
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._chunks.append(((time.perf_counter() - self._started) * 1000, chunk))
+            yield chunk
+        self._on_complete(self._chunks, (time.perf_counter() - self._started) * 1000)
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, chunks: List[Tuple[float, bytes]], total_ms: float):
+        self._cassette = cassette
+        self._chunks = chunks
+        self._total_ms = total_ms
+
+    async def __aiter__(self):
+        started = time.perf_counter()
+        for offset_ms, chunk in self._chunks:
+            delay = self._cassette.replay_delay(offset_ms, self._total_ms) - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that records or replays the responses of the wrapped transport.
+
+    Args:
+        cassette: The recording store.
+        transport: Transport that performs requests that are not replayed.
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        description, summary = _request_fingerprint(request)
+        key = self.cassette.key("http", summary)
+        if self.cassette.replays:
+            entry = self.cassette.load(key)
+            if entry is not None:
+                return httpx.Response(
+                    entry["status"],
+                    headers=entry["headers"],
+                    stream=_AsyncReplayStream(self.cassette, _replay_chunks(entry), entry["elapsed_ms"]),
+                    request=request,
+                )
+            if not self.cassette.records:
+                raise self.cassette.miss(key, description)
+
+        # Recorded bodies are stored as text, so ask for them uncompressed
+        request.headers["Accept-Encoding"] = "identity"
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+
+        if not _is_recordable(response):
+            return response
+
+        def on_complete(chunks: List[Tuple[float, bytes]], elapsed_ms: float):
+            self.cassette.save(key, _recording(description, summary, response, chunks, elapsed_ms))
+
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(response.stream, started, on_complete),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class CassetteSyncTransport(httpx.BaseTransport):
+    """
+    Blocking counterpart of `CassetteTransport`, for the synchronous OpenAI client.
+    Replayed responses are returned whole after their simulated latency.
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.BaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        description, summary = _request_fingerprint(request)
+        key = self.cassette.key("http", summary)
+        if self.cassette.replays:
+            entry = self.cassette.load(key)
+            if entry is not None:
+                time.sleep(self.cassette.replay_delay(entry["elapsed_ms"], entry["elapsed_ms"]))
+                return httpx.Response(entry["status"], headers=entry["headers"], content=_decode_body(entry), request=request)
+            if not self.cassette.records:
+                raise self.cassette.miss(key, description)
+
+        request.headers["Accept-Encoding"] = "identity"
+        started = time.perf_counter()
+        response = self.transport.handle_request(request)
+        try:
+            data = b"".join(response.stream)
+        finally:
+            response.stream.close()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if _is_recordable(response):
+            self.cassette.save(key, _recording(description, summary, response, [(elapsed_ms, data)], elapsed_ms))
+        return httpx.Response(response.status_code, headers=response.headers, content=data, extensions=response.extensions, request=request)
+
+    def close(self):
+        self.transport.close()
+
+
+def create_cassette() -> Optional[Cassette]:
+    mode = os.environ.get("CASSETTE_MODE", CASSETTE_MODE)
+    if mode == "off":
+        return None
+    return Cassette(
+        os.environ.get("CASSETTE_DIR", CASSETTE_DIR),
+        mode=mode,
+        latency_scale=CASSETTE_LATENCY_SCALE,
+        latency=CASSETTE_LATENCY,
+    )
+
+
+cassette: Optional[Cassette] = create_cassette()
@@ -0,0 +1,178 @@
+"""
+utils/embedding_cache.py
+
+Disk-backed cache of text embeddings shared by every worker on the node.
+
+Vectors live in a fixed-size NumPy memmap (`vectors.f32`, one float32 row per slot) and
+a small SQLite sidecar (`index.sqlite3`) maps a hash of model and text to its slot.
+Workers map the same file, so the vectors sit once in the OS page cache instead of in
+each worker's heap. Slots are reused in insertion order once the cache is full.
+
+Each index row carries a CRC of its vector. A reader that races a writer reusing the
+slot sees a mismatching CRC and treats the lookup as a miss instead of returning a
+torn vector.
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_CAPACITY,
+    RAG_EMBEDDING_DIMENSIONS
+)
+from utils.cache import fingerprint
+
+
+class EmbeddingCache:
+    """
+    Memory-mapped embedding cache keyed on model and text.
+
+    Args:
+        directory: Directory of the vector file and its index.
+        dimensions: Length of the cached vectors.
+        capacity: Number of vector slots; the oldest entries are overwritten beyond it.
+    """
+
+    def __init__(self, directory: str, dimensions: int, capacity: int = 10000):
+        self.directory = directory
+        self.dimensions = dimensions
+        self.capacity = capacity
+        self._vectors: Optional[np.memmap] = None
+        self._open_lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_ms = 0.0
+        self.miss_latency_ms = 0.0
+        self.misses_timed = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _open(self) -> np.memmap:
+        if self._vectors is not None:
+            return self._vectors
+        with self._open_lock:
+            if self._vectors is None:
+                os.makedirs(self.directory, exist_ok=True)
+                conn = self._connection()
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS entries (
+                        key TEXT PRIMARY KEY,
+                        slot INTEGER NOT NULL UNIQUE,
+                        crc INTEGER NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS meta (
+                        name TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    );
+                """)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("INSERT OR IGNORE INTO meta VALUES ('next_slot', 0)")
+                    # Size the (sparse) vector file while holding the index lock so workers agree on it
+                    path = os.path.join(self.directory, "vectors.f32")
+                    size = self.capacity * self.dimensions * 4
+                    with open(path, "ab") as f:
+                        if f.tell() < size:
+                            f.truncate(size)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimensions))
+        return self._vectors
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return fingerprint(model=model, text=text)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Return the cached embedding of `text` for `model`, or None on a miss.
+        """
+        start = time.perf_counter()
+        vectors = self._open()
+        row = self._connection().execute(
+            "SELECT slot, crc FROM entries WHERE key = ?", (self.key(model, text),)
+        ).fetchone()
+        vector = None
+        if row is not None:
+            candidate = np.array(vectors[row[0]])
+            if zlib.crc32(candidate.tobytes()) == row[1]:
+                vector = candidate.tolist()
+        self.lookup_ms += (time.perf_counter() - start) * 1000
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    def set(self, model: str, text: str, vector: List[float]):
+        """
+        Store an embedding, overwriting the oldest slot when the cache is full.
+        """
+        data = np.asarray(vector, dtype=np.float32)
+        if data.shape != (self.dimensions,):
+            print(f"❌ Not caching embedding of unexpected shape {data.shape}")
+            return
+        vectors = self._open()
+        key = self.key(model, text)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is None:
+                counter = conn.execute("SELECT value FROM meta WHERE name = 'next_slot'").fetchone()[0]
+                slot = counter % self.capacity
+                # Unlink the slot's previous entry before its vector is overwritten
+                conn.execute("DELETE FROM entries WHERE slot = ?", (slot,))
+                vectors[slot] = data
+                vectors.flush()
+                conn.execute("INSERT INTO entries VALUES (?, ?, ?)", (key, slot, zlib.crc32(data.tobytes())))
+                conn.execute("UPDATE meta SET value = ? WHERE name = 'next_slot'", (counter + 1,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record_miss_latency(self, elapsed_ms: float):
+        """
+        Record how long the embedding API took for a miss, to estimate the latency saved by hits.
+        """
+        self.miss_latency_ms += elapsed_ms
+        self.misses_timed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return this worker's hit rate and the estimated API latency saved by hits.
+        """
+        lookups = self.hits + self.misses
+        mean_miss_ms = self.miss_latency_ms / self.misses_timed if self.misses_timed else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "mean_lookup_ms": round(self.lookup_ms / lookups, 3) if lookups else 0.0,
+            "mean_api_ms": round(mean_miss_ms, 1),
+            "saved_ms": round(self.hits * mean_miss_ms, 1),
+            "capacity": self.capacity,
+        }
+
+
+embedding_cache: Optional[EmbeddingCache] = (
+    EmbeddingCache(EMBEDDING_CACHE_DIR, RAG_EMBEDDING_DIMENSIONS, EMBEDDING_CACHE_CAPACITY)
+    if EMBEDDING_CACHE_ENABLED else None
+)
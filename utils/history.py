@@ -0,0 +1,148 @@
+"""
+utils/history.py
+
+Token-budgeted compaction of the conversation histories sent to the agent LLM.
+
+The scope, spec generation and spec discussion conversations in ChallengeState grow with
+every turn. Before a node calls the model, `compact_history` counts the prompt tokens
+with tiktoken and, when the system prompt plus history exceed AGENT_PROMPT_TOKEN_BUDGET,
+replaces the oldest turns with a short extractive summary: the user's messages and the
+assistant's questions, truncated, newest first. The most recent messages are always
+kept verbatim, so the model always sees the latest state. The full history stays in
+the graph state; only the prompt is compacted.
+"""
+import json
+from typing import List, Optional
+
+import tiktoken
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from config.config import (
+    AGENT_LLM_MODEL,
+    AGENT_PROMPT_TOKEN_BUDGET,
+    HISTORY_SUMMARY_TOKENS,
+    HISTORY_MIN_RECENT_MESSAGES,
+    HISTORY_SUMMARY_CHARS_PER_MESSAGE
+)
+from utils.input_handler import async_print
+
+# Approximate per-message framing overhead of the chat format, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of `text` for the agent model.
+    Falls back to an estimate of 4 characters per token when the tokenizer is unavailable.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(AGENT_LLM_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken downloads its encodings on first use
+            print(f"❌ Failed to load the tokenizer, estimating token counts: {e}")
+            _encoding_failed = True
+    if _encoding is None:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _summary_line(message: BaseMessage) -> str:
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    if isinstance(message, HumanMessage):
+        role = "User"
+    else:
+        role = "Assistant"
+        # Assistant turns are JSON replies; their question or answer is in "message"
+        try:
+            text = json.loads(text).get("message") or ""
+        except (ValueError, AttributeError):
+            pass
+    text = " ".join(text.split())
+    if len(text) > HISTORY_SUMMARY_CHARS_PER_MESSAGE:
+        text = text[:HISTORY_SUMMARY_CHARS_PER_MESSAGE] + "..."
+    return f"- {role}: {text}" if text else ""
+
+
+def _summarize(messages: List[BaseMessage], budget: int) -> Optional[SystemMessage]:
+    header = "Summary of the earlier part of this conversation (older turns were shortened):"
+    # The first message is the user's original goal and is always kept
+    first_line = _summary_line(messages[0])
+    used = count_tokens(header) + (count_tokens(first_line) + 1 if first_line else 0)
+    lines: List[str] = []
+    for message in reversed(messages[1:]):
+        line = _summary_line(message)
+        if not line:
+            continue
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            break
+        used += tokens
+        lines.append(line)
+    body = ([first_line] if first_line else []) + lines[::-1]
+    if not body:
+        return None
+    return SystemMessage(content="\n".join([header, *body]))
+
+
+async def compact_history(
+    history: List[BaseMessage],
+    system_prompt: str,
+    node: str,
+    session: Optional[str] = None,
+    budget: int = AGENT_PROMPT_TOKEN_BUDGET,
+) -> List[BaseMessage]:
+    """
+    Return the chat history to send after `system_prompt`, compacted to fit the token budget.
+
+    Args:
+        history: The node's full conversation history.
+        system_prompt: The node's system prompt, counted against the budget.
+        node: Name of the calling graph node, used in the log line.
+        session: Session of the conversation, used in the log line.
+        budget: Maximum prompt tokens for the system prompt plus history.
+    """
+    system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+    sizes = [_message_tokens(message) for message in history]
+    total = system_tokens + sum(sizes)
+
+    if total <= budget:
+        await async_print(f"🔢 [{node}] prompt tokens: {total} (budget {budget})", session=session, debug_message=True)
+        return history
+
+    # Keep the newest messages that fit next to the summary, and always the latest few
+    available = budget - system_tokens - HISTORY_SUMMARY_TOKENS
+    keep_from = len(history)
+    used = 0
+    while keep_from > 0:
+        size = sizes[keep_from - 1]
+        if used + size > available and len(history) - keep_from >= HISTORY_MIN_RECENT_MESSAGES:
+            break
+        keep_from -= 1
+        used += size
+
+    compacted: List[BaseMessage] = list(history[keep_from:])
+    summary = _summarize(history[:keep_from], HISTORY_SUMMARY_TOKENS) if keep_from else None
+    if summary is not None:
+        compacted.insert(0, summary)
+        used += _message_tokens(summary)
+
+    await async_print(
+        f"🔢 [{node}] prompt tokens: {system_tokens + used} (budget {budget}, uncompacted {total}, "
+        f"{keep_from} older messages summarized)",
+        session=session,
+        debug_message=True
+    )
+    return compacted
@@ -1,9 +1,13 @@
 # input_handler.py
 import asyncio
 import sys
-from typing import Dict
+import time
+from typing import Any, Awaitable, Callable, Dict, Union
+
+from utils.metrics import record_input_wait
 
 websocket_input_queues: Dict[str, asyncio.Queue] = None
+output_handler: Callable[[str, Union[str, Dict[str, Any]], bool], Awaitable[None]] = None
 
 def add_websocket_input_queue(session: str, queue: asyncio.Queue):
     """
@@ -15,6 +19,21 @@ def add_websocket_input_queue(session: str, queue: asyncio.Queue):
         websocket_input_queues = {}
     websocket_input_queues[session] = queue
 
+def remove_websocket_input_queue(session: str):
+    """
+    Remove the WebSocket input queue of a session that is no longer live.
+    """
+    if websocket_input_queues is not None:
+        websocket_input_queues.pop(session, None)
+
+def set_output_handler(handler: Callable[[str, Union[str, Dict[str, Any]], bool], Awaitable[None]]):
+    """
+    Set the function used to deliver output to a session.
+    This function is called by the server with a coroutine taking (session, payload, transient).
+    """
+    global output_handler
+    output_handler = handler
+
 async def async_input(prompt: str = "", session: str = None) -> str:
     """
     Asynchronous input function that reads input from the WebSocket or standard input.
@@ -26,22 +45,34 @@ async def async_input(prompt: str = "", session: str = None) -> str:
         if websocket_input_queue is None:
             raise RuntimeError("websocket_input_queue is not initialized for this session.")
 
+        started = time.perf_counter()
         received_message = await websocket_input_queue.get()
+        record_input_wait(time.perf_counter() - started)
         return received_message.strip()
     else:
         # Fallback to standard input for CLI mode (e.g., running main.py)
-        return input(prompt).strip()
+        started = time.perf_counter()
+        received = input(prompt).strip()
+        record_input_wait(time.perf_counter() - started)
+        return received
 
 async def async_print(output, session: str = None, debug_message: bool = False):
     """
     Asynchronous print function that sends output to the WebSocket if a session exists.
     """
-    # In server mode (session exists), send output via the custom print hook.
+    # In server mode (session exists), send output through the session's output channel.
     # In CLI mode (no session), print directly to the console.
-    if session is not None and debug_message is False:
-        # This print statement is intercepted by the custom stdout in server.py
-        print(session + ":" + output, flush=True)
-        await asyncio.sleep(0.01)
+    if session is not None and debug_message is False and output_handler is not None:
+        await output_handler(session, output, False)
     else:
         # For debug messages or when running in CLI mode
         print(f"Session-{session}: {output}", flush=True)
+
+async def async_stream(frame: Dict[str, Any], session: str = None):
+    """
+    Asynchronous function that sends a transient streaming frame (a partial reply) to the session.
+    Streaming frames are not stored in the message history and are dropped in CLI mode,
+    where the complete reply is printed once it is available.
+    """
+    if session is not None and output_handler is not None:
+        await output_handler(session, frame, True)
@@ -0,0 +1,178 @@
+"""
+utils/json_stream.py
+
+Incremental parser for a JSON object that arrives in chunks, e.g. streamed LLM tokens.
+
+It does not build the whole document; it only reports, as early as possible:
+- the growing text of selected top-level string fields (e.g. "message"), and
+- each completed member of selected top-level object fields (e.g. "specification").
+
+The complete text should still be parsed with `json.loads` once the stream ends.
+"""
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Event tuples returned by `feed`
+STRING_DELTA = "string_delta"   # (STRING_DELTA, field, decoded_text)
+OBJECT_MEMBER = "object_member" # (OBJECT_MEMBER, field, key, value)
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "expect_key", "value_start", "watched")
+
+    def __init__(self, kind: str, watched: Optional[str] = None):
+        self.kind = kind            # "{" or "["
+        self.key = None             # Current member key (objects only)
+        self.expect_key = kind == "{"
+        self.value_start = None     # Buffer index where the current member value starts
+        self.watched = watched      # Name of the top-level field this object is reported for
+
+
+class IncrementalJSONParser:
+    """
+    Streaming scanner for a single JSON object.
+
+    Args:
+        string_fields: Top-level string fields whose text is reported as it grows.
+        object_fields: Top-level object fields whose members are reported once complete.
+    """
+
+    def __init__(self, string_fields: Iterable[str] = ("message",), object_fields: Iterable[str] = ("specification",)):
+        self.string_fields = set(string_fields)
+        self.object_fields = set(object_fields)
+        self.buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._streamed_field: Optional[str] = None
+        self._emitted_upto = 0
+
+    def feed(self, chunk: str) -> List[Tuple[Any, ...]]:
+        """
+        Consume the next chunk of text and return the events it completed.
+        """
+        events: List[Tuple[Any, ...]] = []
+        self.buffer += chunk
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+                continue
+
+            if char == '"':
+                self._start_string(i)
+            elif char in "{[":
+                self._push(char)
+            elif char in "}]":
+                self._complete_member(i, events)
+                if self._stack:
+                    self._stack.pop()
+            elif char == ":":
+                if self._stack and self._stack[-1].kind == "{":
+                    self._stack[-1].value_start = i + 1
+            elif char == ",":
+                self._complete_member(i, events)
+                if self._stack and self._stack[-1].kind == "{":
+                    self._stack[-1].expect_key = True
+
+        self._pos = len(buffer)
+        if self._in_string and self._streamed_field:
+            self._emit_string_delta(len(buffer), events, final=False)
+        return events
+
+    def _push(self, kind: str):
+        watched = None
+        if kind == "{" and len(self._stack) == 1:
+            top = self._stack[0]
+            if top.kind == "{" and top.key in self.object_fields:
+                watched = top.key
+        self._stack.append(_Frame(kind, watched))
+
+    def _start_string(self, i: int):
+        self._in_string = True
+        self._string_start = i + 1
+        frame = self._stack[-1] if self._stack else None
+        self._string_is_key = frame is not None and frame.kind == "{" and frame.expect_key
+        self._streamed_field = None
+        if not self._string_is_key and len(self._stack) == 1 and frame.kind == "{" and frame.key in self.string_fields:
+            self._streamed_field = frame.key
+            self._emitted_upto = self._string_start
+
+    def _end_string(self, i: int, events: List[Tuple[Any, ...]]):
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = _decode(self.buffer[self._string_start:i])
+            frame.expect_key = False
+        elif self._streamed_field:
+            self._emit_string_delta(i, events, final=True)
+            self._streamed_field = None
+
+    def _complete_member(self, i: int, events: List[Tuple[Any, ...]]):
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        if frame.kind != "{" or frame.value_start is None:
+            return
+        if frame.watched is not None:
+            raw = self.buffer[frame.value_start:i].strip()
+            try:
+                events.append((OBJECT_MEMBER, frame.watched, frame.key, json.loads(raw)))
+            except ValueError:
+                pass
+        frame.value_start = None
+        frame.key = None
+
+    def _emit_string_delta(self, end: int, events: List[Tuple[Any, ...]], final: bool):
+        raw = self.buffer[self._emitted_upto:end]
+        if not final:
+            raw = _trim_partial_escape(raw)
+        if not raw:
+            return
+        try:
+            text = _decode(raw)
+        except ValueError:
+            return
+        self._emitted_upto += len(raw)
+        if text:
+            events.append((STRING_DELTA, self._streamed_field, text))
+
+
+def _decode(raw: str) -> str:
+    return json.loads('"' + raw + '"')
+
+
+def _trim_partial_escape(raw: str) -> str:
+    """
+    Drop a trailing escape sequence that may be cut in the middle, so the rest can be decoded.
+    A high surrogate `\\uD8xx` is held back until its low surrogate arrives.
+    """
+    backslash = raw.rfind("\\")
+    if backslash == -1:
+        return raw
+    run_start = backslash
+    while run_start > 0 and raw[run_start - 1] == "\\":
+        run_start -= 1
+    if (backslash - run_start + 1) % 2 == 0:
+        # An even run of backslashes is a sequence of complete "\\\\" escapes
+        return raw
+    tail = raw[backslash:]
+    if len(tail) < 2:
+        return _trim_partial_escape(raw[:backslash])
+    if tail[1] == "u":
+        if len(tail) < 6:
+            return _trim_partial_escape(raw[:backslash])
+        if tail[2:4].upper() in ("D8", "D9", "DA", "DB") and len(tail) < 12:
+            return raw[:backslash]
+    return raw
@@ -0,0 +1,210 @@
+"""
+utils/llm.py
+
+Shared entry point for the OpenAI chat completions made by the recommendation endpoints.
+
+Every call goes through the process-wide AsyncOpenAI client (see `utils.registry`) and
+is bounded by a per-endpoint concurrency limit and deadline, so a burst of traffic on one wizard
+step cannot monopolize the worker's connections, and is admitted by the worker's
+rate-limiting scheduler (see `utils.scheduler`). Prompt-based calls made through
+`complete_prompt` are also served from the content-addressed response cache, and are
+laid out with their static instructions first for provider-side prefix caching (see
+`utils.prompt_layout`).
+"""
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config.config import RECOMMENDATION_MAX_CONCURRENCY, RECOMMENDATION_CONCURRENCY_LIMITS
+from utils.cache import fingerprint, response_cache
+from utils.cascade import model_route, run_cascade, valid_json_reply
+from utils.metrics import observe_llm_call
+from utils.prompt_layout import record_usage, render_prompt
+from utils.resilience import resilient_caller
+from utils.scheduler import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, CallPriority, Reservation, call_priority, estimate_tokens, llm_scheduler
+from utils.singleflight import llm_flight
+from utils.registry import get_openai_client
+
+# Priority class of the LLM calls made in the current task. Background work such as
+# speculative prefetch sets it so its calls stay out of the interactive endpoint limits
+# and queue behind interactive calls in the scheduler.
+request_priority: ContextVar[str] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+_endpoint_limits: Dict[str, asyncio.Semaphore] = {}
+_interactive_in_flight = 0
+
+
+def get_endpoint_limit(endpoint: str) -> asyncio.Semaphore:
+    """
+    Return the semaphore bounding in-flight LLM calls for the given endpoint.
+    """
+    semaphore = _endpoint_limits.get(endpoint)
+    if semaphore is None:
+        limit = RECOMMENDATION_CONCURRENCY_LIMITS.get(endpoint, RECOMMENDATION_MAX_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+        _endpoint_limits[endpoint] = semaphore
+    return semaphore
+
+
+async def create_chat_completion(endpoint: str, **kwargs: Any):
+    """
+    Create a chat completion with the shared async client, once the scheduler
+    (`utils.scheduler`) admits it under the priority class of the current task.
+    The call runs under the endpoint's deadline and is retried or hedged (see `utils.resilience`).
+
+    Args:
+        endpoint: Name of the calling endpoint, used to pick its concurrency limit.
+        **kwargs: Arguments forwarded to `client.chat.completions.create`.
+
+    Returns:
+        The OpenAI ChatCompletion response.
+    """
+    global _interactive_in_flight
+    priority = request_priority.get()
+    if priority != PRIORITY_INTERACTIVE:
+        # Background callers bound their own concurrency
+        return await resilient_caller.call(endpoint, lambda reservation: _send(reservation, kwargs), _reserve(priority, kwargs))
+
+    async with get_endpoint_limit(endpoint):
+        _interactive_in_flight += 1
+        try:
+            return await resilient_caller.call(endpoint, lambda reservation: _send(reservation, kwargs), _reserve(priority, kwargs))
+        finally:
+            _interactive_in_flight -= 1
+
+
+def _reserve(priority: str, kwargs: Dict[str, Any]) -> Optional[Callable[[], Awaitable[Reservation]]]:
+    if llm_scheduler is None:
+        return None
+    tokens = estimate_tokens((m.get("content") for m in kwargs.get("messages", [])), kwargs.get("max_tokens"))
+    return lambda: llm_scheduler.acquire(kwargs.get("model"), tokens, priority)
+
+
+async def _send(reservation: Optional[Reservation], kwargs: Dict[str, Any]):
+    response = await get_openai_client().chat.completions.create(**kwargs)
+    if reservation is not None:
+        usage = getattr(response, "usage", None)
+        reservation.settle(getattr(usage, "total_tokens", None))
+    return response
+
+
+def interactive_in_flight() -> int:
+    """
+    Return the number of interactive LLM calls currently in flight in this worker.
+    """
+    return _interactive_in_flight
+
+
+async def complete_prompt(
+    endpoint: str,
+    template: str,
+    inputs: Dict[str, Any],
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+    validate: Optional[Callable[[str], bool]] = None,
+    **kwargs: Any
+) -> str:
+    """
+    Render `template` with `inputs`, send it to the model and return the reply text.
+
+    The static instructions of the template go first and the inputs last, so the prompt
+    prefix is shared by every request of the endpoint and cached by the provider. Token
+    usage, including cached prompt tokens, is recorded per endpoint.
+
+    Replies are cached under a fingerprint of the template, inputs, system prompt, model
+    and sampling parameters, so byte-identical requests are answered without calling the LLM.
+    JSON replies are only cached when they parse. Identical requests that arrive while the
+    first one is still running wait for its reply instead of calling the LLM again; a
+    request of a higher priority class raises the shared call to its class.
+
+    `model` can be overridden with a cascade in `MODEL_ROUTES` (see `utils.cascade`).
+    The reply of a faster tier is kept when it passes `validate`, and escalated otherwise.
+
+    Args:
+        endpoint: Name of the calling endpoint, used for its concurrency limit.
+        template: The prompt template from `config/prompts.py`.
+        inputs: Values of the template's placeholders.
+        system_prompt: Content of the system message.
+        model: Default OpenAI model name of the endpoint.
+        temperature: Sampling temperature.
+        response_format: Optional OpenAI response format, e.g. {"type": "json_object"}.
+        validate: Accepts the reply of a cascade tier. By default JSON replies must be a
+            non-empty object and text replies must not be empty.
+        **kwargs: Extra arguments forwarded to the completion call, e.g. max_tokens.
+
+    Returns:
+        The content of the model's reply.
+    """
+    tiers = model_route(endpoint, model)
+    key = fingerprint(
+        template=template,
+        inputs=inputs,
+        system_prompt=system_prompt,
+        model=tiers,
+        temperature=temperature,
+        response_format=response_format,
+        params=kwargs,
+    )
+    if response_cache is not None:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def _complete_with(model: str) -> str:
+        params = dict(kwargs)
+        if response_format is not None:
+            params["response_format"] = response_format
+        started = time.perf_counter()
+        response = await create_chat_completion(
+            endpoint,
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": render_prompt(template, inputs)}
+            ],
+            temperature=temperature,
+            **params
+        )
+        elapsed = time.perf_counter() - started
+        observe_llm_call(endpoint, model, elapsed)
+        record_usage(endpoint, getattr(response, "usage", None), elapsed * 1000, model=model)
+        return response.choices[0].message.content
+
+    async def _complete() -> str:
+        content = await run_cascade(endpoint, tiers, _complete_with, accept=validate or (lambda c: _is_acceptable(c, response_format)))
+        if response_cache is not None and content and _is_cacheable(content, response_format):
+            response_cache.set(key, content)
+        return content
+
+    if llm_flight is None:
+        return await _complete()
+    priority = request_priority.get()
+    shared_priority = CallPriority(priority)
+
+    async def _complete_shared() -> str:
+        # Runs as its own task, so the shared priority stays with this call
+        call_priority.set(shared_priority)
+        return await _complete()
+
+    # A user request that joins a speculative prefetch call moves it up to the interactive class
+    return await llm_flight.do(key, _complete_shared, label=endpoint, context=shared_priority, on_join=lambda shared: shared.raise_to(priority))
+
+
+def _is_acceptable(content: Optional[str], response_format: Optional[Dict[str, Any]]) -> bool:
+    if response_format and response_format.get("type") == "json_object":
+        return valid_json_reply(content)
+    return bool(content and content.strip())
+
+
+def _is_cacheable(content: str, response_format: Optional[Dict[str, Any]]) -> bool:
+    if not response_format or response_format.get("type") != "json_object":
+        return True
+    try:
+        json.loads(content)
+        return True
+    except json.JSONDecodeError:
+        return False
@@ -0,0 +1,240 @@
+"""
+utils/metrics.py
+
+Prometheus latency and token histograms, exposed on `GET /metrics`.
+
+Histograms cover the LangGraph nodes, every LLM call (time to first token, total
+latency and token counts per endpoint or node and model), query embeddings and
+similar-challenge searches (in Qdrant or in the local replica), the time LLM calls
+wait in the scheduler (`utils.scheduler`), plus the duration of every HTTP request per route.
+Counters track the retries, hedges and missed deadlines of LLM calls (`utils.resilience`),
+escalations between model tiers (`utils.cascade`), the outcome of structured agent
+replies (`utils.structured_output`) and whether challenge validations needed an LLM
+review (`agent.challenge_rules`).
+
+Every observation carries the current correlation ID as an exemplar: the session ID
+for agent conversations and the `X-Correlation-ID` request header (or a generated ID)
+for HTTP requests. Exemplars are only rendered when the scraper asks for the
+OpenMetrics format. Labels stay low-cardinality so that the series count is bounded.
+
+With several gunicorn workers, set the `PROMETHEUS_MULTIPROC_DIR` environment variable
+to an empty directory before the server starts so that `/metrics` aggregates all
+workers (exemplars are not available in that mode).
+"""
+import functools
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY
+from prometheus_client import multiprocess
+from prometheus_client.exposition import choose_encoder
+
+from config.config import METRICS_ENABLED, METRICS_LATENCY_BUCKETS, METRICS_TOKEN_BUCKETS
+
+# Correlation ID of the session or HTTP request being served in the current task
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+# Seconds the current node has spent waiting for user input, excluded from its duration
+_input_wait: ContextVar[Optional[List[float]]] = ContextVar("input_wait", default=None)
+
+NODE_DURATION = Histogram(
+    "agent_node_duration_seconds",
+    "Processing time of a LangGraph node, excluding time spent waiting for the user",
+    ["node"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+LLM_TTFT = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a streamed LLM request to its first content token",
+    ["endpoint", "model"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Total latency of an LLM call",
+    ["endpoint", "model"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens",
+    "Tokens per LLM call; kind is prompt, cached (prompt tokens served from the provider cache) or completion",
+    ["endpoint", "model", "kind"],
+    buckets=METRICS_TOKEN_BUCKETS,
+)
+EMBEDDING_DURATION = Histogram(
+    "embedding_duration_seconds",
+    "Latency of a query embedding, including embedding cache lookups",
+    ["model", "cache"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+VECTOR_SEARCH_DURATION = Histogram(
+    "vector_search_duration_seconds",
+    "Latency of a similar-challenge search; backend is qdrant (query_points) or local (replica)",
+    ["backend"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time an LLM call waited in the worker's scheduler for rate limit capacity and its turn",
+    ["model", "priority"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "LLM calls waiting in the worker's scheduler",
+    ["model", "priority"],
+    multiprocess_mode="livesum",
+)
+LLM_CALLS = Counter(
+    "llm_calls",
+    "LLM calls made under a deadline, per endpoint or node",
+    ["endpoint"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries",
+    "Retried LLM call attempts; reason is timeout, connection, rate_limit or server_error",
+    ["endpoint", "reason"],
+)
+LLM_HEDGES = Counter(
+    "llm_hedges",
+    "Duplicate requests sent for LLM calls slower than the observed p95",
+    ["endpoint"],
+)
+LLM_HEDGE_WINS = Counter(
+    "llm_hedge_wins",
+    "Hedged LLM calls where the duplicate request answered first",
+    ["endpoint"],
+)
+LLM_DEADLINE_EXCEEDED = Counter(
+    "llm_deadline_exceeded",
+    "LLM calls abandoned at their deadline",
+    ["endpoint"],
+)
+LLM_ESCALATIONS = Counter(
+    "llm_escalations",
+    "LLM calls escalated from a model tier to the next one; reason is rejected (failed validation) or error",
+    ["endpoint", "model", "reason"],
+)
+STRUCTURED_OUTPUTS = Counter(
+    "llm_structured_outputs",
+    "Structured agent replies by outcome: valid, repaired (locally), repaired_llm or wasted (replaced by the fallback)",
+    ["node", "outcome"],
+)
+CHALLENGE_VALIDATIONS = Counter(
+    "challenge_validations",
+    "Challenge validations by outcome: rules_only (blocking rule errors, no LLM review) or llm_review",
+    ["outcome"],
+)
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of an HTTP request per route",
+    ["method", "route", "status"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def observe(histogram: Histogram, value: float, **labels: str):
+    """
+    Record one observation with the current correlation ID as its exemplar.
+    """
+    if not METRICS_ENABLED:
+        return
+    cid = correlation_id.get()
+    try:
+        histogram.labels(**labels).observe(value, exemplar={"correlation_id": cid} if cid else None)
+    except Exception as e:
+        # Metrics must never break a request
+        print(f"❌ Failed to record metric {histogram._name}: {e}")
+
+
+def count(counter: Counter, **labels: str):
+    """
+    Increment a counter by one.
+    """
+    if not METRICS_ENABLED:
+        return
+    try:
+        counter.labels(**labels).inc()
+    except Exception as e:
+        print(f"❌ Failed to record metric {counter._name}: {e}")
+
+
+def observe_llm_call(endpoint: str, model: str, elapsed_s: float, ttft_s: Optional[float] = None):
+    observe(LLM_DURATION, elapsed_s, endpoint=endpoint, model=model)
+    if ttft_s is not None:
+        observe(LLM_TTFT, ttft_s, endpoint=endpoint, model=model)
+
+
+def observe_tokens(endpoint: str, model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int):
+    observe(LLM_TOKENS, prompt_tokens, endpoint=endpoint, model=model, kind="prompt")
+    observe(LLM_TOKENS, cached_tokens, endpoint=endpoint, model=model, kind="cached")
+    observe(LLM_TOKENS, completion_tokens, endpoint=endpoint, model=model, kind="completion")
+
+
+def track_queue_depth(model: str, priority: str, delta: int):
+    if not METRICS_ENABLED:
+        return
+    try:
+        LLM_QUEUE_DEPTH.labels(model=model, priority=priority).inc(delta)
+    except Exception as e:
+        print(f"❌ Failed to record metric llm_queue_depth: {e}")
+
+
+def record_input_wait(seconds: float):
+    """
+    Add time spent waiting for user input to the running node, so it is not counted as processing time.
+    """
+    waited = _input_wait.get()
+    if waited is not None:
+        waited[0] += seconds
+
+
+def timed_node(node: str, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Wrap a LangGraph node so its processing time is recorded in `agent_node_duration_seconds`.
+    """
+    # functools.wraps keeps the node's signature, which LangGraph inspects to decide whether to pass the config
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = _input_wait.set([0.0])
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            waited = _input_wait.get()[0]
+            _input_wait.reset(token)
+            observe(NODE_DURATION, time.perf_counter() - started - waited, node=node)
+    return wrapper
+
+
+def render_metrics(accept: Optional[str]) -> Tuple[bytes, str]:
+    """
+    Render every metric of this process, or of all workers in multiprocess mode.
+
+    Args:
+        accept: The scraper's Accept header, which selects the text or OpenMetrics format.
+
+    Returns:
+        The response body and its content type.
+    """
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    encoder, content_type = choose_encoder(accept or "")
+    return encoder(registry), content_type
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """
+    Return the route template of a request (e.g. "/api/recommendations"), or "unmatched".
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,161 @@
+"""
+utils/output_bus.py
+
+Per-session, ordered output channels from the agent to the session's WebSocket.
+
+Each session gets a bounded send queue drained by a single sender task, so messages
+reach the client in the order they were published. When the client is slower than the
+agent, the queue fills up and publishers wait (backpressure) instead of piling up
+unbounded pending sends. Bursts that accumulate while a send is in flight are drained
+together, and consecutive streaming text deltas for the same field are merged into a
+single frame. Queue depth and send counters are exposed through `stats()`.
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+Payload = Union[str, Dict[str, Any]]
+
+
+class SessionChannel:
+    """
+    Ordered, bounded output channel of a single session.
+    """
+
+    def __init__(self, session: str, max_queue: int, send_timeout: float):
+        self.session = session
+        self.send_timeout = send_timeout
+        self.websocket: Optional[WebSocket] = None
+        self.queue: "asyncio.Queue[Tuple[Payload, bool]]" = asyncio.Queue(maxsize=max_queue)
+        self._sender: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    async def publish(self, payload: Payload, transient: bool = False):
+        """
+        Queue a payload for the client, waiting while the queue is full.
+        Transient payloads are streaming frames (dicts) that may be merged with their neighbours.
+        """
+        await self.queue.put((payload, transient))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._drain())
+
+    def close(self):
+        if self._sender is not None and not self._sender.done():
+            self._sender.cancel()
+        self.websocket = None
+
+    async def _drain(self):
+        # Exits once the queue is empty; `publish` starts a new sender when needed
+        while not self.queue.empty():
+            batch = [self.queue.get_nowait()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            for text in self._coalesce(batch):
+                await self._send(text)
+
+    def _coalesce(self, batch: List[Tuple[Payload, bool]]) -> List[str]:
+        texts: List[str] = []
+        pending: Optional[Dict[str, Any]] = None
+        for payload, transient in batch:
+            if transient and pending is not None and _can_merge(pending, payload):
+                pending = {**pending, "delta": pending["delta"] + payload["delta"]}
+                self.coalesced += 1
+                continue
+            if pending is not None:
+                texts.append(json.dumps(pending))
+                pending = None
+            if transient and "delta" in payload:
+                pending = payload
+            else:
+                texts.append(json.dumps(payload) if transient else payload)
+        if pending is not None:
+            texts.append(json.dumps(pending))
+        return texts
+
+    async def _send(self, text: str):
+        websocket = self.websocket
+        if websocket is None:
+            # No client attached; the message history still has every non-transient message
+            self.dropped += 1
+            return
+        try:
+            await asyncio.wait_for(websocket.send_text(text), timeout=self.send_timeout)
+            self.sent += 1
+        except Exception as e:
+            print(f"Failed to send to WebSocket for session {self.session}: {e}")
+            self.dropped += 1
+            if self.websocket is websocket:
+                self.websocket = None
+
+
+def _can_merge(pending: Dict[str, Any], payload: Payload) -> bool:
+    return isinstance(payload, dict) and "delta" in payload and payload.get("field") == pending.get("field")
+
+
+class OutputBus:
+    """
+    Registry of the session output channels of this worker.
+
+    Args:
+        max_queue: Maximum number of queued payloads per session before publishers wait.
+        send_timeout: Seconds a single WebSocket send may take before the client is detached.
+    """
+
+    def __init__(self, max_queue: int = 256, send_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.channels: Dict[str, SessionChannel] = {}
+
+    def channel(self, session: str) -> SessionChannel:
+        channel = self.channels.get(session)
+        if channel is None:
+            channel = SessionChannel(session, self.max_queue, self.send_timeout)
+            self.channels[session] = channel
+        return channel
+
+    async def publish(self, session: str, payload: Payload, transient: bool = False):
+        await self.channel(session).publish(payload, transient)
+
+    def attach(self, session: str, websocket: WebSocket):
+        self.channel(session).websocket = websocket
+
+    def detach(self, session: str, websocket: WebSocket):
+        channel = self.channels.get(session)
+        if channel is not None and channel.websocket is websocket:
+            channel.websocket = None
+
+    def close(self, session: str):
+        channel = self.channels.pop(session, None)
+        if channel is not None:
+            channel.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the current send-queue depth and counters, in total and per session.
+        """
+        sessions = {
+            session: {
+                "queue_depth": channel.queue.qsize(),
+                "max_queue_depth": channel.max_depth,
+                "sent": channel.sent,
+                "coalesced": channel.coalesced,
+                "dropped": channel.dropped,
+                "connected": channel.websocket is not None,
+            }
+            for session, channel in self.channels.items()
+        }
+        return {
+            "sessions": len(sessions),
+            "queue_depth": sum(s["queue_depth"] for s in sessions.values()),
+            "max_queue_depth": max((s["max_queue_depth"] for s in sessions.values()), default=0),
+            "sent": sum(s["sent"] for s in sessions.values()),
+            "coalesced": sum(s["coalesced"] for s in sessions.values()),
+            "dropped": sum(s["dropped"] for s in sessions.values()),
+            "per_session": sessions,
+        }
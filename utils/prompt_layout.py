@@ -0,0 +1,102 @@
+"""
+utils/prompt_layout.py
+
+Prompt assembly laid out for provider-side prefix caching.
+
+OpenAI caches the longest previously seen prefix of a prompt (from 1024 tokens on),
+so everything that is the same across requests should come first and the per-request
+values last. The templates in `config/prompts.py` reference their inputs inline, e.g.
+`- Problem Statement: "{problem_statement}"` above long static instructions. `layout_prompt`
+turns every placeholder into a `<name>` reference, which leaves the instructions
+byte-identical for every request, and appends the values as tagged blocks at the end:
+
+    ... - Problem Statement: "<problem_statement>" ...  (static, cacheable)
+    <problem_statement>
+    Help farmers predict crop yield
+    </problem_statement>                                 (variable)
+
+Token usage, including the `cached_tokens` reported by the API, is recorded per call
+in `token_usage`.
+"""
+import string
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from utils.metrics import observe_tokens
+from utils.stats import TokenUsageStats
+
+INPUTS_HEADER = "The inputs referenced above in angle brackets are:"
+
+token_usage = TokenUsageStats()
+
+
+@lru_cache(maxsize=None)
+def _split_template(template: str) -> Tuple[str, Tuple[str, ...]]:
+    static_parts = []
+    fields = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        # `parse` already unescapes doubled braces in the literal text
+        static_parts.append(literal)
+        if field is not None:
+            static_parts.append(f"<{field}>")
+            if field not in fields:
+                fields.append(field)
+    return "".join(static_parts).rstrip(), tuple(fields)
+
+
+def layout_prompt(template: str, inputs: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Split a prompt template into its static prefix and the block of variable inputs.
+
+    Args:
+        template: A `str.format` template from `config/prompts.py`.
+        inputs: Values of the template's placeholders.
+
+    Returns:
+        A (static, variable) pair. The static part is identical for every set of inputs;
+        the variable part holds one tagged block per input and is empty for templates
+        without placeholders.
+    """
+    static, fields = _split_template(template)
+    if not fields:
+        return static, ""
+    blocks = [f"<{field}>\n{inputs[field]}\n</{field}>" for field in fields]
+    return static, "\n\n".join([INPUTS_HEADER, *blocks])
+
+
+def render_prompt(template: str, inputs: Dict[str, Any]) -> str:
+    """
+    Return the cache-friendly rendering of a template as one text: static prefix first, inputs last.
+    """
+    static, variable = layout_prompt(template, inputs)
+    return f"{static}\n\n{variable}" if variable else static
+
+
+def record_usage(label: str, usage: Optional[Any], elapsed_ms: Optional[float] = None, model: Optional[str] = None):
+    """
+    Record the token usage of one completion in `token_usage` and the token histograms.
+
+    Accepts the `usage` of an OpenAI ChatCompletion or the `usage_metadata` of a
+    langchain message; a missing usage (e.g. a stub model) is ignored.
+    """
+    if not usage:
+        return
+    if isinstance(usage, dict):
+        # langchain usage_metadata
+        details = usage.get("input_token_details") or {}
+        prompt_tokens = usage.get("input_tokens", 0)
+        cached_tokens = details.get("cache_read", 0) or 0
+        completion_tokens = usage.get("output_tokens", 0)
+    else:
+        details = getattr(usage, "prompt_tokens_details", None)
+        prompt_tokens = usage.prompt_tokens or 0
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        completion_tokens = usage.completion_tokens or 0
+    token_usage.record(
+        label,
+        prompt_tokens=prompt_tokens,
+        cached_tokens=cached_tokens,
+        completion_tokens=completion_tokens,
+        elapsed_ms=elapsed_ms,
+    )
+    observe_tokens(label, model or "unknown", prompt_tokens, cached_tokens, completion_tokens)
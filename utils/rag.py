@@ -1,15 +1,23 @@
+import httpx
 import openai
 from qdrant_client import QdrantClient
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import os
+import time
 
 from config.config import (
     QDRANT_ENDPOINT,
     QDRANT_COLLECTION_NAME,
     RAG_EMBEDDING_MODEL,
-    RAG_NUM_RETRIEVED_CHALLENGES
+    RAG_NUM_RETRIEVED_CHALLENGES,
+    RAG_RETRIEVAL_MODE
 )
+from utils.cassette import CassetteSyncTransport, cassette
+from utils.embedding_cache import EmbeddingCache, embedding_cache
+from utils.metrics import EMBEDDING_DURATION, VECTOR_SEARCH_DURATION, observe
+from utils.singleflight import embedding_flight
+from utils.vector_replica import LocalVectorIndex
 
 load_dotenv()
 
@@ -21,38 +29,92 @@ class RAGHelper:
     challenge templates from Qdrant using OpenAI embeddings.
     
     This module provides functionality to:
-    1. Get embeddings for text using OpenAI API
-    2. Search Qdrant for similar challenges based on user queries
+    1. Get embeddings for text using OpenAI API (cached on disk across workers)
+    2. Search for similar challenges based on user queries, in the local replica of
+       the collection when it has been synced and in Qdrant otherwise
     """
     
     def __init__(self, openai_api_key: Optional[str] = None, qdrant_api_key: Optional[str] = None):
         openai.api_key = openai_api_key or os.environ.get("OPENAI_API_KEY")
+        if cassette is not None:
+            # Record or replay the embedding calls of the module-level OpenAI client
+            openai.http_client = httpx.Client(transport=CassetteSyncTransport(cassette, httpx.HTTPTransport()))
         self.qdrant = QdrantClient(
-            url=QDRANT_ENDPOINT,
+            url=os.environ.get("QDRANT_ENDPOINT", QDRANT_ENDPOINT),
             api_key=qdrant_api_key or os.environ.get("QDRANT_API_KEY"),
         )
+        self.replica = LocalVectorIndex() if RAG_RETRIEVAL_MODE == "local" else None
 
     # === Function to get embedding from OpenAI ===
     def _get_openai_embedding(self, text: str):
-        response = openai.embeddings.create(
-            model=RAG_EMBEDDING_MODEL,
-            input=text,
-            encoding_format="float"
-        )
-        return response.data[0].embedding
+        start = time.perf_counter()
+        if embedding_cache is not None:
+            cached = embedding_cache.get(RAG_EMBEDDING_MODEL, text)
+            if cached is not None:
+                observe(EMBEDDING_DURATION, time.perf_counter() - start, model=RAG_EMBEDDING_MODEL, cache="hit")
+                return cached
+
+        def _embed():
+            api_start = time.perf_counter()
+            response = openai.embeddings.create(
+                model=RAG_EMBEDDING_MODEL,
+                input=text,
+                encoding_format="float"
+            )
+            embedding = response.data[0].embedding
+            if embedding_cache is not None:
+                embedding_cache.record_miss_latency((time.perf_counter() - api_start) * 1000)
+                embedding_cache.set(RAG_EMBEDDING_MODEL, text, embedding)
+            return embedding
+
+        if embedding_flight is None:
+            embedding = _embed()
+        else:
+            # Concurrent searches for the same text share one embedding call
+            embedding = embedding_flight.do(EmbeddingCache.key(RAG_EMBEDDING_MODEL, text), _embed, label=RAG_EMBEDDING_MODEL)
+        observe(EMBEDDING_DURATION, time.perf_counter() - start, model=RAG_EMBEDDING_MODEL, cache="miss")
+        return embedding
+
+    # === Search the local replica, falling back to Qdrant ===
+    def _search_local(self, vector) -> Optional[List[Tuple[float, Any, Dict[str, Any]]]]:
+        if self.replica is None or not self.replica.available():
+            return None
+        try:
+            start = time.perf_counter()
+            hits = self.replica.search(vector, RAG_NUM_RETRIEVED_CHALLENGES)
+            observe(VECTOR_SEARCH_DURATION, time.perf_counter() - start, backend="local")
+            return hits
+        except Exception as e:
+            print(f"❌ Local replica search failed, falling back to Qdrant: {e}")
+            return None
 
     # === Search Qdrant for similar content ===
-    def search_similar_challenges(self, query_text: str) -> str:
-        vector = self._get_openai_embedding(query_text)
+    def _search_qdrant(self, vector) -> List[Tuple[float, Any, Dict[str, Any]]]:
+        if cassette is not None:
+            request = {"collection": QDRANT_COLLECTION_NAME, "vector": vector, "limit": RAG_NUM_RETRIEVED_CHALLENGES}
+            hits = cassette.call("qdrant.query_points", request, lambda: self._query_qdrant(vector))
+            return [tuple(hit) for hit in hits]
+        return self._query_qdrant(vector)
 
+    def _query_qdrant(self, vector) -> List[Tuple[float, Any, Dict[str, Any]]]:
+        start = time.perf_counter()
         results = self.qdrant.query_points(
             collection_name=QDRANT_COLLECTION_NAME,
             query=vector,
             with_payload=True,
             limit=RAG_NUM_RETRIEVED_CHALLENGES,
         )
+        observe(VECTOR_SEARCH_DURATION, time.perf_counter() - start, backend="qdrant")
+        return [(hit.score, hit.id, hit.payload) for hit in results.points]
+
+    def search_similar_challenges(self, query_text: str) -> str:
+        vector = self._get_openai_embedding(query_text)
+
+        hits = self._search_local(vector)
+        if hits is None:
+            hits = self._search_qdrant(vector)
 
-        for hit in results.points:
-            print(f"Fetched challenge: ID: {hit.payload.get('id', 'No id found')} - {hit.payload.get('name', 'No name provided')}. Score: {hit.score:.4f}")
+        for score, _, payload in hits:
+            print(f"Fetched challenge: ID: {payload.get('id', 'No id found')} - {payload.get('name', 'No name provided')}. Score: {score:.4f}")
         
-        return [hit.payload for hit in results.points] if results.points else "No similar challenges found."
\ No newline at end of file
+        return [payload for _, _, payload in hits] if hits else "No similar challenges found."
\ No newline at end of file
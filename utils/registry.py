@@ -0,0 +1,204 @@
+"""
+utils/registry.py
+
+Process-wide registry of warm, reusable resources for the agent workflow.
+
+Building a ChatOpenAI client, a QdrantClient and compiling the LangGraph workflow
+is expensive, so each of them is created once per process and shared by every
+session and every conversational turn. The workflow is compiled with the persistent
+checkpointer (see `utils.checkpointer`), so a conversation can resume on any worker. The async OpenAI client used by the
+recommenders and the ChatOpenAI clients share a single keep-alive connection pool. Nodes receive these resources through the
+graph config (see `get_llm_from_config` / `get_rag_from_config`) and fall back to
+the registry when they are run outside of a configured graph.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI
+
+from config.config import (
+    AGENT_LLM_MODEL,
+    AGENT_LLM_TEMPERATURE,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_REQUEST_TIMEOUT
+)
+from utils.cascade import model_route
+from utils.cassette import CassetteTransport, cassette
+from utils.checkpointer import SQLiteCheckpointSaver, create_checkpointer
+from utils.rag import RAGHelper
+
+load_dotenv()
+
+_lock = threading.Lock()
+_llms: Dict[Tuple[str, float, Optional[str]], ChatOpenAI] = {}
+_rag: Optional[RAGHelper] = None
+_workflow = None
+_checkpointer: Optional[SQLiteCheckpointSaver] = None
+_checkpointer_created = False
+_http_client: Optional[httpx.AsyncClient] = None
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared async HTTP client with a tuned keep-alive connection pool.
+    """
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                limits = httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                )
+                timeout = httpx.Timeout(OPENAI_REQUEST_TIMEOUT, connect=10.0)
+                if cassette is not None:
+                    # Record or replay every OpenAI call made through the shared pool
+                    transport = CassetteTransport(cassette, httpx.AsyncHTTPTransport(limits=limits))
+                    _http_client = httpx.AsyncClient(transport=transport, timeout=timeout)
+                else:
+                    _http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _http_client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client used by the recommenders, creating it on first use.
+    """
+    global _openai_client
+    if _openai_client is None:
+        http_client = get_http_client()
+        with _lock:
+            if _openai_client is None:
+                # Retries are made by utils.resilience, within each call's deadline
+                _openai_client = AsyncOpenAI(http_client=http_client, max_retries=0)
+    return _openai_client
+
+
+def get_llm(model: str = AGENT_LLM_MODEL, temperature: float = AGENT_LLM_TEMPERATURE, api_key: Optional[str] = None) -> ChatOpenAI:
+    """
+    Return the shared ChatOpenAI client for the given model and temperature,
+    creating it on first use.
+    """
+    api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    key = (model, temperature, api_key)
+    llm = _llms.get(key)
+    if llm is None:
+        http_client = get_http_client()
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                # stream_usage makes streamed replies report their token usage, including cached tokens
+                # Retries are made by utils.resilience, within each call's deadline
+                llm = ChatOpenAI(model=model, api_key=api_key, temperature=temperature, http_async_client=http_client, stream_usage=True, max_retries=0)
+                _llms[key] = llm
+    return llm
+
+
+def get_rag() -> RAGHelper:
+    """
+    Return the shared RAGHelper (and its QdrantClient), creating it on first use.
+    """
+    global _rag
+    if _rag is None:
+        with _lock:
+            if _rag is None:
+                _rag = RAGHelper()
+    return _rag
+
+
+def get_checkpointer() -> Optional[SQLiteCheckpointSaver]:
+    """
+    Return the shared checkpoint saver, or None when checkpoints are disabled.
+    """
+    global _checkpointer, _checkpointer_created
+    if not _checkpointer_created:
+        with _lock:
+            if not _checkpointer_created:
+                _checkpointer = create_checkpointer()
+                _checkpointer_created = True
+    return _checkpointer
+
+
+def get_workflow():
+    """
+    Return the compiled LangGraph workflow, compiling it on first use.
+    The compiled graph keeps no state between invocations (conversation state is kept
+    per thread by the checkpointer), so one instance serves every session.
+    """
+    global _workflow
+    if _workflow is None:
+        from agent.architect import ChallengeArchitect
+        checkpointer = get_checkpointer()
+        with _lock:
+            if _workflow is None:
+                _workflow = ChallengeArchitect.build_workflow(checkpointer=checkpointer)
+    return _workflow
+
+
+def get_llm_from_config(config: Optional[Dict[str, Any]]) -> ChatOpenAI:
+    """
+    Return the LLM handed to a node through the graph config, or the shared default one.
+    """
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("llm") or get_llm()
+
+
+def get_llm_tiers_from_config(config: Optional[Dict[str, Any]], node: str) -> List[Any]:
+    """
+    Return the model cascade of a node (see `utils.cascade`), fastest first. Tiers that
+    use the model of the LLM handed over through the graph config reuse that client.
+    A custom chat model in the config (e.g. a benchmark stub) is used alone.
+    """
+    llm = get_llm_from_config(config)
+    if not isinstance(llm, ChatOpenAI):
+        return [llm]
+    api_key = llm.openai_api_key.get_secret_value() if llm.openai_api_key else None
+    return [
+        llm if model == llm.model_name else get_llm(model=model, temperature=llm.temperature, api_key=api_key)
+        for model in model_route(node, llm.model_name)
+    ]
+
+
+def get_rag_from_config(config: Optional[Dict[str, Any]]) -> RAGHelper:
+    """
+    Return the RAGHelper handed to a node through the graph config, or the shared default one.
+    """
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("rag") or get_rag()
+
+
+def reset_registry():
+    """
+    Drop every cached resource. Intended for benchmarks and tests only.
+    """
+    global _rag, _workflow, _checkpointer, _checkpointer_created, _http_client, _openai_client
+    with _lock:
+        _llms.clear()
+        _rag = None
+        _workflow = None
+        _checkpointer = None
+        _checkpointer_created = False
+        _http_client = None
+        _openai_client = None
+
+
+async def close_registry():
+    """
+    Close the shared HTTP connection pool and the checkpoint database. Called on server shutdown.
+    """
+    global _http_client, _openai_client
+    http_client = _http_client
+    _http_client = None
+    _openai_client = None
+    if http_client is not None:
+        await http_client.aclose()
+    if _checkpointer is not None:
+        _checkpointer.close()
@@ -0,0 +1,311 @@
+"""
+utils/resilience.py
+
+Deadlines, retries and hedged requests for the LLM calls.
+
+Every call of the recommendation endpoints (`utils.llm`) and the agent nodes
+(`utils.streaming`) runs under a deadline per endpoint or node (`LLM_DEADLINES`,
+falling back to `LLM_DEFAULT_DEADLINE`). Attempts that fail with a timeout, a
+connection error, a rate limit or a server error are retried up to `LLM_MAX_RETRIES`
+times with exponential backoff and full jitter, within the same deadline.
+
+With hedging enabled, an attempt that has not answered after the p95 latency observed
+for its endpoint gets one duplicate request, and whichever answers first wins; the
+other is cancelled. For streamed agent turns, the deadline and the hedge apply to the
+time to the first token, since streamed output cannot be taken back.
+
+Every attempt first takes a reservation from the rate-limiting scheduler
+(`utils.scheduler`). The hedge delay starts and the latency samples are taken only once
+the reservation is granted, so time spent queued locally neither counts towards the
+p95 nor triggers hedges. No hedge is sent while other calls wait for the same model,
+and hedges are capped at `LLM_HEDGE_MAX_RATE` of the calls of an endpoint.
+
+Hedges cost tokens, so hedge and win rates are reported at `GET /api/llm-call-stats`
+and exported as Prometheus counters together with retries and missed deadlines.
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+import openai
+
+from config.config import (
+    LLM_DEFAULT_DEADLINE,
+    LLM_DEADLINES,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BACKOFF_BASE,
+    LLM_RETRY_BACKOFF_MAX,
+    LLM_HEDGING_ENABLED,
+    LLM_HEDGE_QUANTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_MAX_RATE
+)
+from utils.cassette import CassetteMissError
+from utils.metrics import LLM_CALLS, LLM_DEADLINE_EXCEEDED, LLM_HEDGES, LLM_HEDGE_WINS, LLM_RETRIES, count
+from utils.stats import LatencyStats
+
+T = TypeVar("T")
+
+# Marks a stream that ended before its first item
+_END = object()
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """
+    Raised when an LLM call, including its retries, does not complete within its deadline.
+    """
+
+
+def _retry_reason(error: BaseException) -> Optional[str]:
+    """
+    Return why a failed attempt is worth retrying, or None when it is not.
+    """
+    if isinstance(error.__cause__, CassetteMissError):
+        # A missing recording stays missing
+        return None
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.InternalServerError):
+        return "server_error"
+    return None
+
+
+def _retry_after(error: BaseException) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0)) if response is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+class ResilientCaller:
+    """
+    Runs LLM calls with deadlines, retries with jittered backoff and p95 hedging.
+
+    Args:
+        deadlines: Seconds per endpoint or node label.
+        default_deadline: Seconds for labels without a deadline of their own.
+        max_retries: Retries after the first attempt.
+        backoff_base: Upper bound of the first backoff in seconds, doubled per retry.
+        backoff_max: Upper bound of any backoff in seconds.
+        hedging: Whether slow attempts get a duplicate request.
+        hedge_quantile: Latency quantile after which an attempt is hedged.
+        hedge_min_samples: Successful calls observed for a label before it is hedged.
+        hedge_min_delay: Lower bound of the hedge delay in seconds.
+        hedge_max_rate: Upper bound of the hedges per call of a label.
+    """
+
+    def __init__(
+        self,
+        deadlines: Dict[str, float],
+        default_deadline: float,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedging: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 1.0,
+        hedge_max_rate: float = 0.05,
+    ):
+        self.deadlines = deadlines
+        self.default_deadline = default_deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_rate = hedge_max_rate
+        self.latency = LatencyStats(window=500)
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def hedge_delay(self, label: str) -> Optional[float]:
+        """
+        Return the seconds after which an attempt for `label` is hedged, or None when it is not.
+        """
+        if not self.hedging:
+            return None
+        p95_ms = self.latency.percentile(label, self.hedge_quantile, self.hedge_min_samples)
+        if p95_ms is None:
+            return None
+        return max(self.hedge_min_delay, p95_ms / 1000)
+
+    def _may_hedge(self, label: str, reservation: Any) -> bool:
+        counters = self.counters[label]
+        if counters["hedges"] + 1 > self.hedge_max_rate * counters["calls"]:
+            return False
+        # A duplicate would only queue behind calls that are already short of capacity
+        return reservation is None or not reservation.contended()
+
+    async def call(
+        self,
+        label: str,
+        fn: Callable[[Any], Awaitable[T]],
+        reserve: Optional[Callable[[], Awaitable[Any]]] = None,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """
+        Await `fn(reservation)` under the deadline of `label`, retrying and hedging it as configured.
+
+        Args:
+            label: Endpoint or node name, used for the deadline, the hedge delay and the counters.
+            fn: Starts one attempt with its reservation. It may be called several times,
+                concurrently when hedged.
+            reserve: Returns the scheduler reservation of one attempt (see `utils.scheduler`).
+                None passes no reservation.
+            discard: Releases the result of a hedged attempt that succeeded but lost the race.
+
+        Raises:
+            LLMDeadlineExceeded: When no attempt succeeded within the deadline.
+        """
+        deadline = self.deadlines.get(label, self.default_deadline)
+        self.counters[label]["calls"] += 1
+        count(LLM_CALLS, endpoint=label)
+        try:
+            return await asyncio.wait_for(self._retried(label, fn, reserve, discard), deadline)
+        except asyncio.TimeoutError:
+            self.counters[label]["deadline_exceeded"] += 1
+            count(LLM_DEADLINE_EXCEEDED, endpoint=label)
+            raise LLMDeadlineExceeded(f"LLM call for {label} did not complete within {deadline}s") from None
+
+    async def stream(self, label: str, fn: Callable[[Any], AsyncIterator[T]], reserve: Optional[Callable[[], Awaitable[Any]]] = None) -> AsyncIterator[T]:
+        """
+        Open a stream with `fn(reservation)` and iterate it, applying the deadline, retries and
+        hedging of `call` to the first item. Later items are passed through as they arrive.
+        """
+        async def first_item(reservation):
+            iterator = fn(reservation).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _END
+            except BaseException:
+                await _aclose(iterator)
+                raise
+
+        async def discard(opened):
+            # Closing a losing stream releases its connection and settles its reservation
+            await _aclose(opened[0])
+
+        iterator, first = await self.call(label, first_item, reserve, discard)
+        try:
+            if first is _END:
+                return
+            yield first
+            async for item in iterator:
+                yield item
+        finally:
+            await _aclose(iterator)
+
+    async def _retried(self, label: str, fn: Callable[[Any], Awaitable[T]], reserve: Optional[Callable[[], Awaitable[Any]]], discard: Optional[Callable[[T], Awaitable[None]]]) -> T:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._hedged(label, fn, reserve, discard)
+            except Exception as e:
+                reason = _retry_reason(e)
+                if reason is None or attempt == self.max_retries:
+                    raise
+                self.counters[label]["retries"] += 1
+                count(LLM_RETRIES, endpoint=label, reason=reason)
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                await asyncio.sleep(max(backoff, _retry_after(e)))
+
+    async def _hedged(self, label: str, fn: Callable[[Any], Awaitable[T]], reserve: Optional[Callable[[], Awaitable[Any]]], discard: Optional[Callable[[T], Awaitable[None]]]) -> T:
+        async def reserved_attempt():
+            return await fn(await reserve() if reserve is not None else None)
+
+        # Queue wait is not upstream latency: time the attempt from its reservation on
+        reservation = await reserve() if reserve is not None else None
+        delay = self.hedge_delay(label)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(fn(reservation))
+        if delay is None:
+            result = await primary
+            self.latency.record(label, (time.perf_counter() - started) * 1000)
+            return result
+
+        tasks = [primary]
+        errors = []
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._may_hedge(label, reservation):
+                self.counters[label]["hedges"] += 1
+                count(LLM_HEDGES, endpoint=label)
+                hedge = asyncio.ensure_future(reserved_attempt())
+                tasks.append(hedge)
+                pending.add(hedge)
+            while True:
+                # Take the first attempt that succeeds; fail only when every attempt failed
+                succeeded = [task for task in done if task.exception() is None]
+                errors.extend(task.exception() for task in done if task.exception() is not None)
+                if succeeded:
+                    # Both attempts may finish in the same round; prefer the primary
+                    winner = primary if primary in succeeded else succeeded[0]
+                    for loser in succeeded:
+                        if loser is not winner and discard is not None:
+                            await discard(loser.result())
+                    if winner is not primary:
+                        self.counters[label]["hedge_wins"] += 1
+                        count(LLM_HEDGE_WINS, endpoint=label)
+                    self.latency.record(label, (time.perf_counter() - started) * 1000)
+                    return winner.result()
+                if not pending:
+                    raise errors[0]
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return calls, retries, hedges, hedge wins and missed deadlines per label,
+        with the hedge rate (hedges per call) and win rate (wins per hedge).
+        """
+        result = {}
+        for label, counters in self.counters.items():
+            calls, hedges = counters["calls"], counters["hedges"]
+            delay = self.hedge_delay(label)
+            result[label] = {
+                "calls": calls,
+                "retries": counters["retries"],
+                "deadline_exceeded": counters["deadline_exceeded"],
+                "hedges": hedges,
+                "hedge_wins": counters["hedge_wins"],
+                "hedge_rate": round(hedges / calls, 4) if calls else 0.0,
+                "hedge_win_rate": round(counters["hedge_wins"] / hedges, 4) if hedges else 0.0,
+                "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            }
+        return result
+
+
+async def _aclose(iterator: Any):
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+
+resilient_caller = ResilientCaller(
+    LLM_DEADLINES,
+    LLM_DEFAULT_DEADLINE,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_RETRY_BACKOFF_BASE,
+    backoff_max=LLM_RETRY_BACKOFF_MAX,
+    hedging=LLM_HEDGING_ENABLED,
+    hedge_quantile=LLM_HEDGE_QUANTILE,
+    hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+    hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+    hedge_max_rate=LLM_HEDGE_MAX_RATE,
+)
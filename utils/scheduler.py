@@ -0,0 +1,329 @@
+"""
+utils/scheduler.py
+
+Central scheduler of the OpenAI chat completions made by a worker.
+
+The agent's conversation turns and the REST recommendations share one OpenAI quota.
+Every chat completion (`utils.streaming.invoke_llm` and `utils.llm.create_chat_completion`)
+acquires a reservation here before it is sent:
+
+- Token buckets per model enforce the requests and tokens per minute of
+  `LLM_RATE_LIMITS`, so bursts queue in the worker instead of failing upstream with
+  429s. A call reserves its estimated prompt tokens plus its completion budget; the
+  difference to the actual usage is settled when it completes.
+- Waiting calls are served by priority class: live conversations first, then REST
+  recommendations, then speculative prefetch.
+- Within a class, flows are served round-robin, one call each per round, so a burst
+  from one client cannot starve the others. A flow is the WebSocket session for
+  conversation turns, and the client of an HTTP request (`client_flow`: its
+  `X-Client-ID` header, else its remote address) for the REST recommendations.
+- A call shared by several callers (`utils.singleflight`) runs under a `CallPriority`
+  (`call_priority`). When a caller of a higher class joins it, its waiting
+  reservations move up to that class.
+
+Queue waits are recorded in `llm_queue_wait_seconds` and queue lengths in
+`llm_queue_depth`. Limits apply per worker process; models without a configured
+limit are not queued.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+from config.config import LLM_SCHEDULER_ENABLED, LLM_RATE_LIMITS, LLM_DEFAULT_COMPLETION_TOKENS
+from utils.history import MESSAGE_OVERHEAD_TOKENS, count_tokens
+from utils.metrics import LLM_QUEUE_WAIT, correlation_id, observe, track_queue_depth
+
+PRIORITY_CONVERSATION = "conversation"
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_PREFETCH = "prefetch"
+
+# Highest priority first
+PRIORITY_CLASSES = (PRIORITY_CONVERSATION, PRIORITY_INTERACTIVE, PRIORITY_PREFETCH)
+
+# Stable key of the client behind the current HTTP request, set by the server middleware.
+# Every request gets a fresh correlation ID, so that cannot group one client's calls.
+client_flow: ContextVar[Optional[str]] = ContextVar("client_flow", default=None)
+
+
+def estimate_tokens(texts: Iterable[str], max_tokens: Optional[int] = None) -> int:
+    """
+    Estimate the tokens a call will consume: its prompt messages plus the completion budget.
+
+    Args:
+        texts: Content of every prompt message.
+        max_tokens: The call's completion limit, or None for `LLM_DEFAULT_COMPLETION_TOKENS`.
+    """
+    prompt = sum(count_tokens(text or "") + MESSAGE_OVERHEAD_TOKENS for text in texts)
+    return prompt + (max_tokens or LLM_DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute / 60` units per second up to `per_minute`.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Return the seconds until `amount` can be taken, 0 when it can be taken now.
+        A request larger than the bucket waits for a full bucket rather than forever.
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def adjust(self, amount: float):
+        """
+        Take `amount` (or give it back when negative). The bucket may go into debt.
+        """
+        self.available = min(self.capacity, self.available - amount)
+
+
+class _Waiter:
+    def __init__(self, tokens: int, priority: str, flow: str):
+        self.tokens = tokens
+        self.priority = priority
+        self.flow = flow
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.granted = False
+
+
+class CallPriority:
+    """
+    Priority class of a call shared by callers of different classes, highest class wins.
+
+    Args:
+        priority: Class of the caller that started the call.
+    """
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self._waiting: Dict[_Waiter, Tuple["LLMScheduler", "_ModelQueue"]] = {}
+
+    def raise_to(self, priority: str):
+        """
+        Raise the call to `priority` if that class is higher, moving its waiting reservations up.
+        """
+        if priority not in PRIORITY_CLASSES or PRIORITY_CLASSES.index(priority) >= PRIORITY_CLASSES.index(self.priority):
+            return
+        self.priority = priority
+        for waiter, (scheduler, queue) in list(self._waiting.items()):
+            scheduler._promote(queue, waiter, priority)
+
+
+# Priority of the shared call made in the current task; overrides lower call priorities
+call_priority: ContextVar[Optional[CallPriority]] = ContextVar("call_priority", default=None)
+
+
+class _ModelQueue:
+    def __init__(self, model: str, rpm: Optional[int], tpm: Optional[int]):
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        # Per priority class, the waiting calls of every flow in round-robin order
+        self.flows: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in PRIORITY_CLASSES}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.waited_s = 0.0
+        self.max_wait_s = 0.0
+
+    def push(self, waiter: _Waiter):
+        self.flows[waiter.priority].setdefault(waiter.flow, deque()).append(waiter)
+        track_queue_depth(self.model, waiter.priority, 1)
+
+    def head(self) -> Optional[_Waiter]:
+        for flows in self.flows.values():
+            if flows:
+                return next(iter(flows.values()))[0]
+        return None
+
+    def pop(self, waiter: _Waiter):
+        flows = self.flows[waiter.priority]
+        queue = flows[waiter.flow]
+        queue.popleft()
+        if queue:
+            # The flow goes to the back of its class until the others had their turn
+            flows.move_to_end(waiter.flow)
+        else:
+            del flows[waiter.flow]
+        track_queue_depth(self.model, waiter.priority, -1)
+
+    def remove(self, waiter: _Waiter):
+        flows = self.flows[waiter.priority]
+        queue = flows.get(waiter.flow)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del flows[waiter.flow]
+        track_queue_depth(self.model, waiter.priority, -1)
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def take(self, requests: int, tokens: int):
+        if self.requests is not None:
+            self.requests.adjust(requests)
+        if self.tokens is not None:
+            self.tokens.adjust(tokens)
+
+    def waiting(self) -> Dict[str, int]:
+        return {p: sum(len(q) for q in flows.values()) for p, flows in self.flows.items()}
+
+
+class Reservation:
+    """
+    Rate limit capacity granted to one LLM call.
+    """
+
+    def __init__(self, queue: Optional[_ModelQueue], tokens: int, wait_s: float):
+        self._queue = queue
+        self.tokens = tokens
+        self.wait_s = wait_s
+        self._settled = False
+
+    def contended(self) -> bool:
+        """
+        Return whether other calls are waiting for the same model.
+        """
+        return self._queue is not None and any(self._queue.waiting().values())
+
+    def settle(self, total_tokens: Optional[int]):
+        """
+        Correct the reserved token estimate with the call's actual usage.
+        """
+        if self._queue is None or self._settled or total_tokens is None:
+            return
+        self._settled = True
+        self._queue.take(0, total_tokens - self.tokens)
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls by per-model rate limits, priority class and round-robin between sessions.
+
+    Args:
+        rate_limits: {model: {"rpm": requests per minute, "tpm": tokens per minute}}.
+    """
+
+    def __init__(self, rate_limits: Dict[str, Dict[str, int]]):
+        self._queues = {
+            model: _ModelQueue(model, limits.get("rpm"), limits.get("tpm"))
+            for model, limits in rate_limits.items()
+        }
+
+    async def acquire(self, model: str, tokens: int, priority: str = PRIORITY_INTERACTIVE, flow: Optional[str] = None) -> Reservation:
+        """
+        Wait until the call may be sent.
+
+        Args:
+            model: OpenAI model of the call.
+            tokens: Estimated total tokens of the call, see `estimate_tokens`.
+            priority: One of `PRIORITY_CLASSES`.
+            flow: Session the call belongs to. Defaults to the current `client_flow`, then the correlation ID.
+
+        Returns:
+            The reservation, to be settled with the call's actual token usage.
+        """
+        queue = self._queues.get(model)
+        if queue is None:
+            return Reservation(None, tokens, 0.0)
+        if priority not in queue.flows:
+            priority = PRIORITY_CLASSES[-1]
+        shared = call_priority.get()
+        if shared is not None and PRIORITY_CLASSES.index(shared.priority) < PRIORITY_CLASSES.index(priority):
+            priority = shared.priority
+
+        waiter = _Waiter(tokens, priority, flow or client_flow.get() or correlation_id.get() or "-")
+        started = time.perf_counter()
+        queue.push(waiter)
+        if shared is not None:
+            shared._waiting[waiter] = (self, queue)
+        self._dispatch(queue)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            queue.remove(waiter)
+            if waiter.granted:
+                # Granted just before the caller went away; the call is never sent
+                queue.take(-1, -tokens)
+            self._dispatch(queue)
+            raise
+        finally:
+            if shared is not None:
+                shared._waiting.pop(waiter, None)
+
+        wait_s = time.perf_counter() - started
+        queue.granted += 1
+        queue.waited_s += wait_s
+        queue.max_wait_s = max(queue.max_wait_s, wait_s)
+        observe(LLM_QUEUE_WAIT, wait_s, model=model, priority=waiter.priority)
+        return Reservation(queue, tokens, wait_s)
+
+    def _promote(self, queue: _ModelQueue, waiter: _Waiter, priority: str):
+        if waiter.granted or waiter.future.done():
+            return
+        queue.remove(waiter)
+        waiter.priority = priority
+        queue.push(waiter)
+        self._dispatch(queue)
+
+    def _dispatch(self, queue: _ModelQueue):
+        # Grant waiting calls in order while the buckets allow, then sleep until they refill
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        now = time.monotonic()
+        while True:
+            waiter = queue.head()
+            if waiter is None:
+                return
+            delay = queue.wait_time(waiter.tokens, now)
+            if delay > 0:
+                queue.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, queue)
+                return
+            queue.pop(waiter)
+            if waiter.future.done():
+                continue
+            queue.take(1, waiter.tokens)
+            waiter.granted = True
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return queue lengths, wait times and remaining capacity per rate-limited model.
+        """
+        now = time.monotonic()
+        stats = {}
+        for model, queue in self._queues.items():
+            queue.wait_time(0, now)  # Refill the buckets before reporting them
+            stats[model] = {
+                "granted": queue.granted,
+                "waiting": queue.waiting(),
+                "mean_wait_ms": round(queue.waited_s / queue.granted * 1000, 1) if queue.granted else 0.0,
+                "max_wait_ms": round(queue.max_wait_s * 1000, 1),
+                "requests_available": round(queue.requests.available, 1) if queue.requests is not None else None,
+                "tokens_available": round(queue.tokens.available) if queue.tokens is not None else None,
+            }
+        return stats
+
+
+llm_scheduler: Optional[LLMScheduler] = LLMScheduler(LLM_RATE_LIMITS) if LLM_SCHEDULER_ENABLED else None
@@ -0,0 +1,129 @@
+"""
+utils/schema_registry.py
+
+In-memory registry of the platform schemas in `config/platform_schema.json`.
+
+The file is parsed once and indexed by normalized challenge type (stripped and
+lower-cased), with the fields of each wizard step precomputed per challenge type, so
+lookups are dictionary reads with no disk I/O. `reload_if_changed` re-parses the file
+when its mtime changes; the server calls it periodically, so edits to the schema file
+go live without a restart. A reload swaps in a complete new index at once, so readers
+never see a half-built one, and a file that fails to parse keeps the previous index.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from config.config import PLATFORM_SCHEMA_PATH
+
+# Which fields of a challenge schema belong to which wizard step
+STEP_FIELDS: Dict[str, List[str]] = {
+    "submission-requirements": ["deliverables"],
+    "prize-configuration": ["prize_structure"],
+    "timeline-milestones": ["timeline"],
+}
+
+
+def normalize_challenge_type(challenge_type: str) -> str:
+    return challenge_type.strip().lower()
+
+
+class SchemaIndex:
+    """
+    Immutable index over one version of the schema file.
+    """
+
+    def __init__(self, schemas: List[Dict[str, Any]], mtime: float):
+        self.mtime = mtime
+        self.default = schemas[0] if schemas else {}
+        self.by_type: Dict[str, Dict[str, Any]] = {}
+        for schema in schemas:
+            # Keep the first definition of a type, like the linear scan did
+            self.by_type.setdefault(normalize_challenge_type(schema["challenge_type"]), schema)
+        self.step_fields: Dict[str, Dict[str, Dict[str, Any]]] = {
+            challenge_type: {
+                step_id: {key: value for key, value in schema.get("fields", {}).items() if key in fields}
+                for step_id, fields in STEP_FIELDS.items()
+            }
+            for challenge_type, schema in self.by_type.items()
+        }
+
+
+class SchemaRegistry:
+    """
+    Indexed platform schemas with hot reload on file changes.
+
+    Returned schemas are shared between callers and must not be modified.
+
+    Args:
+        path: Path of the platform schema JSON file.
+    """
+
+    def __init__(self, path: str = PLATFORM_SCHEMA_PATH):
+        self.path = path
+        self._index: Optional[SchemaIndex] = None
+        self._lock = threading.Lock()
+        self._failed_mtime: Optional[float] = None
+
+    def _current(self) -> SchemaIndex:
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load()
+                index = self._index
+        return index
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r") as f:
+            schemas = json.load(f)
+        self._index = SchemaIndex(schemas, mtime)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Re-parse the schema file if its mtime changed since it was loaded.
+        Returns True when a new version was loaded.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            print(f"❌ Cannot stat schema file {self.path}: {e}")
+            return False
+        if (self._index is not None and self._index.mtime == mtime) or self._failed_mtime == mtime:
+            return False
+        with self._lock:
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"❌ Failed to reload schema file {self.path}, keeping the previous version: {e}")
+                self._failed_mtime = mtime
+                return False
+        return True
+
+    def get(self, challenge_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the schema of a challenge type (case-insensitive), or None if unknown.
+        """
+        return self._current().by_type.get(normalize_challenge_type(challenge_type))
+
+    def get_or_default(self, challenge_type: str) -> Dict[str, Any]:
+        """
+        Return the schema of a challenge type, falling back to the first schema in the file.
+        """
+        index = self._current()
+        return index.by_type.get(normalize_challenge_type(challenge_type), index.default)
+
+    def get_step_schema(self, challenge_type: str, step_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the schema fields of a wizard step for a challenge type.
+        Returns None for an unknown challenge type and {} for a step without schema fields.
+        """
+        steps = self._current().step_fields.get(normalize_challenge_type(challenge_type))
+        if steps is None:
+            return None
+        return steps.get(step_id, {})
+
+
+schema_registry = SchemaRegistry()
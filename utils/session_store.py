@@ -0,0 +1,271 @@
+"""
+utils/session_store.py
+
+Storage for per-session message history with bounded size and TTL eviction.
+
+Two backends are available:
+- MemorySessionStore: an in-process LRU + TTL store, for single-worker deployments.
+- SQLiteSessionStore: a local SQLite database in WAL mode that every worker on the node
+  shares, so a `/messages` poll sees the same history whichever worker serves it.
+
+Both backends measure the size of each session's history and drop its oldest messages
+once it exceeds the configured byte cap. The SQLite backend enforces the session cap in
+`evict_expired`, which the server's sweeper calls periodically, so that an append stays
+one short transaction. Its calls block on disk I/O and must run off the event loop.
+"""
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from config.config import (
+    SESSION_STORE_BACKEND,
+    SESSION_STORE_PATH,
+    SESSION_TTL,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_HISTORY_BYTES
+)
+
+
+def _message_size(message: Dict[str, Any]) -> int:
+    # Approximate footprint: the UTF-8 content plus role and a fixed per-entry overhead
+    return len(message["content"].encode("utf-8")) + len(message["role"]) + 64
+
+
+class SessionStore(ABC):
+    """
+    Interface of the session history backends.
+    """
+
+    @abstractmethod
+    def append_message(self, session: str, message: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def get_messages(self, session: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def delete(self, session: str):
+        ...
+
+    @abstractmethod
+    def evict_expired(self) -> List[str]:
+        """Remove sessions idle for longer than the TTL, and the least recently used ones beyond the session cap, and return their IDs."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process session history with LRU eviction beyond `max_sessions` and TTL expiry.
+    """
+
+    def __init__(self, max_sessions: int, ttl: float, max_history_bytes: int):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_history_bytes = max_history_bytes
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.trimmed_messages = 0
+
+    def append_message(self, session: str, message: Dict[str, Any]):
+        with self._lock:
+            entry = self._sessions.get(session)
+            if entry is None:
+                entry = {"messages": [], "bytes": 0, "last_access": 0.0}
+                self._sessions[session] = entry
+            entry["messages"].append(message)
+            entry["bytes"] += _message_size(message)
+            entry["last_access"] = time.time()
+            self._sessions.move_to_end(session)
+
+            while entry["bytes"] > self.max_history_bytes and len(entry["messages"]) > 1:
+                dropped = entry["messages"].pop(0)
+                entry["bytes"] -= _message_size(dropped)
+                self.trimmed_messages += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def get_messages(self, session: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session)
+            if entry is None or time.time() - entry["last_access"] > self.ttl:
+                return []
+            return list(entry["messages"])
+
+    def delete(self, session: str):
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def evict_expired(self) -> List[str]:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [s for s, entry in self._sessions.items() if entry["last_access"] < cutoff]
+            for session in expired:
+                del self._sessions[session]
+            self.evictions += len(expired)
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = [entry["bytes"] for entry in self._sessions.values()]
+        return _size_stats("memory", sizes, self.evictions, self.trimmed_messages, self.max_history_bytes)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session history in a local SQLite database shared by every worker on the node.
+    """
+
+    def __init__(self, path: str, max_sessions: int, ttl: float, max_history_bytes: int):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_history_bytes = max_history_bytes
+        self._local = threading.local()
+        self.evictions = 0
+        self.trimmed_messages = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session TEXT PRIMARY KEY,
+                last_access REAL NOT NULL,
+                bytes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages (session, id);
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append_message(self, session: str, message: Dict[str, Any]):
+        size = _message_size(message)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO messages (session, role, content, timestamp, bytes) VALUES (?, ?, ?, ?, ?)",
+                (session, message["role"], message["content"], message["timestamp"], size),
+            )
+            conn.execute(
+                "INSERT INTO sessions (session, last_access, bytes) VALUES (?, ?, ?) "
+                "ON CONFLICT(session) DO UPDATE SET last_access = excluded.last_access, bytes = bytes + excluded.bytes",
+                (session, time.time(), size),
+            )
+            total = conn.execute("SELECT bytes FROM sessions WHERE session = ?", (session,)).fetchone()[0]
+            if total > self.max_history_bytes:
+                # Keep the newest messages that fit the cap, and always the newest one
+                trimmed = conn.execute(
+                    "DELETE FROM messages WHERE id IN ("
+                    " SELECT id FROM ("
+                    "  SELECT id, SUM(bytes) OVER (ORDER BY id DESC) AS newer_bytes, ROW_NUMBER() OVER (ORDER BY id DESC) AS position"
+                    "  FROM messages WHERE session = ?"
+                    " ) WHERE newer_bytes > ? AND position > 1"
+                    ")",
+                    (session, self.max_history_bytes),
+                ).rowcount
+                self.trimmed_messages += trimmed
+                conn.execute(
+                    "UPDATE sessions SET bytes = (SELECT COALESCE(SUM(bytes), 0) FROM messages WHERE session = ?) WHERE session = ?",
+                    (session, session),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_messages(self, session: str) -> List[Dict[str, Any]]:
+        conn = self._connection()
+        row = conn.execute("SELECT last_access FROM sessions WHERE session = ?", (session,)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return []
+        return [
+            {"role": role, "content": content, "timestamp": timestamp}
+            for role, content, timestamp in conn.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session = ? ORDER BY id", (session,)
+            )
+        ]
+
+    def delete(self, session: str):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        self._delete_many(conn, [session])
+        conn.execute("COMMIT")
+
+    def evict_expired(self) -> List[str]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        expired = [row[0] for row in conn.execute(
+            "SELECT session FROM sessions WHERE last_access < ?", (time.time() - self.ttl,)
+        )]
+        self._delete_many(conn, expired)
+        overflow = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if overflow > 0:
+            stale = [row[0] for row in conn.execute(
+                "SELECT session FROM sessions ORDER BY last_access LIMIT ?", (overflow,)
+            )]
+            self._delete_many(conn, stale)
+            expired += stale
+        conn.execute("COMMIT")
+        self.evictions += len(expired)
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [row[0] for row in self._connection().execute("SELECT bytes FROM sessions")]
+        return _size_stats("sqlite", sizes, self.evictions, self.trimmed_messages, self.max_history_bytes)
+
+    @staticmethod
+    def _delete_many(conn: sqlite3.Connection, sessions: List[str]):
+        for session in sessions:
+            conn.execute("DELETE FROM messages WHERE session = ?", (session,))
+            conn.execute("DELETE FROM sessions WHERE session = ?", (session,))
+
+
+def _size_stats(backend: str, sizes: List[int], evictions: int, trimmed: int, cap: int) -> Dict[str, Any]:
+    return {
+        "backend": backend,
+        "sessions": len(sizes),
+        "history_bytes_total": sum(sizes),
+        "history_bytes_max": max(sizes, default=0),
+        "history_bytes_mean": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+        "history_bytes_cap": cap,
+        "evictions": evictions,
+        "trimmed_messages": trimmed,
+    }
+
+
+def create_session_store() -> SessionStore:
+    """
+    Build the session store selected by SESSION_STORE_BACKEND.
+    """
+    if SESSION_STORE_BACKEND == "sqlite":
+        return SQLiteSessionStore(SESSION_STORE_PATH, SESSION_MAX_SESSIONS, SESSION_TTL, SESSION_MAX_HISTORY_BYTES)
+    if SESSION_STORE_BACKEND == "memory":
+        return MemorySessionStore(SESSION_MAX_SESSIONS, SESSION_TTL, SESSION_MAX_HISTORY_BYTES)
+    raise ValueError(f"Unknown SESSION_STORE_BACKEND: {SESSION_STORE_BACKEND}")
@@ -0,0 +1,160 @@
+"""
+utils/singleflight.py
+
+Single-flight coalescing of identical in-flight calls.
+
+When several requests with the same inputs arrive at once (browser tabs, client
+retries), only the first one calls the upstream API; the others wait for that call
+and receive the same result. Calls are keyed on the same fingerprint as the
+response and embedding caches. A caller can hand a value to the callers that join its
+call, e.g. the call's scheduler priority, which a more urgent caller raises instead of
+waiting behind a speculative call. A completed call is forgotten immediately, so later
+requests are served by the caches rather than by this module. Coalescing is per
+worker process.
+
+`SingleFlight` is used on the event loop by `complete_prompt` (the recommenders and
+`detect_conflicts`); `ThreadSingleFlight` by RAGHelper, whose embedding calls run in
+worker threads.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from config.config import SINGLE_FLIGHT_ENABLED
+
+T = TypeVar("T")
+
+
+class _Counters:
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.coalesced: Dict[str, int] = defaultdict(int)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return upstream calls made and calls saved by coalescing, per label.
+        """
+        labels = sorted(set(self.calls) | set(self.coalesced))
+        return {
+            "calls": sum(self.calls.values()),
+            "coalesced": sum(self.coalesced.values()),
+            "by_label": {label: {"calls": self.calls[label], "coalesced": self.coalesced[label]} for label in labels},
+        }
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task, context: Any):
+        self.task = task
+        self.context = context
+        self.waiters = 0
+
+
+class SingleFlight(_Counters):
+    """
+    Coalesces concurrent coroutine calls with the same key onto one in-flight task.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._in_flight: Dict[str, _Flight] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        label: str = "default",
+        context: Any = None,
+        on_join: Optional[Callable[[Any], None]] = None,
+    ) -> T:
+        """
+        Await `fn()`, or the identical call already in flight under `key`.
+
+        The call runs as its own task, shielded from the cancellation of a single
+        caller (e.g. a disconnected client) while other callers still wait for it.
+        When the last caller is cancelled, the call is cancelled too. Exceptions reach
+        every waiter.
+
+        Args:
+            key: Fingerprint of everything that determines the result.
+            fn: Starts the call when none is in flight.
+            label: Name the call is counted under, e.g. the endpoint.
+            context: Kept with the call when this caller starts it.
+            on_join: Called with the `context` of the call in flight when this caller joins it.
+        """
+        flight = self._in_flight.get(key)
+        if flight is None:
+            self.calls[label] += 1
+            flight = _Flight(asyncio.ensure_future(fn()), context)
+            self._in_flight[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced[label] += 1
+            if on_join is not None:
+                on_join(flight.context)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to receive the result: stop the upstream call
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight):
+        # A later call under the same key may already be in flight
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ThreadSingleFlight(_Counters):
+    """
+    Coalesces concurrent blocking calls with the same key made from different threads.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], T], label: str = "default") -> T:
+        """
+        Return `fn()`, or the result of the identical call already running under `key`.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._in_flight[key] = call
+                self.calls[label] += 1
+            else:
+                self.coalesced[label] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+llm_flight: Optional[SingleFlight] = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+embedding_flight: Optional[ThreadSingleFlight] = ThreadSingleFlight() if SINGLE_FLIGHT_ENABLED else None
@@ -0,0 +1,59 @@
+"""
+utils/spec_patch.py
+
+Delta-based updates of the challenge specification during the spec discussion.
+
+Instead of returning the whole specification after every change request, the model
+returns JSON Patch (RFC 6902) operations that are applied locally to the current
+specification, and updated reasoning trace entries only for the fields it changed.
+The prompt carries a compact JSON rendering of the current specification.
+"""
+import json
+from typing import Any, Dict, List
+
+import jsonpatch
+import jsonpointer
+
+# The operations SPEC_DISCUSSION_PATCH_PROMPT and the discuss_spec response format allow
+ALLOWED_PATCH_OPS = {"add", "remove", "replace"}
+
+
+def render_compact(value: Any) -> str:
+    """
+    Render a value as compact JSON for a prompt.
+    """
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def apply_spec_patch(spec: Dict[str, Any], patch: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply JSON Patch operations to a specification and return the updated copy.
+    The input specification is left unchanged.
+
+    Raises:
+        ValueError: If the patch is malformed or does not apply to the specification.
+    """
+    if not isinstance(patch, list) or not all(isinstance(op, dict) and op.get("op") in ALLOWED_PATCH_OPS for op in patch):
+        raise ValueError(f"invalid patch: {render_compact(patch)[:200]}")
+    try:
+        return jsonpatch.apply_patch(spec, patch, in_place=False)
+    except (jsonpatch.JsonPatchException, jsonpointer.JsonPointerException) as e:
+        raise ValueError(str(e)) from e
+
+
+def merge_reasoning_trace(trace: List[Dict[str, Any]], updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Replace the reasoning trace entries of the updated fields and append entries for new fields.
+    """
+    merged = list(trace or [])
+    positions = {entry.get("field"): i for i, entry in enumerate(merged) if isinstance(entry, dict)}
+    for update in updates or []:
+        if not isinstance(update, dict):
+            continue
+        field = update.get("field")
+        if field in positions:
+            merged[positions[field]] = update
+        else:
+            positions[field] = len(merged)
+            merged.append(update)
+    return merged
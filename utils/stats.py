@@ -0,0 +1,92 @@
+"""
+utils/stats.py
+
+Lightweight in-process latency and token usage statistics, kept per label.
+"""
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+
+class LatencyStats:
+    """
+    Rolling latency samples (in milliseconds) grouped by label, e.g. by graph node.
+
+    Args:
+        window: Number of most recent samples kept per label.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, label: str, value_ms: float):
+        self._samples[label].append(value_ms)
+
+    def percentile(self, label: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Return the q-quantile of a label's samples, or None with fewer than `min_samples`.
+        """
+        samples = self._samples.get(label)
+        if not samples or len(samples) < min_samples:
+            return None
+        return _percentile(sorted(samples), q)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return count, mean and p50/p95/p99 for every label.
+        """
+        result = {}
+        for label, samples in self._samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[label] = {
+                "count": len(ordered),
+                "mean_ms": round(sum(ordered) / len(ordered), 1),
+                "p50_ms": round(_percentile(ordered, 0.50), 1),
+                "p95_ms": round(_percentile(ordered, 0.95), 1),
+                "p99_ms": round(_percentile(ordered, 0.99), 1),
+            }
+        return result
+
+
+class TokenUsageStats:
+    """
+    Cumulative prompt, cached prompt and completion token counts grouped by label,
+    e.g. by endpoint or graph node, with the mean latency of the calls.
+    """
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def record(self, label: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int, elapsed_ms: Optional[float] = None):
+        totals = self._totals[label]
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cached_tokens"] += cached_tokens
+        totals["completion_tokens"] += completion_tokens
+        if elapsed_ms is not None:
+            totals["timed_calls"] += 1
+            totals["elapsed_ms"] += elapsed_ms
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return token totals, the share of prompt tokens served from the provider's cache
+        and the mean call latency for every label.
+        """
+        result = {}
+        for label, totals in self._totals.items():
+            prompt_tokens = int(totals["prompt_tokens"])
+            result[label] = {
+                "calls": int(totals["calls"]),
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": int(totals["cached_tokens"]),
+                "cached_ratio": round(totals["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0,
+                "completion_tokens": int(totals["completion_tokens"]),
+                "mean_ms": round(totals["elapsed_ms"] / totals["timed_calls"], 1) if totals["timed_calls"] else 0.0,
+            }
+        return result
+
+
+def _percentile(ordered, fraction: float) -> float:
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
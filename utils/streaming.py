@@ -0,0 +1,216 @@
+"""
+utils/streaming.py
+
+LLM invocation for the agent nodes with token-level streaming to the WebSocket.
+
+While the model is still generating, the growing "message" field and every completed
+member of the "specification" field are forwarded to the session as transient frames:
+
+    {"streaming": true, "field": "message", "delta": "..."}
+    {"streaming": true, "field": "specification", "key": "title", "value": "..."}
+
+The complete reply is returned to the node, which validates it against the JSON-schema
+response format it was requested with (`utils.structured_output`) and sends the final
+message in the usual format. Time to first token, time to the first frame and total
+turn latency are recorded per node in `turn_latency`, token usage (including prompt
+tokens served from the provider's prefix cache) in `utils.prompt_layout.token_usage`.
+
+Calls are admitted by the scheduler (`utils.scheduler`) in the conversation priority
+class, ahead of the REST recommendations that share the quota, and run under the
+node's deadline with retries and hedging (`utils.resilience`). When the node has a
+model cascade and a faster tier's reply is rejected, a reset frame tells the client to
+discard what was streamed before the next tier answers:
+
+    {"streaming": true, "reset": true}
+
+A turn whose call still fails after its retries (`LLM_TURN_ERRORS`) is handed to
+`recover_failed_turn`: the user is told the turn failed and asked for their next
+message, and the node runs again on it with its state unchanged.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import openai
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from config.config import AGENT_STREAMING_ENABLED, AGENT_STREAM_FLUSH_INTERVAL
+from utils.cascade import run_cascade
+from utils.input_handler import async_input, async_print, async_stream
+from utils.json_stream import IncrementalJSONParser, STRING_DELTA
+from utils.metrics import observe_llm_call
+from utils.prompt_layout import record_usage
+from utils.resilience import LLMDeadlineExceeded, resilient_caller
+from utils.scheduler import PRIORITY_CONVERSATION, estimate_tokens, llm_scheduler
+from utils.stats import LatencyStats
+
+turn_latency = LatencyStats()
+
+# Failures left once the deadline, retries and cascade tiers are used up
+LLM_TURN_ERRORS = (LLMDeadlineExceeded, openai.APIError)
+TURN_FAILED_MESSAGE = "Sorry, I couldn't get a response this time. Please send your message again, or rephrase it."
+
+
+async def invoke_llm(
+    llm: Union[Any, Sequence[Any]],
+    messages: List[Any],
+    node: str,
+    session: Optional[str] = None,
+    stream_fields: Iterable[str] = ("message",),
+    stream_objects: Iterable[str] = (),
+    validate: Optional[Callable[[str], bool]] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Invoke the LLM and return the full text of its reply.
+
+    In server mode with streaming enabled, partial output is forwarded to the session as it arrives.
+
+    Args:
+        llm: The chat model to call, or its cascade of model tiers, fastest first (see `utils.cascade`).
+        messages: The prompt messages.
+        node: Name of the calling graph node, used to label latency samples.
+        session: Session to stream to. Streaming is skipped in CLI mode (no session).
+        stream_fields: Top-level string fields of the JSON reply to stream as text deltas.
+        stream_objects: Top-level object fields of the JSON reply to stream member by member.
+        validate: Accepts the reply of a cascade tier; rejected replies escalate to the next tier.
+        response_format: JSON-schema response format requested from OpenAI models (see `utils.structured_output`).
+    """
+    tiers = list(llm) if isinstance(llm, (list, tuple)) else [llm]
+
+    async def call(tier):
+        if response_format is not None and isinstance(tier, ChatOpenAI):
+            # Other chat models (e.g. the benchmark stub) do not take a response format
+            return await _invoke_once(tier.bind(response_format=response_format), _model_name(tier), messages, node, session, stream_fields, stream_objects)
+        return await _invoke_once(tier, _model_name(tier), messages, node, session, stream_fields, stream_objects)
+
+    async def discard_streamed():
+        # The client drops the partial output of the rejected tier
+        if AGENT_STREAMING_ENABLED and session is not None:
+            await async_stream({"streaming": True, "reset": True}, session=session)
+
+    return await run_cascade(node, tiers, call, accept=validate, model_name=_model_name, on_escalate=discard_streamed)
+
+
+async def recover_failed_turn(state: Dict[str, Any], conversation: str, node: str, error: Exception) -> Dict[str, Any]:
+    """
+    Tell the user that the node's LLM call failed and wait for their next message.
+
+    The message is appended to `conversation` and the state is otherwise returned
+    unchanged, so the graph runs the node again on it.
+    """
+    print(f"❌ LLM call for {node} failed: {error}")
+    session = state["session"]
+    if AGENT_STREAMING_ENABLED and session is not None:
+        # Drop whatever was streamed before the call failed
+        await async_stream({"streaming": True, "reset": True}, session=session)
+    await async_print(json.dumps({"message": TURN_FAILED_MESSAGE, "error": True}), session=session)
+    user_response = await async_input("\n🧑 You: ", session=session)
+    state[conversation].append(HumanMessage(content=user_response or "Please try again."))
+    return state
+
+
+def _model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or type(llm).__name__
+
+
+async def _invoke_once(llm, model: str, messages: List[Any], node: str, session: Optional[str], stream_fields: Iterable[str], stream_objects: Iterable[str]) -> str:
+    started = time.perf_counter()
+
+    reserve = None
+    if llm_scheduler is not None:
+        tokens = estimate_tokens((_text(m) for m in messages), getattr(getattr(llm, "bound", llm), "max_tokens", None))
+
+        async def reserve():
+            return await llm_scheduler.acquire(model, tokens, PRIORITY_CONVERSATION, flow=session)
+
+    if not AGENT_STREAMING_ENABLED or session is None:
+        async def attempt(reservation):
+            response = await llm.ainvoke(messages)
+            _settle(reservation, getattr(response, "usage_metadata", None))
+            return response
+
+        response = await resilient_caller.call(node, attempt, reserve)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        turn_latency.record(f"{node}.total", elapsed_ms)
+        observe_llm_call(node, model, elapsed_ms / 1000)
+        record_usage(node, getattr(response, "usage_metadata", None), elapsed_ms, model=model)
+        return response.content
+
+    async def open_stream(reservation):
+        stream_usage = None
+        try:
+            async for chunk in llm.astream(messages):
+                stream_usage = getattr(chunk, "usage_metadata", None) or stream_usage
+                yield chunk
+        finally:
+            # A stream closed early (a losing hedge) keeps the reserved estimate unless usage was reported
+            _settle(reservation, stream_usage)
+
+    parser = IncrementalJSONParser(string_fields=stream_fields, object_fields=stream_objects)
+    parts: List[str] = []
+    pending_field = None
+    pending_delta = ""
+    first_token_at = None
+    first_frame_at = None
+    last_flush = started
+    usage = None
+
+    async def send(frame):
+        nonlocal first_frame_at
+        if first_frame_at is None:
+            first_frame_at = time.perf_counter()
+            turn_latency.record(f"{node}.ttfb", (first_frame_at - started) * 1000)
+        await async_stream({"streaming": True, **frame}, session=session)
+
+    async for chunk in resilient_caller.stream(node, open_stream, reserve):
+        if getattr(chunk, "usage_metadata", None):
+            # Sent with the final chunk when the model streams its usage
+            usage = chunk.usage_metadata
+        text = chunk.content
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            turn_latency.record(f"{node}.ttft", (first_token_at - started) * 1000)
+        parts.append(text)
+
+        for event in parser.feed(text):
+            # Keep frames in document order: flush pending text before anything from another field
+            if pending_delta and (event[0] != STRING_DELTA or event[1] != pending_field):
+                await send({"field": pending_field, "delta": pending_delta})
+                pending_delta = ""
+            if event[0] == STRING_DELTA:
+                pending_field = event[1]
+                pending_delta += event[2]
+            else:
+                _, field, key, value = event
+                await send({"field": field, "key": key, "value": value})
+
+        # Coalesce token-sized deltas into fewer frames
+        now = time.perf_counter()
+        if pending_delta and now - last_flush >= AGENT_STREAM_FLUSH_INTERVAL:
+            await send({"field": pending_field, "delta": pending_delta})
+            pending_delta = ""
+            last_flush = now
+
+    if pending_delta:
+        await send({"field": pending_field, "delta": pending_delta})
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    turn_latency.record(f"{node}.total", elapsed_ms)
+    ttft_s = first_token_at - started if first_token_at is not None else None
+    observe_llm_call(node, model, elapsed_ms / 1000, ttft_s)
+    record_usage(node, usage, elapsed_ms, model=model)
+    return "".join(parts)
+
+
+def _text(message: Any) -> str:
+    content = getattr(message, "content", message)
+    return content if isinstance(content, str) else str(content)
+
+
+def _settle(reservation, usage: Optional[Any]):
+    if reservation is not None and usage:
+        reservation.settle(usage.get("total_tokens"))
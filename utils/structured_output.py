@@ -0,0 +1,364 @@
+"""
+utils/structured_output.py
+
+JSON-schema structured outputs for the agent nodes, with local validation and repair.
+
+Each node requests its reply with an OpenAI `json_schema` response format built from
+the fields it expects; the specification fields are derived from the selected
+platform schema (`config/platform_schema.json`). The format is strict whenever every
+field has a known type; a challenge type with free-form fields gets a non-strict
+schema instead.
+
+Replies are validated locally against the same schema. An invalid reply is first
+repaired locally (code fences and surrounding text stripped, trailing commas removed,
+missing fields filled with empty values, unknown fields dropped) and then, if still
+invalid, by one call to the small `STRUCTURED_OUTPUT_REPAIR_MODEL` in strict mode.
+Only a reply that survives neither is replaced by the node's fallback, which costs the
+user a turn. Outcomes per node are counted in `llm_structured_outputs_total` and
+summarized by `structured_output_stats`.
+"""
+import json
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from config.config import STRUCTURED_OUTPUTS_ENABLED, STRUCTURED_OUTPUT_REPAIR_MODEL
+from utils.metrics import STRUCTURED_OUTPUTS, count
+from utils.spec_patch import ALLOWED_PATCH_OPS
+
+REPAIR_PROMPT = (
+    "Rewrite the reply below as JSON that matches the response schema. Keep its content "
+    "and wording; only fix the structure. Use empty values for missing fields."
+)
+
+_NULL = {"type": "null"}
+_TYPE_NAMES = {"string": str, "boolean": bool, "object": dict, "array": list}
+
+
+def _nullable(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"anyOf": [schema, _NULL]}
+
+
+def _object(properties: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # Strict mode needs every property listed as required; optional ones are nullable instead
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def _field_schema(field: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Translate a platform schema field into JSON Schema, or None when its shape is free-form.
+    """
+    field_type = field.get("type")
+    nested = field.get("schema")
+    if field_type == "String":
+        return {"type": "string"}
+    if field_type == "StringArray":
+        return {"type": "array", "items": {"type": "string"}}
+    if field_type == "Number":
+        return {"type": "number"}
+    if isinstance(nested, dict) and nested:
+        properties = {key: _field_schema(value) if isinstance(value, dict) else {"type": "string"} for key, value in nested.items()}
+        return None if None in properties.values() else _object(properties)
+    if isinstance(nested, list) and nested and isinstance(nested[0], dict):
+        # e.g. [{"type": "USD", "value": {"type": "Number"}}]: constants become strings
+        properties = {key: _field_schema(value) if isinstance(value, dict) else {"type": "string"} for key, value in nested[0].items()}
+        return None if None in properties.values() else {"type": "array", "items": _object(properties)}
+    return None
+
+
+def specification_schema(challenge_schema: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Build the JSON Schema of a specification from a platform schema entry.
+
+    Returns:
+        The schema, and whether every field has a known shape (required for strict mode).
+    """
+    properties = {}
+    strict = True
+    for name, field in (challenge_schema or {}).get("fields", {}).items():
+        schema = _field_schema(field) if isinstance(field, dict) else None
+        if schema is None:
+            strict = False
+            schema = {}
+        properties[name] = schema if field.get("required") else _nullable(schema)
+    if not properties:
+        return {"type": "object"}, False
+    return _object(properties), strict
+
+
+REASONING_TRACE_SCHEMA = {
+    "type": "array",
+    "items": _object({
+        "field": {"type": "string"},
+        "confidence": {"type": "number"},
+        "reason": {"type": "string"},
+    }),
+}
+
+SCOPE_REPLY_SCHEMA = _object({
+    "message": {"type": "string"},
+    "completed": {"type": "boolean"},
+    "work_scope": _object({
+        "description": {"type": "string"},
+        "type": {"type": "string"},
+    }),
+    "suggestions": {
+        "type": "array",
+        "items": _object({
+            "item": {"type": "string"},
+            "status": {"type": "string", "enum": ["pending", "accepted", "rejected"]},
+            "reason": {"type": "string"},
+        }),
+    },
+})
+
+
+def _response_format(name: str, schema: Dict[str, Any], strict: bool = True) -> Dict[str, Any]:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": strict, "schema": schema}}
+
+
+def scope_response_format() -> Dict[str, Any]:
+    return _response_format("discuss_scope_reply", SCOPE_REPLY_SCHEMA)
+
+
+def spec_generation_response_format(challenge_schema: Dict[str, Any]) -> Dict[str, Any]:
+    spec, strict = specification_schema(challenge_schema)
+    return _response_format("generate_spec_reply", _object({
+        "message": {"type": "string"},
+        "completed": {"type": "boolean"},
+        "specification": _nullable(spec),
+        "reasoning_trace": REASONING_TRACE_SCHEMA,
+    }), strict)
+
+
+def spec_discussion_response_format(challenge_schema: Dict[str, Any], patch_mode: bool) -> Dict[str, Any]:
+    spec, strict = specification_schema(challenge_schema)
+    if not patch_mode:
+        return _response_format("discuss_spec_reply", _object({
+            "message": {"type": "string"},
+            "completed": {"type": "boolean"},
+            "specification": _nullable(spec),
+            "reasoning_trace": REASONING_TRACE_SCHEMA,
+        }), strict)
+
+    # A patch value is a whole field, a member of an object field or an element of an array field
+    values: List[Dict[str, Any]] = [{"type": "string"}, {"type": "number"}, _NULL]
+    for field in spec.get("properties", {}).values():
+        field = field.get("anyOf", [field])[0]
+        for candidate in (field, field.get("items")):
+            if candidate and candidate not in values:
+                values.append(candidate)
+        for member in field.get("properties", {}).values():
+            if member not in values:
+                values.append(member)
+    return _response_format("discuss_spec_reply", _object({
+        "message": {"type": "string"},
+        "completed": {"type": "boolean"},
+        "patch": {
+            "type": "array",
+            "items": _object({
+                "op": {"type": "string", "enum": sorted(ALLOWED_PATCH_OPS)},
+                "path": {"type": "string"},
+                "value": {"anyOf": values} if strict else {},
+            }),
+        },
+        "reasoning_trace": REASONING_TRACE_SCHEMA,
+    }), strict)
+
+
+def request_format(response_format: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Return the response format to send with the LLM call, or None when structured outputs are disabled.
+    """
+    return response_format if STRUCTURED_OUTPUTS_ENABLED else None
+
+
+def schema_errors(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Validate `value` against the JSON Schema subset used by the response formats.
+    A missing property is accepted when its schema allows null.
+    """
+    if not schema:
+        return []
+    if "anyOf" in schema:
+        if any(not schema_errors(value, option, path) for option in schema["anyOf"]):
+            return []
+        return [f"{path}: does not match any allowed shape"]
+    expected = schema.get("type")
+    if expected == "null":
+        return [] if value is None else [f"{path}: expected null"]
+    if expected == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return [f"{path}: expected number"]
+    elif expected in _TYPE_NAMES and not isinstance(value, _TYPE_NAMES[expected]):
+        return [f"{path}: expected {expected}"]
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{path}: expected one of {schema['enum']}"]
+
+    errors = []
+    if expected == "object":
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value and schema_errors(None, properties.get(key, {}), f"{path}.{key}"):
+                errors.append(f"{path}.{key}: missing")
+        if schema.get("additionalProperties") is False:
+            errors.extend(f"{path}.{key}: unexpected" for key in value if key not in properties)
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(schema_errors(item, properties[key], f"{path}.{key}"))
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(schema_errors(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def reply_errors(content: Optional[str], response_format: Dict[str, Any]) -> List[str]:
+    """
+    Return why a reply does not match its response format; empty when it does.
+    """
+    try:
+        reply = json.loads(content or "")
+    except json.JSONDecodeError as e:
+        return [f"invalid JSON: {e}"]
+    return schema_errors(reply, response_format["json_schema"]["schema"])
+
+
+def _empty_value(schema: Dict[str, Any]) -> Any:
+    if "anyOf" in schema:
+        return None
+    return {"string": "", "number": 0, "boolean": False, "array": [], "null": None}.get(
+        schema.get("type"),
+        _conform({}, schema) if schema.get("type") == "object" else None,
+    )
+
+
+def _conform(value: Any, schema: Dict[str, Any]) -> Any:
+    """
+    Fill missing properties with empty values, drop unknown ones and parse boolean strings.
+    """
+    expected = schema.get("type")
+    if expected == "boolean" and isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    if expected == "object" and isinstance(value, dict):
+        properties = schema.get("properties", {})
+        result = {key: _conform(item, properties[key]) if key in properties else item for key, item in value.items()
+                  if key in properties or schema.get("additionalProperties") is not False}
+        for key in schema.get("required", []):
+            if key not in result:
+                result[key] = _empty_value(properties.get(key, {}))
+        return result
+    if expected == "array" and isinstance(value, list) and "items" in schema:
+        return [_conform(item, schema["items"]) for item in value]
+    return value
+
+
+def repair_locally(content: Optional[str], response_format: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Return the reply repaired without an LLM call, or None when it cannot be.
+    """
+    text = (content or "").strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None
+    text = text[start:end + 1]
+    for candidate in (text, re.sub(r",\s*([}\]])", r"\1", text)):
+        try:
+            reply = json.loads(candidate)
+            break
+        except json.JSONDecodeError:
+            continue
+    else:
+        return None
+    schema = response_format["json_schema"]["schema"]
+    reply = _conform(reply, schema)
+    return reply if not schema_errors(reply, schema) else None
+
+
+class StructuredOutputStats:
+    """
+    Structured reply outcomes per node: valid, repaired (locally or by the repair model) or wasted.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, node: str, outcome: str):
+        self._counts[node][outcome] += 1
+        count(STRUCTURED_OUTPUTS, node=node, outcome=outcome)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for node, counts in self._counts.items():
+            total = sum(counts.values())
+            result[node] = {
+                "replies": total,
+                **{outcome: counts[outcome] for outcome in ("valid", "repaired", "repaired_llm", "wasted")},
+                "wasted_rate": round(counts["wasted"] / total, 4) if total else 0.0,
+            }
+        return result
+
+
+structured_output_stats = StructuredOutputStats()
+
+
+def _repair_llm(llm: Any) -> Optional[ChatOpenAI]:
+    if not STRUCTURED_OUTPUT_REPAIR_MODEL or not isinstance(llm, ChatOpenAI):
+        return None
+    from utils.registry import get_llm
+    api_key = llm.openai_api_key.get_secret_value() if llm.openai_api_key else None
+    return get_llm(model=STRUCTURED_OUTPUT_REPAIR_MODEL, temperature=0, api_key=api_key)
+
+
+async def parse_structured_reply(
+    content: Optional[str],
+    node: str,
+    response_format: Dict[str, Any],
+    fallback: Dict[str, Any],
+    llm: Any = None,
+) -> Dict[str, Any]:
+    """
+    Parse and validate a node's reply, repairing it when needed.
+
+    Args:
+        content: The reply text.
+        node: Name of the graph node, used for the stats.
+        response_format: The format the reply was requested with.
+        fallback: Returned when the reply cannot be repaired.
+        llm: The node's chat model. The repair model is only used with OpenAI models.
+
+    Returns:
+        The reply as a dictionary.
+    """
+    if not reply_errors(content, response_format):
+        structured_output_stats.record(node, "valid")
+        return json.loads(content)
+
+    repaired = repair_locally(content, response_format)
+    if repaired is not None:
+        structured_output_stats.record(node, "repaired")
+        return repaired
+
+    repair_llm = _repair_llm(llm)
+    if repair_llm is not None and content:
+        from utils.streaming import invoke_llm
+        try:
+            fixed = await invoke_llm(
+                repair_llm,
+                [SystemMessage(content=REPAIR_PROMPT), HumanMessage(content=content)],
+                node=f"{node}.repair",
+                response_format=response_format,
+            )
+            repaired = repair_locally(fixed, response_format)
+        except Exception as e:
+            print(f"❌ Failed to repair the {node} reply: {e}")
+        if repaired is not None:
+            structured_output_stats.record(node, "repaired_llm")
+            return repaired
+
+    print(f"❌ Discarding an invalid {node} reply: {'; '.join(reply_errors(content, response_format)[:3])}")
+    structured_output_stats.record(node, "wasted")
+    return fallback
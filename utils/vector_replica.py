@@ -0,0 +1,171 @@
+"""
+utils/vector_replica.py
+
+Local, in-process replica of the Qdrant challenge_templates collection.
+
+The collection is small and changes rarely, so it is snapshotted into a NumPy matrix of
+L2-normalized vectors (`vectors.npy`) plus a payload store (`payloads.json`), and
+similar challenges are found with an exact cosine top-k in process, without a network
+round trip. RAGHelper falls back to Qdrant while no replica has been synced or when a
+local search fails.
+
+Sync the replica from Qdrant (run from the repository root):
+    python -m utils.vector_replica
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+
+from config.config import (
+    QDRANT_ENDPOINT,
+    QDRANT_COLLECTION_NAME,
+    RAG_REPLICA_DIR
+)
+
+load_dotenv()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine similarity search over a synced snapshot of the collection.
+
+    Args:
+        directory: Directory holding `vectors.npy` and `payloads.json`.
+    """
+
+    def __init__(self, directory: str = RAG_REPLICA_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Tuple[np.ndarray, List[Any], List[Dict[str, Any]], Dict[str, Any]]] = None
+        self._mtime: Optional[float] = None
+
+    @property
+    def payloads_path(self) -> str:
+        return os.path.join(self.directory, "payloads.json")
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.npy")
+
+    def _load(self):
+        mtime = os.stat(self.payloads_path).st_mtime
+        with open(self.payloads_path, "r", encoding="utf-8") as f:
+            store = json.load(f)
+        vectors = np.load(self.vectors_path)
+        if not vectors.shape[0] == len(store["ids"]) == len(store["payloads"]):
+            raise ValueError(f"replica has {vectors.shape[0]} vectors but {len(store['payloads'])} payloads")
+        meta = {k: v for k, v in store.items() if k not in ("ids", "payloads")}
+        self._snapshot = (vectors, store["ids"], store["payloads"], meta)
+        self._mtime = mtime
+
+    def available(self) -> bool:
+        """
+        Load the replica on first use and reload it after a sync. Returns False if there is none.
+        """
+        try:
+            mtime = os.stat(self.payloads_path).st_mtime
+        except OSError:
+            return self._snapshot is not None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._load()
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"❌ Failed to load the local vector replica: {e}")
+                        self._mtime = mtime
+        return self._snapshot is not None
+
+    def search(self, vector: List[float], limit: int) -> List[Tuple[float, Any, Dict[str, Any]]]:
+        """
+        Return the `limit` most similar points as (cosine similarity, point ID, payload), best first.
+        """
+        vectors, ids, payloads, _ = self._snapshot
+        if not payloads:
+            return []
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        scores = vectors @ query
+        limit = min(limit, len(payloads))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), ids[i], payloads[i]) for i in top]
+
+    def stats(self) -> Dict[str, Any]:
+        if self._snapshot is None:
+            return {"available": False}
+        vectors, _, _, meta = self._snapshot
+        return {"available": True, "points": int(vectors.shape[0]), **meta}
+
+
+def sync_replica(qdrant: QdrantClient, collection: str = QDRANT_COLLECTION_NAME, directory: str = RAG_REPLICA_DIR, batch_size: int = 256) -> int:
+    """
+    Snapshot every point of the Qdrant collection into the local replica.
+    Files are written atomically, so running servers pick up the new snapshot on their next search.
+    Returns the number of points synced.
+    """
+    vectors: List[List[float]] = []
+    ids: List[Any] = []
+    payloads: List[Dict[str, Any]] = []
+    offset = None
+    while True:
+        records, offset = qdrant.scroll(
+            collection_name=collection,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        for record in records:
+            vector = record.vector
+            if isinstance(vector, dict):
+                # Named vectors: the collection is searched with its single dense vector
+                vector = next(iter(vector.values()))
+            vectors.append(vector)
+            ids.append(record.id)
+            payloads.append(record.payload or {})
+        if offset is None:
+            break
+
+    os.makedirs(directory, exist_ok=True)
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
+    store = {"collection": collection, "synced_at": int(time.time()), "ids": ids, "payloads": payloads}
+
+    # The vectors go first: a reader keys its reload on the payload file and checks that both match
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, os.path.join(directory, "vectors.npy"))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(directory, "payloads.json"))
+    return len(payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot the Qdrant challenge collection into the local replica")
+    parser.add_argument("--collection", default=QDRANT_COLLECTION_NAME, help="Qdrant collection to snapshot")
+    parser.add_argument("--dir", default=RAG_REPLICA_DIR, help="Replica directory")
+    args = parser.parse_args()
+
+    qdrant = QdrantClient(url=QDRANT_ENDPOINT, api_key=os.environ.get("QDRANT_API_KEY"))
+    start = time.perf_counter()
+    count = sync_replica(qdrant, args.collection, args.dir)
+    print(f"Synced {count} points from '{args.collection}' to {args.dir} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()